@@ -1,67 +1,215 @@
-from flask import Flask, render_template, request, jsonify, session, send_from_directory
-import google.generativeai as genai
-import os, json, datetime
-from google_trans_new import google_translator
+from flask import Flask, Blueprint, render_template, request, jsonify, session, send_from_directory, has_request_context, Response, stream_with_context, g
+import os, json, time, datetime, urllib.request, urllib.error
+from translation import TranslationService
+from upstream import UpstreamLimiter, UpstreamUnavailable
+from intent_router import router as intent_router
+import uploads
+from ocr_cache import OcrCache, prompt_version
+from jobs import JobQueue, FINAL_STATES as FINAL_JOB_STATES
+from doctors import DoctorDirectory
+from scheduler import SlotScheduler, SlotError
+import metrics
+from metrics import span
+from lazy import Lazy
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
 import traceback
+import threading
+from chat_store import ChatLogStore
+from chat_search import ChatSearchIndex, SORTS as CHAT_SEARCH_SORTS
+from chat_archive import ChatArchive
+from chat_sessions import ChatSessionManager
+from response_cache import ResponseCache, make_key as response_cache_key
+from storage import open_user_store, VersionConflict, OperationError
+from compression import ResponseCompressor
+from reminders import ReminderEngine, ReminderOutbox, KINDS as REMINDER_KINDS
+from emergency import EmergencyResponder
+from prompts import join_within
 
 # --- Unified data files & helpers (replace older USERDATAFILE / load_userdata/save_userdata) ---
 import uuid  # used for appointments
 
 BASE_DIR = os.path.dirname(__file__)
-USER_DATA_FILE = os.path.join(BASE_DIR, "user_data.json")
-LOG_FILE = os.path.join(BASE_DIR, "chat_log.json")
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Where data files live (user data, chat log, uploads, caches); defaults to the app directory
+DATA_DIR = os.getenv("SEHAT_DATA_DIR", BASE_DIR)
+USER_DATA_FILE = os.path.join(DATA_DIR, "user_data.json")
+LOG_FILE = os.path.join(DATA_DIR, "chat_log.json")  # legacy format, migrated once into CHAT_STORE_FILE
+CHAT_STORE_FILE = os.path.join(DATA_DIR, "chat_log.jsonl")
+CHAT_SEARCH_DB = os.getenv("CHAT_SEARCH_DB", os.path.join(DATA_DIR, "chat_search.db"))
+# Chat retention: entries older than CHAT_HOT_DAYS move from the chat log into compressed daily/weekly
+# segments, deleted after CHAT_RETENTION_DAYS or, oldest first, past CHAT_ARCHIVE_MAX_MB (0 = no cap)
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", os.path.join(DATA_DIR, "chat_archive"))
+CHAT_HOT_DAYS = int(os.getenv("CHAT_HOT_DAYS", 7))
+CHAT_RETENTION_DAYS = int(os.getenv("CHAT_RETENTION_DAYS", 365))
+CHAT_ARCHIVE_MAX_MB = float(os.getenv("CHAT_ARCHIVE_MAX_MB", 0))
+CHAT_SEGMENT = os.getenv("CHAT_SEGMENT", "daily")  # or "weekly"
+CHAT_ARCHIVE_CODEC = os.getenv("CHAT_ARCHIVE_CODEC", "gzip")  # or "zstd" (needs zstandard)
+CHAT_RETENTION_INTERVAL = int(os.getenv("CHAT_RETENTION_INTERVAL", 3600))  # seconds between runs; 0 = off
+# "json" keeps the single user_data.json document; "sqlite" stores data per user/session
+STORAGE_BACKEND = os.getenv("SEHAT_STORAGE", "json")
+SQLITE_DB_FILE = os.getenv("SEHAT_DB", os.path.join(DATA_DIR, "sehat.db"))
+DEFAULT_USER_ID = "default"
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")  # created by the first upload
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 10 * 1024 * 1024))
+# Downscale images to this longest side before OCR (needs Pillow; 0 disables)
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", 1600))
+OCR_CACHE_DB = os.getenv("OCR_CACHE_DB", os.path.join(DATA_DIR, "ocr_cache.db"))
+# Background jobs (async OCR); JOB_WORKERS bounds how many run at once
+JOB_DB = os.getenv("JOB_DB", os.path.join(DATA_DIR, "jobs.db"))
+OCR_BATCH_MAX = int(os.getenv("OCR_BATCH_MAX", 10))
+# Doctor directory data (.json list, .jsonl or SQLite "doctors" table); unset = built-in mock list
+DOCTOR_DATA = os.getenv("DOCTOR_DATA")
+DOCTOR_PAGE_MAX = 200
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", 30))
+# Booked doctor slots, shared by all worker processes (see scheduler.py)
+BOOKING_DB = os.getenv("BOOKING_DB", os.path.join(DATA_DIR, "bookings.db"))
+# One JSON line per request (route, status, duration, per-stage timings) on stdout
+METRICS_JSON_LOG = os.getenv("METRICS_JSON_LOG", "1") == "1"
+# Most operations one /batch request may carry
+BATCH_MAX_OPS = int(os.getenv("BATCH_MAX_OPS", 200))
+# gzip/brotli JSON and HTML responses of at least this many bytes (0 disables)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+# Medication/appointment reminders (see reminders.py); REMINDERS=0 turns the engine off
+REMINDERS = os.getenv("REMINDERS", "1") == "1"
+REMINDER_DB = os.getenv("REMINDER_DB", os.path.join(DATA_DIR, "reminders.db"))
+REMINDER_APPOINTMENT_LEAD = int(os.getenv("REMINDER_APPOINTMENT_LEAD", 60))  # minutes before an appointment
+REMINDER_POLL = float(os.getenv("REMINDER_POLL", 5))  # seconds; how soon other workers' edits and reminders show up
+REMINDER_WEBHOOK_URL = os.getenv("REMINDER_WEBHOOK_URL")  # each reminder is POSTed here (via the job queue) when set
+# Create clients/indexes in a background thread at startup instead of on first use
+WARMUP = os.getenv("SEHAT_WARMUP", "0") == "1"
+TRANSLATION_PRELOAD = os.getenv("TRANSLATION_PRELOAD", "1") == "1"
+# Estimated-token budget for one Gemini prompt (instruction + history + message; 0 = no limit) and for
+# each list (medications, contacts) in the system instruction, past which items become "and N more"
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", 6000))
+INSTRUCTION_LIST_TOKENS = int(os.getenv("INSTRUCTION_LIST_TOKENS", 600))
+
+# Profile / medications / contacts / appointments (see storage.py)
+# (every call is timed as stage "storage.<method>", see metrics.py); opened on first use
+user_store = Lazy(lambda: metrics.Instrumented(open_user_store(STORAGE_BACKEND, USER_DATA_FILE, SQLITE_DB_FILE),
+                                               "storage"), "storage")
+
+def current_user_id():
+    """User key for the storage layer: one per browser session."""
+    if not has_request_context():
+        return DEFAULT_USER_ID
+    if "uid" not in session:
+        # The first new session takes over data imported for DEFAULT_USER_ID (see storage.py's import tool)
+        session["uid"] = DEFAULT_USER_ID if user_store.claim(DEFAULT_USER_ID) else str(uuid.uuid4())
+    return session["uid"]
 
 def load_user_data():
-    """Load user data from single JSON file (fallback to defaults)."""
-    if os.path.exists(USER_DATA_FILE):
-        try:
-            with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            pass
-    # standardized keys used across the app
-    return {"profile": {}, "appointments": [], "emergency_contacts": [], "medications": []}
-
-def save_user_data(data):
-    """Save user data to single JSON file."""
-    with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-# ensure chat log exists
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f)
-
-# Initialize translator
-translator = google_translator()
-
-# Initialize Flask
-app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "supersecret")  # Needed for session
-CORS(app)  # Allow all origins
-
-# Google API Key
+    """Load the current user's data (fallback to defaults)."""
+    return user_store.get_user_data(current_user_id())
+
+def expected_version():
+    """Version from the If-Match header (the ETag of an earlier response), or None.
+
+    Writes without If-Match are unconditional (but still atomic); with it they
+    fail with 409 if the user's data changed since that version. A header that
+    isn't one of our ETags is a 400.
+    """
+    value = request.headers.get("If-Match", "").strip()
+    if not value or value == "*":
+        return None
+    try:
+        return int(value.removeprefix("W/").strip('"'))
+    except ValueError:
+        raise OperationError(f'If-Match must be an ETag from this API (like "3"), not {value!r}')
+
+def saved(message, version, **extra):
+    """Success response for a write, carrying the data's new version/ETag."""
+    return jsonify({"status": "success", "message": message, "version": version, **extra}), 200, {"ETag": f'"{version}"'}
+
+# Append-only chat log (migrates chat_log.json on first start); the index is built on first use
+chat_store = Lazy(lambda: ChatLogStore(CHAT_STORE_FILE, legacy_path=LOG_FILE), "chat_log")
+
+def _load_chat_search():
+    index = ChatSearchIndex(CHAT_SEARCH_DB)
+    added = index.sync(chat_store.instance())
+    if added:
+        print(f"Chat search index caught up ({added} entries added)")
+    return index
+
+# Full-text index over the chat log (see chat_search.py), kept current by every chat write
+chat_search = Lazy(_load_chat_search, "chat_search")
+
+def index_chat_entry(entry):
+    """Add a chat entry to the search index; a failure here never fails the chat write."""
+    try:
+        with span("chat_search.write"):
+            chat_search.add(entry)
+    except Exception as e:
+        print(f"Chat search index error: {e}")
+
+# Cold tier of the chat log (see chat_archive.py); maintained by a background thread (start_background)
+chat_archive = Lazy(lambda: ChatArchive(CHAT_ARCHIVE_DIR, hot_days=CHAT_HOT_DAYS, retention_days=CHAT_RETENTION_DAYS,
+                                        max_bytes=int(CHAT_ARCHIVE_MAX_MB * 1024 * 1024), segment=CHAT_SEGMENT,
+                                        codec=CHAT_ARCHIVE_CODEC), "chat_archive")
+
+def prune_chat_search(before):
+    """Expired archive segments take their search hits with them."""
+    removed = chat_search.prune(datetime.datetime.fromtimestamp(before))
+    print(f"Chat retention: {removed} expired entries dropped from the search index")
+
+# Outbound call limits: per-upstream concurrency + queue depth + timeout, and a global cap
+upstream_slots = threading.BoundedSemaphore(int(os.getenv("UPSTREAM_MAX_CONCURRENCY", 24)))
+gemini_limiter = UpstreamLimiter(
+    "gemini",
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 16)),
+    max_queue=int(os.getenv("GEMINI_MAX_QUEUE", 32)),
+    timeout=float(os.getenv("GEMINI_TIMEOUT", 30)),
+    global_slots=upstream_slots,
+)
+translate_limiter = UpstreamLimiter(
+    "translate",
+    max_concurrency=int(os.getenv("TRANSLATE_MAX_CONCURRENCY", 8)),
+    max_queue=int(os.getenv("TRANSLATE_MAX_QUEUE", 32)),
+    timeout=float(os.getenv("TRANSLATE_TIMEOUT", 10)),
+    global_slots=upstream_slots,
+)
+
+def _make_google_translator():
+    from google_trans_new import google_translator  # deferred: only Telugu sessions need it
+    return google_translator()
+
+
+# Initialize translator (cached; TRANSLATION_CACHE_DB enables the on-disk tier)
+translator_client = Lazy(_make_google_translator, "translator")
+translator = TranslationService(
+    translator_client,
+    max_entries=int(os.getenv("TRANSLATION_CACHE_SIZE", 5000)),
+    db_path=os.getenv("TRANSLATION_CACHE_DB") or None,
+    limiter=translate_limiter,
+)
+
+# Routes live on this blueprint; create_app() (bottom of the file) builds the Flask app
+bp = Blueprint("sehat", __name__)
+
+# Google API Key (only needed once a Gemini model is first used)
 API_KEY = os.getenv("GOOGLE_API_KEY")
 if not API_KEY:
-    raise ValueError("⚠️ GOOGLE_API_KEY is not set.")
+    print("⚠️ GOOGLE_API_KEY is not set; chat and OCR will fail until it is.")
 
 # Weather API mock key
 WEATHER_API_KEY = "your_weather_api_key"
 
-# Configure Generative AI
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
-vision_model = genai.GenerativeModel("gemini-1.5-flash")
+# Configure Generative AI on first use (importing google.generativeai alone takes ~1s)
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
 
-LOG_FILE = os.path.join(os.path.dirname(__file__), "chat_log.json")
+def _configure_genai():
+    import google.generativeai as genai
+    if not API_KEY:
+        raise ValueError("⚠️ GOOGLE_API_KEY is not set.")
+    genai.configure(api_key=API_KEY)
+    return genai
+
+genai_client = Lazy(_configure_genai, "genai")
+model = Lazy(lambda: genai_client.instance().GenerativeModel(GEMINI_MODEL_NAME), "gemini")
+vision_model = Lazy(lambda: genai_client.instance().GenerativeModel(GEMINI_MODEL_NAME), "gemini_vision")
 
 # Directory to store uploaded files
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
 
 # Mock doctor directory
 DOCTOR_DIRECTORY = [
@@ -87,61 +235,34 @@ DOCTOR_SCHEDULES = {
     8: ["08:00 AM", "01:00 PM"],
 }
 
-# Auto-create chat_log.json if missing
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f)
-
-USER_DATA_FILE = "user_data.json"
-
-
-def update_log(edit_id: str, user_input: str, bot_text: str):
-    """Update or append chat log entries."""
-    if os.path.exists(LOG_FILE):
-        try:
-            with open(LOG_FILE, "r", encoding="utf-8") as f:
-                chat_history = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            chat_history = []
-    else:
-        chat_history = []
-
-    found = False
-    for entry in chat_history:
-        if entry.get("id") == edit_id:
-            entry["user"] = user_input
-            entry["bot"] = bot_text
-            entry["timestamp"] = datetime.datetime.now().isoformat()
-            found = True
-            break
-
-    if not found:
-        chat_history.append({
-            "id": edit_id,
-            "user": user_input,
-            "bot": bot_text,
-            "timestamp": datetime.datetime.now().isoformat()
-        })
-
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(chat_history, f, ensure_ascii=False, indent=2)
-
-
-def load_user_data():
-    """Load user data from JSON file."""
-    if os.path.exists(USER_DATA_FILE):
-        try:
-            with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"profile": {}, "appointments": [], "emergency_contacts": [], "medications": []}
-    return {"profile": {}, "appointments": [], "emergency_contacts": [], "medications": []}
-
-
-def save_user_data(data):
-    """Save user data to JSON file."""
-    with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+def _load_doctor_directory():
+    if DOCTOR_DATA:
+        return DoctorDirectory.from_file(DOCTOR_DATA, schedules=DOCTOR_SCHEDULES)
+    return DoctorDirectory(DOCTOR_DIRECTORY, schedules=DOCTOR_SCHEDULES)
+
+def _load_scheduler():
+    slots = SlotScheduler(doctor_directory.instance(), BOOKING_DB, slot_minutes=SLOT_MINUTES)
+    slots.load(item for _, item in user_store.iter_items("appointments"))
+    return slots
+
+# Indexed once, on first use (see doctors.py)
+doctor_directory = Lazy(_load_doctor_directory, "doctors")
+# Slot bookings for every user's appointments (see scheduler.py)
+scheduler = Lazy(_load_scheduler, "scheduler")
+
+def update_log(edit_id: str, user_input: str, bot_text: str, partial: bool = False):
+    """Update or append chat log entries (a superseding record for edits)."""
+    entry = {
+        "id": edit_id,
+        "user": user_input,
+        "bot": bot_text,
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+    if partial:
+        entry["partial"] = True  # streamed reply cut short by a client disconnect
+    with span("chat_log.write"):
+        chat_store.upsert(entry)
+    index_chat_entry(entry)
 
 
 def create_system_instruction(user_data):
@@ -158,7 +279,7 @@ def create_system_instruction(user_data):
     medications_text = ""
     if user_data.get('medications'):
         med_list = [f"{m['name']} ({m['dosage']}, {m['schedule']})" for m in user_data['medications']]
-        medications_text = f"The user is currently taking the following medications: {', '.join(med_list)}."
+        medications_text = f"The user is currently taking the following medications: {join_within(med_list, INSTRUCTION_LIST_TOKENS)}."
 
     emergency_text = ""
     if user_data.get('emergency_contacts'):
@@ -166,7 +287,7 @@ def create_system_instruction(user_data):
         for c in user_data['emergency_contacts']:
             contact_details = [f"{k}: {v}" for k, v in c.items()]
             contact_list.append(f"({', '.join(contact_details)})")
-        emergency_text = f"The user's emergency contacts are: {', '.join(contact_list)}."
+        emergency_text = f"The user's emergency contacts are: {join_within(contact_list, INSTRUCTION_LIST_TOKENS)}."
 
     instruction = (
         "You are HealthBot, a friendly, helpful, and empathetic AI health assistant. "
@@ -183,174 +304,271 @@ def create_system_instruction(user_data):
     return instruction
 
 
-# Initialize Chat
-user_data = load_user_data()
-chat = model.start_chat(
-    history=[
-        {"role": "user", "parts": [create_system_instruction(user_data)]},
-        {"role": "model", "parts": ["I understand my purpose. I'm ready to help!"]}
-    ]
+PROMPT_TOKENS = metrics.registry.histogram(
+    "sehat_prompt_tokens", "Estimated tokens per Gemini chat prompt, by part.", ["part"],
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+prompt_turns_dropped = metrics.registry.counter(
+    "sehat_prompt_turns_dropped_total", "Chat history exchanges dropped to fit PROMPT_MAX_TOKENS.")
+
+
+def record_prompt(sizes):
+    """Prompt size of every chat call, into the metrics."""
+    for part in ("instruction", "history", "message", "total"):
+        PROMPT_TOKENS.observe(sizes[f"{part}_tokens"], part)
+    if sizes["dropped_turns"]:
+        prompt_turns_dropped.inc(amount=sizes["dropped_turns"])
+
+
+def log_stream_prompt(sizes):
+    """Prompt size of a streamed reply; its request line is logged before the model is called."""
+    if METRICS_JSON_LOG:
+        metrics.log_json({"ts": datetime.datetime.now().isoformat(timespec="milliseconds"), "event": "prompt",
+                          "route": "/ask_stream", **sizes})
+
+
+# Initialize Chat: one Gemini chat per session, bounded history, LRU/TTL eviction; the system
+# instruction is rendered into each chat's preamble once per user data version, not sent per message
+chat_sessions = ChatSessionManager(
+    model,
+    create_system_instruction,
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", 500)),
+    idle_ttl=int(os.getenv("CHAT_SESSION_TTL", 1800)),
+    max_turns=int(os.getenv("CHAT_HISTORY_TURNS", 10)),
+    max_prompt_tokens=PROMPT_MAX_TOKENS,
+    report=record_prompt,
 )
 
+# Emergencies are answered before anything else (see emergency.py): keywords are matched on the raw
+# message and the reply is a precomputed per-language bundle, so no model, translator or full data load
+emergency_responder = EmergencyResponder()
+
+WEATHER_TIPS = {
+    'Clear': "It's a beautiful day! Go for a walk and get some natural sunlight. It's great for your mood and Vitamin D.",
+    'Clouds': "A cloudy day is perfect for an indoor workout. Try some light stretches or yoga to stay active.",
+    'Rain': "Stay indoors and hydrate! A warm cup of herbal tea can be very comforting on a rainy day.",
+    'Snow': "If you're going out, remember to bundle up in layers to stay warm. A hot, nutritious soup is a great way to warm up afterwards.",
+    'Mist': "Visibility is low. If you're driving, be extra careful. Inside, take some time for mindfulness and deep breathing.",
+    'default': "The weather is changing. Remember to drink plenty of water and eat a balanced meal to keep your immune system strong."
+}
+
+GREETING = "Hello! I'm Sehat Sethu, your personal health assistant. I can help you manage your health profile, medications, appointments, and more. How can I assist you today?"
+NO_REPLY = "Sorry — I couldn't generate a response right now."
+ERROR_REPLY = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+
+# Fixed strings Telugu sessions are shown; translated into the cache at startup (TRANSLATION_PRELOAD)
+FIXED_STRINGS = [GREETING, NO_REPLY, ERROR_REPLY, *WEATHER_TIPS.values()]
+
+
+def fixed_text(text, lang):
+    """One of FIXED_STRINGS in ``lang`` (a translation cache hit once preloaded); English on failure."""
+    if lang != "te":
+        return text
+    try:
+        return translator.translate(text, tgt='te')
+    except Exception as e:
+        print(f"Translation error (fixed text to te): {e}")
+        return text
+
+# Cache for templated /ask answers (RESPONSE_CACHE_DB enables the on-disk tier)
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 1000)),
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600)),
+    db_path=os.getenv("RESPONSE_CACHE_DB") or None,
+)
+CACHEABLE_INTENTS = {"nutrition", "medicine", "symptoms"}
+
+def translate_input(user_input, lang):
+    """Translate input to English if session language is Telugu."""
+    if lang != "te" or not user_input:
+        return user_input
+    try:
+        with span("translate_in"):
+            return translator.translate(user_input, tgt='en')
+    except Exception as e:
+        print(f"Translation error (to en): {e}")
+        traceback.print_exc()
+        return user_input  # fallback
+
+
+def emergency_fast_reply(user_input, lang):
+    """The emergency reply if the raw (untranslated) message has an emergency keyword, else None."""
+    with span("emergency"):
+        if not emergency_responder.detect(user_input):
+            return None
+        return emergency_bundle(lang)
+
+
+def emergency_bundle(lang):
+    """The emergency reply in ``lang`` with the current user's emergency contacts."""
+    user_id = current_user_id()
+    return emergency_responder.reply(
+        user_id, lang, user_store.get_version(user_id),
+        lambda: user_store.get_user_data(user_id).get("emergency_contacts", []))
+
+
+def emergency_reply(match, lang):
+    """The emergency reply if the routed (translated) intent is an emergency the fast path missed, else None."""
+    if match.intent != "emergency":
+        return None
+    return emergency_bundle(lang)
+
+
+def prepare_emergency_bundle():
+    """Render the current user's bundle after a contact write, rather than on their next emergency."""
+    try:
+        emergency_bundle("en")
+    except Exception as e:
+        print(f"Emergency bundle update failed: {e}")
+
+
+def select_prompt(user_input_en, match):
+    """Build the prompt for a routed (English) message.
+    Returns (intent, prompt, entities) where entities are the matched keywords."""
+    intent, entities = match
+    # Priority order lives in intent_router.KEYWORD_TABLE
+    # 1) Mental health
+    if intent == "mental":
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user is feeling stressed or anxious. "
+            "Provide **3 practical mental health tips** based on the input, each 1-2 sentences. "
+            "Do not repeat previous tips. "
+            "Add a friendly tone and include a disclaimer: "
+            "'This is general advice, not a substitute for professional help.'"
+            f"\nUser input: {user_input_en}"
+        )
+
+    # 2) Nutrition & lifestyle
+    elif intent == "nutrition":
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user asked about nutrition or healthy lifestyle. "
+            "Provide **3 practical tips** based on the input. "
+            "Include simple advice suitable for everyday life. "
+            "Add a friendly disclaimer: 'This is general advice, not a substitute for professional help.'"
+            f"\nUser input: {user_input_en}"
+        )
+
+    # 3) Quiz or tips request
+    elif intent == "quiz/tip":
+        prompt = (
+            "You are HealthBot. Provide a **new health quiz question or tip** for the user. "
+            "Keep it engaging, educational, and safe. "
+            "Do not repeat previous questions. "
+            "Add a short disclaimer if necessary."
+            f"\nUser input: {user_input_en}"
+        )
+
+    # 4) Medicine info
+    elif intent == "medicine":
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user is asking about a medicine. "
+            "Provide general information about the medicine: common uses, typical dosage ranges (if applicable), common side effects, and precautions. "
+            "Keep answers concise (1-2 sentences per item) and include the disclaimer: 'This is general advice, not a substitute for professional help.'"
+            f"\nUser question: {user_input_en}"
+        )
+
+    # 5) Symptom checker
+    elif intent == "symptoms":
+        prompt = (
+            "You are HealthBot, a friendly AI assistant. "
+            "The user described symptoms and wants possible causes and safe home remedies. "
+            "Provide a short list of possible general causes (not diagnoses) and safe at-home measures they can try. "
+            "Add the disclaimer: 'This is general advice, not a substitute for professional help.'"
+            f"\nUser symptoms: {user_input_en}"
+        )
+
+    # 6) Default fallback chat — the system instruction is already the chat's preamble
+    else:
+        intent = "default"
+        prompt = user_input_en
+
+    return intent, prompt, entities
+
+
+def response_cache_key_for(intent, entities, lang, user_input_en):
+    """Cache key for templated questions (one medicine, nutrition topic or single
+    symptom), or None; quiz/tip asks for something new each time."""
+    if intent in CACHEABLE_INTENTS and entities and not (intent == "symptoms" and len(entities) > 1):
+        return response_cache_key(intent, entities, lang, user_input_en)
+    return None
+
+
 # ---------------------------
 # Routes
 # ---------------------------
-@app.route("/")
+@bp.route("/")
 def home():
     return render_template("index.html")
 
-@app.route("/ask", methods=["POST"])
+@bp.route("/ask", methods=["POST"])
 def ask():
     try:
         user_input = request.json.get("message", "").strip()
         incoming_edit_id = request.json.get("edit_id")
         edit_id = str(incoming_edit_id) if incoming_edit_id else None
 
-        # Load latest user data and system instruction
+        lang = session.get("lang", "en")
+
+        # Emergency check first, on the raw input (immediate return)
+        emergency_message = emergency_fast_reply(user_input, lang)
+        if emergency_message:
+            return jsonify({"reply": emergency_message})
+
+        # Load latest user data (the chat's system instruction follows its version)
+        session_id = current_user_id()
         current_user_data = load_user_data()
-        system_instruction = create_system_instruction(current_user_data)
 
-        lang = session.get("lang", "en")
+        user_input_en = translate_input(user_input, lang)
 
-        # Translate input to English if session language is Telugu
-        try:
-            user_input_en = translator.translate(user_input, lang_tgt='en') if (lang == "te" and user_input) else user_input
-        except Exception as e:
-            print(f"Translation error (to en): {e}")
-            traceback.print_exc()
-            user_input_en = user_input  # fallback
-
-        # Emergency check (immediate return)
-        emergency_keywords = ["chest pain", "shortness of breath", "accident", "bleeding", "heart attack"]
-        if any(word in user_input_en.lower() for word in emergency_keywords):
-            emergency_message = (
-                "⚠️ Emergency detected!\n"
-                "Please call 108 immediately for an ambulance.\n"
-                "You are HealthBot, a friendly AI assistant. "
-                "The user is in an emergency. "
-                "Provide **3 emergency situation tips** based on the input, each 1-2 sentences. "
-                "Do not repeat previous tips. "
-                "Add a friendly tone and include a disclaimer: "
-                "'This is general advice, not a substitute for professional help.'"
-            )
-            if lang == "te":
-                try:
-                    emergency_message = translator.translate(emergency_message, lang_tgt='te')
-                except Exception as e:
-                    print(f"Emergency translation error: {e}")
-                    traceback.print_exc()
+        # Emergencies only recognised after translation
+        with span("intent_routing"):
+            match = intent_router.route(user_input_en)
+        emergency_message = emergency_reply(match, lang)
+        if emergency_message:
             return jsonify({"reply": emergency_message})
 
-        bot_text = ""
-        # Priority-ordered checks (mutually exclusive via elif)
-        # 1) Mental health
-        mental_keywords = ["stress", "anxious", "depressed", "sad", "low mood"]
-        if any(k in user_input_en.lower() for k in mental_keywords):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user is feeling stressed or anxious. "
-                "Provide **3 practical mental health tips** based on the input, each 1-2 sentences. "
-                "Do not repeat previous tips. "
-                "Add a friendly tone and include a disclaimer: "
-                "'This is general advice, not a substitute for professional help.'"
-                f"\nUser input: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (mental): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-
-        # 2) Nutrition & lifestyle
-        elif any(word in user_input_en.lower() for word in ["diet", "food", "nutrition", "exercise", "diabetic"]):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user asked about nutrition or healthy lifestyle. "
-                "Provide **3 practical tips** based on the input. "
-                "Include simple advice suitable for everyday life. "
-                "Add a friendly disclaimer: 'This is general advice, not a substitute for professional help.'"
-                f"\nUser input: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (nutrition): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-
-        # 3) Quiz or tips request
-        elif "quiz" in user_input_en.lower() or "tip" in user_input_en.lower():
-            prompt = (
-                "You are HealthBot. Provide a **new health quiz question or tip** for the user. "
-                "Keep it engaging, educational, and safe. "
-                "Do not repeat previous questions. "
-                "Add a short disclaimer if necessary."
-                f"\nUser input: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (quiz/tip): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-
-        # 4) Medicine info
-        elif any(word in user_input_en.lower() for word in ["medicine", "drug", "tablet", "capsule", "paracetamol", "ibuprofen"]):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user is asking about a medicine. "
-                "Provide general information about the medicine: common uses, typical dosage ranges (if applicable), common side effects, and precautions. "
-                "Keep answers concise (1-2 sentences per item) and include the disclaimer: 'This is general advice, not a substitute for professional help.'"
-                f"\nUser question: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (medicine): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-
-        # 5) Symptom checker
-        elif "symptom" in user_input_en.lower() or any(symptom_word in user_input_en.lower() for symptom_word in ["fever", "headache", "cough", "nausea", "fatigue"]):
-            prompt = (
-                "You are HealthBot, a friendly AI assistant. "
-                "The user described symptoms and wants possible causes and safe home remedies. "
-                "Provide a short list of possible general causes (not diagnoses) and safe at-home measures they can try. "
-                "Add the disclaimer: 'This is general advice, not a substitute for professional help.'"
-                f"\nUser symptoms: {user_input_en}"
-            )
-            try:
-                response = chat.send_message(prompt)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (symptoms): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+        intent, prompt, entities = select_prompt(user_input_en, match)
 
-        # 6) Default fallback chat — use system instruction
-        else:
-            formatted_input = f"User: {user_input_en}\nHealthBot instructions: {system_instruction}"
-            try:
-                response = chat.send_message(formatted_input)
-                bot_text = response.text or "Sorry — I couldn't generate a response right now."
-            except Exception as e:
-                print(f"AI response error (default): {e}")
-                traceback.print_exc()
-                bot_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+        cache_key = response_cache_key_for(intent, entities, lang, user_input_en)
+        bot_text = response_cache.get(cache_key) if cache_key else None
 
-        # Translate bot_text to Telugu if needed (done once at end)
-        if lang == "te":
+        if bot_text is None:
+            generated = False
             try:
-                bot_text = translator.translate(bot_text, lang_tgt='te')
+                prompt_sizes = {}  # for this request's JSON log line
+                with span("model_call"):
+                    if cache_key:
+                        # Shared between users: answered outside the personal chat (no profile, no history)
+                        response = gemini_limiter.call(chat_sessions.generate, prompt, on_prompt=prompt_sizes.update)
+                    else:
+                        response = gemini_limiter.call(chat_sessions.send_message, session_id, current_user_data,
+                                                       prompt, on_prompt=prompt_sizes.update)
+                g.prompt = prompt_sizes
+                bot_text = response.text or NO_REPLY
+                generated = bool(response.text)
+                if cache_key and generated:
+                    chat_sessions.add_turn(session_id, current_user_data, prompt, response.text)
+            except UpstreamUnavailable:
+                raise
             except Exception as e:
-                print(f"Translation error (to te): {e}")
+                print(f"AI response error ({intent}): {e}")
                 traceback.print_exc()
-                # keep English if translation fails
+                bot_text = ERROR_REPLY
+
+            # Translate bot_text to Telugu if needed (done once at end)
+            if lang == "te":
+                try:
+                    with span("translate_out"):
+                        bot_text = translator.translate(bot_text, tgt='te')
+                except Exception as e:
+                    print(f"Translation error (to te): {e}")
+                    traceback.print_exc()
+                    generated = False  # keep English if translation fails, but don't cache it
+
+            if cache_key and generated:
+                response_cache.set(cache_key, bot_text)
 
         # Log the conversation (edit or new message)
         if edit_id:
@@ -360,208 +578,448 @@ def ask():
 
         return jsonify({"reply": bot_text})
 
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"Error in ask route: {e}")
         traceback.print_exc()
         return jsonify({"reply": "I'm sorry, I'm experiencing technical difficulties. Please try again later."}), 500
     
-def save_message(user_input, bot_text):
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            history = json.load(f)
-    except:
-        history = []
-
-    history.append({
+def save_message(user_input, bot_text, partial=False):
+    entry = {
         "id": str(datetime.datetime.now().timestamp()),
         "user": user_input,
         "bot": bot_text,
         "timestamp": datetime.datetime.now().isoformat()
-    })
+    }
+    if partial:
+        entry["partial"] = True  # streamed reply cut short by a client disconnect
+    with span("chat_log.write"):
+        chat_store.append(entry)
+    index_chat_entry(entry)
 
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
 
+def sse_event(data, event=None):
+    """Format one Server-Sent Events message."""
+    payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{payload}" if event else payload
 
-@app.route("/get_user_data", methods=["GET"])
-def get_user_data():
-    return jsonify(load_user_data())
 
-@app.route("/get_doctors", methods=["GET"])
+@bp.route("/ask_stream", methods=["POST"])
+def ask_stream():
+    """Streaming variant of /ask over Server-Sent Events.
+
+    Emits ``data: {"delta": ...}`` messages as the model generates text and a
+    final ``event: done`` with the full reply. Telugu replies are translated
+    paragraph by paragraph as each one completes. The chat log is written
+    once at the end, or with ``partial: true`` if the client disconnects.
+    A saturated Gemini limiter gets the same 503/504 as /ask, before any stream.
+    """
+    user_input = request.json.get("message", "").strip()
+    incoming_edit_id = request.json.get("edit_id")
+    edit_id = str(incoming_edit_id) if incoming_edit_id else None
+
+    lang = session.get("lang", "en")
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    def single_reply(text):
+        events = sse_event({"delta": text}) + sse_event({"reply": text}, event="done")
+        return Response(events, mimetype="text/event-stream", headers=headers)
+
+    emergency_message = emergency_fast_reply(user_input, lang)
+    if emergency_message:
+        return single_reply(emergency_message)
+
+    session_id = current_user_id()
+    current_user_data = load_user_data()
+    user_input_en = translate_input(user_input, lang)
+
+    with span("intent_routing"):
+        match = intent_router.route(user_input_en)
+    emergency_message = emergency_reply(match, lang)
+    if emergency_message:
+        return single_reply(emergency_message)
+
+    intent, prompt, entities = select_prompt(user_input_en, match)
+    cache_key = response_cache_key_for(intent, entities, lang, user_input_en)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        if edit_id:
+            update_log(edit_id, user_input, cached)
+        else:
+            save_message(user_input, cached)
+        return single_reply(cached)
+
+    # Taken before the 200 goes out, so a saturated limiter answers 503/504 with
+    # Retry-After (upstream_unavailable) instead of an apology inside the stream
+    release_slot = gemini_limiter.hold()
+
+    def generate():
+        sent = []       # text already pushed to the client (what gets logged)
+        pending = ""    # English text not yet translated (Telugu sessions)
+        completed = False
+        translated = True  # every Telugu paragraph translated (else the reply mixes in English)
+
+        def flush(text, tail=""):
+            nonlocal translated
+            if lang == "te" and text.strip():
+                try:
+                    with span("translate_out"):
+                        text = translator.translate(text, tgt='te')
+                except Exception as e:
+                    print(f"Translation error (stream to te): {e}")
+                    translated = False
+            text += tail
+            sent.append(text)
+            return sse_event({"delta": text})
+
+        if cache_key:
+            # Shared between users: answered outside the personal chat (no profile, no history)
+            chunks = chat_sessions.stream_generate(prompt, on_prompt=log_stream_prompt)
+        else:
+            chunks = chat_sessions.stream_message(session_id, current_user_data, prompt, on_prompt=log_stream_prompt)
+        english = []  # the model's own text, for the chat history
+
+        try:
+            with span("model_stream"):
+                for chunk in chunks:
+                    english.append(chunk)
+                    if lang != "te":
+                        yield flush(chunk)
+                        continue
+                    pending += chunk
+                    *paragraphs, pending = pending.split("\n\n")
+                    for paragraph in paragraphs:
+                        yield flush(paragraph, "\n\n")
+            if pending:
+                yield flush(pending)
+                pending = ""
+            completed = True
+            generated = bool("".join(sent).strip())
+            if not generated:
+                yield flush(NO_REPLY)
+            bot_text = "".join(sent)
+            if cache_key and generated:
+                chat_sessions.add_turn(session_id, current_user_data, prompt, "".join(english))
+                if translated:  # never cache the fallback or a half-English reply
+                    response_cache.set(cache_key, bot_text)
+            yield sse_event({"reply": bot_text}, event="done")
+        except Exception as e:
+            gemini_limiter.count_error()
+            print(f"AI stream error ({intent}): {e}")
+            traceback.print_exc()
+            if not sent:
+                yield flush(ERROR_REPLY)
+                completed = True
+            yield sse_event({"reply": "".join(sent)}, event="done")
+        finally:
+            # Runs on completion and on client disconnect (GeneratorExit)
+            release_slot()
+            bot_text = "".join(sent)
+            if edit_id:
+                update_log(edit_id, user_input, bot_text, partial=not completed)
+            else:
+                save_message(user_input, bot_text, partial=not completed)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+    response.call_on_close(release_slot)  # the generator may never start
+    return response
+
+
+@bp.route("/get_user_data", methods=["GET"])
+def get_user_data():
+    data = load_user_data()
+    etag = f'"{data["version"]}"'
+    if request.if_none_match.contains_weak(str(data["version"])):  # W/ once compressed
+        return "", 304, {"ETag": etag}
+    return jsonify(data), 200, {"ETag": etag}
+
+@bp.route("/sync", methods=["GET"])
+def sync():
+    """Records added/changed/deleted since ``?since=<version>``, by stable record id:
+    {"version", "full": false, "upserts": {collection: [records]}, "deletes": {collection: [ids]}, "profile"?}.
+    Without ``since`` (or with a version this store never reached) the whole document
+    comes back as {"version", "full": true, "data": {...}}."""
+    since = request.args.get("since", type=int)
+    changes = user_store.get_changes(current_user_id(), since)
+    return jsonify({"status": "success", **changes}), 200, {"ETag": f'"{changes["version"]}"'}
+
+@bp.route("/batch", methods=["POST"])
+def batch():
+    """Apply several writes in one transaction: {"ops": [...]} (format: storage.UserStore.apply).
+    All or nothing: a failing op returns its error and position and nothing is written.
+    Honours If-Match. Appointments that book a doctor's slot go through /save_appointment."""
+    ops = (request.get_json(silent=True) or {}).get("ops")
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"status": "error", "message": "'ops' must be a non-empty list"}), 400
+    if len(ops) > BATCH_MAX_OPS:
+        return jsonify({"status": "error", "message": f"At most {BATCH_MAX_OPS} operations per batch"}), 400
+    for n, op in enumerate(ops):
+        item = op.get("item") if isinstance(op, dict) and op.get("collection") == "appointments" else None
+        if isinstance(item, dict) and item.get("doctor_id") and item.get("time"):
+            raise OperationError("Book appointments with a doctor and time via /save_appointment", index=n)
+    version = user_store.apply(current_user_id(), ops, expected_version=expected_version())
+    for op in ops:
+        if op.get("collection") == "appointments" and op["op"] != "add":
+            scheduler.release(op["id"])  # no longer tied to a slot
+    if any(op.get("collection") in REMINDER_KINDS for op in ops):
+        refresh_reminders(version)
+    return saved(f"{len(ops)} operations applied.", version)
+
+@bp.route("/get_doctors", methods=["GET"])
 def get_doctors():
-    doctors = []
-    for doc in DOCTOR_DIRECTORY:
-        doc_info = doc.copy()
-        doc_info["times"] = DOCTOR_SCHEDULES.get(doc["id"], [])
-        doctors.append(doc_info)
-    return jsonify(doctors)
-
-@app.route("/save_profile", methods=["POST"])
+    """All doctors with their times. ``limit``/``offset`` return one page (total in X-Total-Count)."""
+    if "limit" not in request.args and "offset" not in request.args:
+        return Response(doctor_directory.all_json(), mimetype="application/json")
+    limit, offset = page_args(default_limit=DOCTOR_PAGE_MAX)
+    return jsonify(doctor_directory.page(limit, offset)), 200, {"X-Total-Count": str(len(doctor_directory.instance()))}
+
+def page_args(default_limit=20):
+    """limit/offset query params, clamped to sane bounds."""
+    try:
+        limit = int(request.args.get("limit", default_limit))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        limit, offset = default_limit, 0
+    return max(1, min(limit, DOCTOR_PAGE_MAX)), max(0, offset)
+
+@bp.route("/save_profile", methods=["POST"])
 def save_profile():
-    data = load_user_data()
-    profile_data = request.json
-    data["profile"] = profile_data
-    save_user_data(data)
-    return jsonify({"status": "success", "message": "Profile saved!"})
+    version = user_store.save_profile(current_user_id(), request.json, expected_version=expected_version())
+    return saved("Profile saved!", version)
 
 
-@app.route("/save_medication", methods=["POST"])
+@bp.route("/save_medication", methods=["POST"])
 def save_medication():
     """Adds a new medication."""
-    data = load_user_data()
-    medication = request.json
-    if "medications" not in data:
-        data["medications"] = []
-    data["medications"].append(medication)
-    save_user_data(data)
-    return jsonify({"status": "success", "message": "Medication added!"})
+    version = user_store.add_item(current_user_id(), "medications", request.json, expected_version=expected_version())
+    refresh_reminders(version)
+    return saved("Medication added!", version)
 
 
-@app.route("/update_medication/<int:index>", methods=["PUT"])
+@bp.route("/update_medication/<int:index>", methods=["PUT"])
 def update_medication(index):
     """Updates an existing medication by its index."""
-    data = load_user_data()
-    updated_medication = request.json
-    if 0 <= index < len(data.get("medications", [])):
-        data["medications"][index] = updated_medication
-        save_user_data(data)
-        return jsonify({"status": "success", "message": "Medication updated."})
+    version = user_store.update_item_at(current_user_id(), "medications", index, request.json, expected_version=expected_version())
+    if version:
+        refresh_reminders(version)
+        return saved("Medication updated.", version)
     return jsonify({"status": "error", "message": "Medication not found."}), 404
 
 
-@app.route("/delete_medication/<int:index>", methods=["DELETE"])
+@bp.route("/delete_medication/<int:index>", methods=["DELETE"])
 def delete_medication(index):
     """Deletes a medication by its index."""
-    data = load_user_data()
-    if 0 <= index < len(data.get("medications", [])):
-        data["medications"].pop(index)
-        save_user_data(data)
-        return jsonify({"status": "success", "message": "Medication deleted."})
+    version = user_store.delete_item_at(current_user_id(), "medications", index, expected_version=expected_version())
+    if version:
+        refresh_reminders(version)
+        return saved("Medication deleted.", version)
     return jsonify({"status": "error", "message": "Medication not found."}), 404
 
 
-@app.route("/save_emergency_contact", methods=["POST"])
+@bp.route("/save_emergency_contact", methods=["POST"])
 def save_emergency_contact():
     """Adds a new emergency contact, including custom fields."""
-    data = load_user_data()
-    contact = request.json
-    if "emergency_contacts" not in data:
-        data["emergency_contacts"] = []
-    data["emergency_contacts"].append(contact)
-    save_user_data(data)
-    return jsonify({"status": "success", "message": "Emergency contact added!"})
+    version = user_store.add_item(current_user_id(), "emergency_contacts", request.json, expected_version=expected_version())
+    prepare_emergency_bundle()
+    return saved("Emergency contact added!", version)
 
 
-@app.route("/update_emergency_contact/<int:index>", methods=["PUT"])
+@bp.route("/update_emergency_contact/<int:index>", methods=["PUT"])
 def update_emergency_contact(index):
     """Updates an existing emergency contact by its index."""
-    data = load_user_data()
-    updated_contact = request.json
-    if 0 <= index < len(data.get("emergency_contacts", [])):
-        data["emergency_contacts"][index] = updated_contact
-        save_user_data(data)
-        return jsonify({"status": "success", "message": "Emergency contact updated."})
+    version = user_store.update_item_at(current_user_id(), "emergency_contacts", index, request.json, expected_version=expected_version())
+    if version:
+        prepare_emergency_bundle()
+        return saved("Emergency contact updated.", version)
     return jsonify({"status": "error", "message": "Emergency contact not found."}), 404
 
 
-@app.route("/delete_emergency_contact/<int:index>", methods=["DELETE"])
+@bp.route("/delete_emergency_contact/<int:index>", methods=["DELETE"])
 def delete_emergency_contact(index):
     """Deletes an emergency contact by its index."""
-    data = load_user_data()
-    if 0 <= index < len(data.get("emergency_contacts", [])):
-        data["emergency_contacts"].pop(index)
-        save_user_data(data)
-        return jsonify({"status": "success", "message": "Emergency contact deleted."})
+    version = user_store.delete_item_at(current_user_id(), "emergency_contacts", index, expected_version=expected_version())
+    if version:
+        prepare_emergency_bundle()
+        return saved("Emergency contact deleted.", version)
     return jsonify({"status": "error", "message": "Emergency contact not found."}), 404
 
-def find_appointment_index_by_id(appointments, appt_id):
-    for idx, appt in enumerate(appointments):
-        if "id" in appt and appt["id"] == appt_id:
-            return idx
-    return None
-
-@app.route("/save_appointment", methods=["POST"])
+@bp.route("/save_appointment", methods=["POST"])
 def save_appointment():
-    data = load_user_data()
+    """Add an appointment. With doctor_id + time the slot is booked (409 if taken);
+    ``date`` defaults to the slot's next occurrence."""
     appointment = request.json or {}
-    if "appointments" not in data:
-        data["appointments"] = []
     appointment["id"] = str(uuid.uuid4())
-    data["appointments"].append(appointment)
-    save_user_data(data)
-    return jsonify({"status": "success", "message": "Appointment added!"})
-
-@app.route("/update_appointment/<appt_id>", methods=["PUT"])
+    user_id, expected = current_user_id(), expected_version()
+    try:
+        version = book_appointment(
+            appointment, lambda: user_store.add_item(user_id, "appointments", appointment, expected_version=expected))
+    except SlotError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status
+    refresh_reminders(version)
+    return saved("Appointment added!", version, appointment=appointment)
+
+@bp.route("/update_appointment/<appt_id>", methods=["PUT"])
 def update_appointment(appt_id):
-    data = load_user_data()
-    appointments = data.get("appointments", [])
-    idx = find_appointment_index_by_id(appointments, appt_id)
-    if idx is not None:
-        updated_appointment = request.json or {}
-        updated_appointment["id"] = appt_id  # Preserve id
-        appointments[idx] = updated_appointment
-        save_user_data(data)
-        return jsonify({"status": "success", "message": "Appointment updated."})
-    return jsonify({"status": "error", "message": "Appointment not found."}), 404
+    updated_appointment = request.json or {}
+    updated_appointment["id"] = appt_id  # Preserve id
+    user_id, expected = current_user_id(), expected_version()
+
+    def commit():
+        version = user_store.update_item_by_id(user_id, "appointments", appt_id, updated_appointment,
+                                               expected_version=expected)
+        if not version:
+            raise SlotError("Appointment not found.", status=404)
+        return version
+
+    try:
+        version = book_appointment(updated_appointment, commit)
+    except SlotError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status
+    refresh_reminders(version)
+    return saved("Appointment updated.", version)
 
-@app.route("/delete_appointment/<appt_id>", methods=["DELETE"])
+@bp.route("/delete_appointment/<appt_id>", methods=["DELETE"])
 def delete_appointment(appt_id):
-    data = load_user_data()
-    appointments = data.get("appointments", [])
-    idx = find_appointment_index_by_id(appointments, appt_id)
-    if idx is not None:
-        appointments.pop(idx)
-        save_user_data(data)
-        return jsonify({"status": "success", "message": "Appointment deleted."})
+    version = user_store.delete_item_by_id(current_user_id(), "appointments", appt_id,
+                                           expected_version=expected_version())
+    if version:
+        scheduler.release(appt_id)
+        refresh_reminders(version)
+        return saved("Appointment deleted.", version)
     return jsonify({"status": "error", "message": "Appointment not found."}), 404
 
+def book_appointment(appointment, commit):
+    """Reserve the appointment's slot (if it names a doctor and time) and run
+    ``commit`` while holding it; returns what ``commit`` returned. Raises
+    SlotError (or VersionConflict from ``commit``); nothing is kept on failure."""
+    if not (appointment.get("doctor_id") and appointment.get("time")):
+        result = commit()
+        scheduler.release(appointment["id"])  # no longer tied to a slot
+        return result
+    doctor_id, day, start = scheduler.resolve(appointment)
+    appointment["date"] = day
+    committed = []
+    scheduler.book(appointment["id"], doctor_id, day, start, commit=lambda: committed.append(commit()))
+    return committed[0]
+
+@bp.route("/available_slots", methods=["GET"])
+def available_slots():
+    """Next free slots across doctors.
+    Query params: specialty, location, q (as /find_doctors) or doctor_id; n (default 10, max 50).
+    """
+    try:
+        n = max(1, min(int(request.args.get("n", 10)), 50))
+    except ValueError:
+        n = 10
+    doctor_id = request.args.get("doctor_id")
+    if doctor_id:
+        doctor = scheduler.doctor(doctor_id)
+        if doctor is None:
+            return jsonify({"status": "error", "message": "Unknown doctor"}), 404
+        doctors = [doctor]
+    else:
+        doctors, _ = doctor_directory.search(q=request.args.get("q"), specialty=request.args.get("specialty"),
+                                             location=request.args.get("location"), limit=DOCTOR_PAGE_MAX)
+    return jsonify({"status": "success", "slots": scheduler.next_free_slots(doctors, n)})
+
 
-@app.route("/set_language", methods=["POST"])
+@bp.route("/set_language", methods=["POST"])
 def set_language():
     """Set the language preference for the session."""
     lang = request.json.get("language", "en")
     session["lang"] = lang
     return jsonify({"status": "success", "message": f"Language set to {lang}"})
 
-@app.route("/get_chat_history", methods=["GET"])
+@bp.route("/get_chat_history", methods=["GET"])
 def get_chat_history():
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            history = json.load(f)
-    except:
-        history = []
-
-    greeting = "Hello! I'm Sehat Sethu, your personal health assistant. I can help you manage your health profile, medications, appointments, and more. How can I assist you today?"
+    """Recent chat entries, newest page first.
+    Query params:
+      - limit: page size (default 50, max 200)
+      - days: time window (default 5, max 36500; only the last CHAT_HOT_DAYS are kept here, see /export_chat)
+      - before: entry id cursor from a previous page's next_before
+    """
+    greeting = GREETING
 
     # Append greeting only if no messages or no existing greeting
-    if len(history) == 0 or not any(h.get("bot") == greeting for h in history):
-        history.append({
+    if len(chat_store.instance()) == 0 or not any(h.get("bot") == greeting for h in chat_store.system_entries()):
+        index_chat_entry(chat_store.append({
             "id": str(datetime.datetime.now().timestamp()),
             "user": "",
             "bot": greeting,
             "timestamp": datetime.datetime.now().isoformat()
-        })
-        with open(LOG_FILE, "w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-
-    # Filter the chats from last 5 days
-    five_days_ago = datetime.datetime.now() - datetime.timedelta(days=5)
-    filtered_history = [h for h in history if "timestamp" in h and datetime.datetime.fromisoformat(h["timestamp"]) >= five_days_ago]
-    
-    # Limit to last 50 messages
-    filtered_history = filtered_history[-50:]
-    return jsonify({"status": "success", "history": filtered_history})
-
-@app.route('/uploads/<path:filename>', methods=["GET"])
+        }))
+
+    limit = max(1, min(request.args.get("limit", 50, type=int), 200))
+    days = max(0, min(request.args.get("days", 5, type=int), 36500))  # timedelta overflows past ~2.7M days
+    before = request.args.get("before") or None
+
+    # Only the chats from the last `days` days, at most `limit` of them
+    since = datetime.datetime.now() - datetime.timedelta(days=days)
+    with span("chat_log.read"):
+        history, next_before = chat_store.recent(since=since, limit=limit, before=before)
+    if session.get("lang") == "te":  # the log keeps the English greeting
+        history = [{**h, "bot": fixed_text(GREETING, "te")} if not h.get("user") and h.get("bot") == GREETING else h
+                   for h in history]
+    return jsonify({"status": "success", "history": history, "next_before": next_before})
+
+@bp.route("/search_chat", methods=["GET"])
+def search_chat():
+    """Ranked full-text search over past chats (English and Telugu).
+    Query params: q; limit (default 20) / offset; sort = relevance (default) | recent.
+    Hits carry the entry id, timestamp and **-marked snippets; ``total`` stops counting
+    at 2000 (ChatSearchIndex.rank_window: only the newest matches are ranked)."""
+    query = (request.args.get("q") or "").strip()
+    sort = request.args.get("sort", "relevance")
+    if not query or sort not in CHAT_SEARCH_SORTS:
+        return jsonify({"status": "error", "message": "Give a 'q' (and sort = relevance or recent)"}), 400
+    limit, offset = page_args()
+    with span("chat_search.query"):
+        hits, total = chat_search.search(query, limit=limit, offset=offset, sort=sort)
+    return jsonify({"status": "success", "results": hits, "total": total, "limit": limit, "offset": offset})
+
+def parse_time_arg(name):
+    """Epoch seconds from an ISO date/datetime query param (None if absent); ValueError if malformed."""
+    value = request.args.get(name)
+    return datetime.datetime.fromisoformat(value).timestamp() if value else None
+
+@bp.route("/export_chat", methods=["GET"])
+def export_chat():
+    """Download the whole chat history, archived segments included, as NDJSON (oldest first).
+    Query params: since / until = ISO date or datetime (optional; until is exclusive).
+    Streamed one entry at a time, so the archive is never loaded into memory."""
+    try:
+        since, until = parse_time_arg("since"), parse_time_arg("until")
+    except ValueError:
+        return jsonify({"status": "error", "message": "'since' and 'until' must be ISO dates"}), 400
+    entries = chat_archive.export(chat_store.instance(), since, until)
+    lines = (json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson",
+                    headers={"Content-Disposition": 'attachment; filename="chat_export.jsonl"'})
+
+@bp.route("/chat_archive", methods=["GET"])
+def chat_archive_stats():
+    """Archive segments, size, retention settings and the last maintenance run."""
+    return jsonify(chat_archive.stats())
+
+@bp.route('/uploads/<path:filename>', methods=["GET"])
 def serve_uploaded_file(filename):
-    """Serve files saved in the uploads directory."""
-    return send_from_directory(UPLOAD_DIR, filename, as_attachment=False)
-
-@app.route("/clear_chat", methods=["POST"])
+    """Serve files saved in the uploads directory.
+    Content-addressed uploads never change, so they get a hash ETag and are cacheable forever."""
+    if not uploads.is_content_addressed(filename):
+        return send_from_directory(UPLOAD_DIR, filename, as_attachment=False)
+    response = send_from_directory(UPLOAD_DIR, filename, as_attachment=False, etag=False, max_age=31536000)
+    response.set_etag(filename.split(".", 1)[0])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@bp.route("/clear_chat", methods=["POST"])
 def clear_chat():
-    """Clear chat history and start new chat."""
+    """Delete the whole chat history (archived chats and their search hits included) and
+    start a new chat. Use /export_chat first to keep a copy."""
     try:
-        greeting = "Hello! I'm Sehat Sethu, your personal health assistant. I can help you manage your health profile, medications, appointments, and more. How can I assist you today?"
+        greeting = GREETING
         
         history = [{
             "id": str(datetime.datetime.now().timestamp()),
@@ -570,25 +1028,127 @@ def clear_chat():
             "timestamp": datetime.datetime.now().isoformat()
         }]
 
-        with open(LOG_FILE, "w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
+        # Health conversations: a clear deletes them, it doesn't archive them
+        chat_archive.clear(chat_store.instance(), history)
+        chat_search.reset(history)
+        chat_sessions.reset(current_user_id())
 
         return jsonify({"status": "success", "message": "Chat cleared"})
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-@app.route("/get_weather_tip", methods=["GET"])
+@bp.app_errorhandler(VersionConflict)
+def version_conflict(e):
+    """If-Match named an old version: the client should reload (the current ETag is sent) and retry."""
+    body = {"status": "error", "message": str(e), "version": e.current}
+    return jsonify(body), e.status, {"ETag": f'"{e.current}"'}
+
+@bp.app_errorhandler(OperationError)
+def operation_error(e):
+    body = {"status": "error", "message": str(e)}
+    if e.index is not None:
+        body["op"] = e.index
+    return jsonify(body), e.status
+
+@bp.app_errorhandler(UpstreamUnavailable)
+def upstream_unavailable(e):
+    """Fail fast when Gemini/translator are saturated or too slow (503/504)."""
+    print(f"Upstream unavailable: {e}")
+    body = {"status": "error", "reply": "HealthBot is busy right now. Please try again in a moment.", "message": str(e)}
+    return jsonify(body), e.status, {"Retry-After": "2"}
+
+# ---------------------------
+# Metrics
+# ---------------------------
+REQUEST_SECONDS = metrics.registry.histogram(
+    "sehat_http_request_duration_seconds", "Request handling time (streamed bodies: time to first byte).",
+    ["route", "method", "status"])
+
+
+def _limiter_stats():
+    return {limiter.name: limiter.stats() for limiter in (gemini_limiter, translate_limiter)}
+
+
+def _cache_stats():
+    return {"response": response_cache.stats(), "translation": translator.stats(), "ocr": ocr_cache.stats()}
+
+
+metrics.registry.gauge(
+    "sehat_upstream_errors_total", "Outbound calls that failed, by upstream and kind.", ["upstream", "kind"],
+    lambda: {(name, kind): stats[key] for name, stats in _limiter_stats().items()
+             for kind, key in (("error", "errors"), ("rejected", "rejected"), ("timeout", "timed_out"))},
+    kind="counter")
+metrics.registry.gauge(
+    "sehat_upstream_in_flight", "Outbound calls running or waiting for a slot.", ["upstream", "state"],
+    lambda: {(name, state): stats[state] for name, stats in _limiter_stats().items() for state in ("active", "waiting")})
+metrics.registry.gauge(
+    "sehat_cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"],
+    lambda: {(name, result): stats[key] for name, stats in _cache_stats().items()
+             for result, key in (("hit", "hits"), ("miss", "misses"))},
+    kind="counter")
+metrics.registry.gauge(
+    "sehat_cache_hit_ratio", "Cache hit ratio since start.", ["cache"],
+    lambda: {(name,): stats["hit_ratio"] for name, stats in _cache_stats().items()})
+metrics.registry.gauge(
+    "sehat_compressed_response_bytes_total", "Size of compressed responses before and after compression.", ["stage"],
+    lambda: {("raw",): compressor.bytes_in, ("sent",): compressor.bytes_out}, kind="counter")
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.start_trace()
+
+@bp.after_app_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    stages = metrics.end_trace()
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(elapsed, route, request.method, str(response.status_code))
+    if METRICS_JSON_LOG and route != "/metrics":
+        metrics.log_json({
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in stages.items()},
+            **({"prompt": g.prompt} if "prompt" in g else {}),
+        })
+    return response
+
+compressor = ResponseCompressor(min_bytes=COMPRESS_MIN_BYTES)
+
+@bp.after_app_request
+def compress_response(response):
+    if COMPRESS_MIN_BYTES:
+        compressor.apply(response, request.headers.get("Accept-Encoding"))
+    return response
+
+@bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text format: request/stage histograms, upstream errors, cache hit ratios."""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/upstream_stats", methods=["GET"])
+def upstream_stats():
+    """Concurrency, queue depth and rejection counters for outbound calls."""
+    return jsonify({"status": "success", "gemini": gemini_limiter.stats(), "translate": translate_limiter.stats()})
+
+@bp.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters for the /ask response and translation caches."""
+    return jsonify({"status": "success", "response_cache": response_cache.stats(), "translation_cache": translator.stats(),
+                    "ocr_cache": ocr_cache.stats()})
+
+@bp.route("/get_weather_tip", methods=["GET"])
 def get_weather_tip():
     """Fetches weather data for a location and provides a relevant health tip."""
-    tips = {
-        'Clear': "It's a beautiful day! Go for a walk and get some natural sunlight. It's great for your mood and Vitamin D.",
-        'Clouds': "A cloudy day is perfect for an indoor workout. Try some light stretches or yoga to stay active.",
-        'Rain': "Stay indoors and hydrate! A warm cup of herbal tea can be very comforting on a rainy day.",
-        'Snow': "If you're going out, remember to bundle up in layers to stay warm. A hot, nutritious soup is a great way to warm up afterwards.",
-        'Mist': "Visibility is low. If you're driving, be extra careful. Inside, take some time for mindfulness and deep breathing.",
-        'default': "The weather is changing. Remember to drink plenty of water and eat a balanced meal to keep your immune system strong."
-    }
+    tips = WEATHER_TIPS
 
     try:
         # Mocking a real weather API call for a simple example.
@@ -596,25 +1156,28 @@ def get_weather_tip():
         # and get the user's location.
         mock_weather_data = {'weather': [{'main': 'Clear'}]}
         condition = mock_weather_data['weather'][0]['main']
-        tip = tips.get(condition, tips['default'])
+        tip = fixed_text(tips.get(condition, tips['default']), session.get("lang", "en"))
         return jsonify({"tip": tip})
     except Exception as e:
         print(f"Error fetching weather data: {e}")
         return jsonify({"tip": tips['default']}), 500
 
-@app.route("/find_doctors", methods=["GET"])
+@bp.route("/find_doctors", methods=["GET"])
 def find_doctors():
-    """Find doctors by specialty and optional location query params.
+    """Find doctors by specialty, location and/or free text.
     Query params:
-      - specialty: string (required)
+      - specialty: string (prefix match; required unless q is given)
       - location: string (optional, fallback to profile location if present)
+      - q: free-text, typo-tolerant search over name/specialty/location/hospital (ranked)
+      - limit, offset: pagination (default 20 per page)
     """
     try:
         specialty = (request.args.get("specialty") or "").strip().lower()
         location = (request.args.get("location") or "").strip().lower()
+        query = (request.args.get("q") or "").strip()
 
-        if not specialty:
-            return jsonify({"status": "error", "message": "specialty is required"}), 400
+        if not specialty and not query:
+            return jsonify({"status": "error", "message": "specialty or q is required"}), 400
 
         # Fallback to user profile location if not provided
         if not location:
@@ -622,16 +1185,9 @@ def find_doctors():
             profile_loc = (user.get("profile", {}).get("location") or user.get("profile", {}).get("city") or "").strip().lower()
             location = profile_loc
 
-        matches = []
-        for doc in DOCTOR_DIRECTORY:
-            if doc["specialty"].lower().startswith(specialty):
-                if location:
-                    if location in doc["location"].lower():
-                        matches.append(doc)
-                else:
-                    matches.append(doc)
-
-        return jsonify({"status": "success", "doctors": matches})
+        limit, offset = page_args()
+        matches, total = doctor_directory.search(q=query, specialty=specialty, location=location, limit=limit, offset=offset)
+        return jsonify({"status": "success", "doctors": matches, "total": total, "limit": limit, "offset": offset})
     except Exception as e:
         print(f"/find_doctors error: {e}")
         return jsonify({"status": "error", "message": "Failed to find doctors"}), 500
@@ -640,61 +1196,441 @@ def find_doctors():
 # ---------------------------
 # OCR: Image to text
 # ---------------------------
-@app.route("/image_to_text", methods=["POST"])
+OCR_PROMPT = (
+    "Extract all readable text from this image."
+    " If the image contains tables or receipts, read line-by-line in natural order."
+    " Return plain text only, no extra commentary."
+)
+# Results are cached per (image hash, prompt version); editing the prompt starts a fresh cache
+OCR_PROMPT_VERSION = prompt_version(OCR_PROMPT, GEMINI_MODEL_NAME)
+ocr_cache = Lazy(lambda: OcrCache(OCR_CACHE_DB, max_entries=int(os.getenv("OCR_CACHE_SIZE", 10000))), "ocr_cache")
+
+
+def extract_text(saved_path, sha256, mime_type, strict=False):
+    """OCR a stored upload; repeats are answered from the OCR cache.
+    Returns (text, cached). With ``strict`` model errors are raised instead of
+    returning empty text (background jobs retry them)."""
+    cached = ocr_cache.get(sha256, OCR_PROMPT_VERSION)
+    if cached is not None:
+        return cached, True
+
+    # Gemini expects inline data parts for images (downscaled/recompressed when possible)
+    with span("ocr_prepare"):
+        if OCR_MAX_SIDE:
+            content, mime_type = uploads.prepare_for_model(saved_path, mime_type, max_side=OCR_MAX_SIDE)
+        else:
+            with open(saved_path, "rb") as f:
+                content = f.read()
+    parts = [
+        {"mime_type": mime_type, "data": content}
+    ]
+
+    try:
+        with span("ocr_model_call"):
+            response = gemini_limiter.call(vision_model.generate_content, [
+                {"text": OCR_PROMPT},
+                {"inline_data": parts[0]}
+            ])
+        extracted = (response.text or "").strip()
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        if strict:
+            raise
+        print(f"Vision API error: {e}")
+        extracted = ""
+
+    if extracted:
+        ocr_cache.put(sha256, OCR_PROMPT_VERSION, extracted)
+    return extracted, False
+
+
+def store_image(file):
+    """Persist an uploaded file (streamed in chunks, named by its SHA-256).
+    Returns (filename, sha256, mime_type); raises uploads.UploadError."""
+    original_filename = secure_filename(file.filename or "uploaded_image")
+    _, ext = os.path.splitext(original_filename)
+    safe_filename, sha256, _ = uploads.save_upload(file.stream, UPLOAD_DIR, ext, UPLOAD_MAX_BYTES)
+    return safe_filename, sha256, file.mimetype or "image/jpeg"
+
+
+def run_ocr_job(payload):
+    """Job handler for async/batch OCR."""
+    extracted, cached = extract_text(os.path.join(UPLOAD_DIR, payload["filename"]), payload["sha256"],
+                                     payload["mime_type"], strict=True)
+    return {"text": extracted, "location": f"/uploads/{payload['filename']}", "cached": cached}
+
+
+def is_transient_error(e):
+    """Upstream failures worth retrying: limiter rejections/timeouts, Gemini 5xx/429/deadline."""
+    if isinstance(e, UpstreamUnavailable):
+        return True
+    from google.api_core import exceptions as google_exceptions
+    return isinstance(e, (google_exceptions.ServiceUnavailable, google_exceptions.TooManyRequests,
+                          google_exceptions.DeadlineExceeded, google_exceptions.InternalServerError))
+
+
+def _load_job_queue():
+    # Transient upstream failures are retried with backoff; anything else fails the job
+    queue = JobQueue(
+        JOB_DB,
+        workers=int(os.getenv("JOB_WORKERS", 4)),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 3)),
+        backoff=float(os.getenv("JOB_RETRY_BACKOFF", 2)),
+        retry_on=is_transient_error,
+    )
+    queue.register("ocr", run_ocr_job)
+    queue.register("reminder_webhook", send_reminder_webhook)
+    return queue
+
+# Created on first use; the workers are started by start_background
+job_queue = Lazy(_load_job_queue, "jobs")
+
+
+@bp.route("/image_to_text", methods=["POST"])
 def image_to_text():
     try:
         if 'image' not in request.files:
             return jsonify({"error": "No image provided"}), 400
 
         file = request.files['image']
-        # Persist the uploaded file to disk
-        original_filename = secure_filename(file.filename or "uploaded_image")
-        timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        base, ext = os.path.splitext(original_filename)
-        safe_filename = f"{base}_{timestamp_str}{ext or '.bin'}"
+        try:
+            safe_filename, sha256, mime_type = store_image(file)
+        except uploads.UploadError as e:
+            return jsonify({"error": str(e)}), e.status
         saved_path = os.path.join(UPLOAD_DIR, safe_filename)
-        content = file.read()
-        with open(saved_path, "wb") as out_f:
-            out_f.write(content)
-        if not content:
-            return jsonify({"error": "Empty file"}), 400
 
-        # Gemini expects inline data parts for images
-        parts = [
-            {"mime_type": file.mimetype or "image/jpeg", "data": content}
-        ]
+        if request.args.get("async") == "1":
+            job_id = job_queue.submit("ocr", {"filename": safe_filename, "sha256": sha256, "mime_type": mime_type})
+            return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}", "location": f"/uploads/{safe_filename}"}), 202
 
-        prompt = (
-            "Extract all readable text from this image."
-            " If the image contains tables or receipts, read line-by-line in natural order."
-            " Return plain text only, no extra commentary."
-        )
-
-        try:
-            response = vision_model.generate_content([
-                {"text": prompt},
-                {"inline_data": parts[0]}
-            ])
-            extracted = (response.text or "").strip()
-        except Exception as e:
-            print(f"Vision API error: {e}")
-            extracted = ""
+        extracted, cached = extract_text(saved_path, sha256, mime_type)
 
         # Public URL path for the saved file (served by /uploads/<filename>)
         file_location = f"/uploads/{safe_filename}"
-        return jsonify({"text": extracted or "", "location": file_location})
+        return jsonify({"text": extracted or "", "location": file_location, "cached": cached})
+    except (UpstreamUnavailable, HTTPException):  # e.g. 413 for a body over MAX_CONTENT_LENGTH
+        raise
     except Exception as e:
         print(f"/image_to_text error: {e}")
         return jsonify({"error": "Failed to process image"}), 500
     
-@app.route("/clear_chat_history", methods=["POST"])
+@bp.route("/ocr_jobs", methods=["POST"])
+def submit_ocr_jobs():
+    """Queue OCR for several images ("images" form field); returns job ids immediately."""
+    files = request.files.getlist("images") or request.files.getlist("image")
+    if not files:
+        return jsonify({"error": "No image provided"}), 400
+    if len(files) > OCR_BATCH_MAX:
+        return jsonify({"error": f"Too many images (max {OCR_BATCH_MAX})"}), 400
+
+    payloads = []
+    for file in files:
+        try:
+            safe_filename, sha256, mime_type = store_image(file)
+        except uploads.UploadError as e:
+            return jsonify({"error": f"{file.filename}: {e}"}), e.status
+        payloads.append({"filename": safe_filename, "sha256": sha256, "mime_type": mime_type})
+
+    batch_id = uuid.uuid4().hex
+    job_ids = job_queue.submit_many("ocr", payloads, batch_id=batch_id)
+    return jsonify({
+        "batch_id": batch_id,
+        "status_url": f"/jobs?batch={batch_id}",
+        "jobs": [{"job_id": job_id, "status_url": f"/jobs/{job_id}", "location": f"/uploads/{p['filename']}"}
+                 for job_id, p in zip(job_ids, payloads)],
+    }), 202
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Job status/result; ``?wait=N`` long-polls up to N seconds for it to finish."""
+    wait = min(request.args.get("wait", 0.0, type=float), 30.0)  # unparseable -> 0 (no wait)
+    job = job_queue.wait(job_id, timeout=wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job)
+
+@bp.route("/jobs", methods=["GET"])
+def get_jobs():
+    """All jobs of one batch: /jobs?batch=<batch_id>."""
+    batch_id = request.args.get("batch")
+    if not batch_id:
+        return jsonify({"status": "error", "message": "batch is required"}), 400
+    jobs = job_queue.get_batch(batch_id)
+    if not jobs:
+        return jsonify({"status": "error", "message": "Batch not found"}), 404
+    return jsonify({"batch_id": batch_id, "done": all(j["status"] in FINAL_JOB_STATES for j in jobs), "jobs": jobs})
+
+@bp.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Subscribe to a job over Server-Sent Events: status changes, then ``event: done``."""
+    if job_queue.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    def generate():
+        last_status = None
+        job = job_queue.get(job_id)
+        deadline = time.monotonic() + 300
+        while time.monotonic() < deadline:
+            if job["status"] in FINAL_JOB_STATES:
+                yield sse_event(job, event="done")
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield sse_event({"status": last_status, "attempts": job["attempts"]})
+            else:
+                yield ": keep-alive\n\n"
+            job = job_queue.wait(job_id, timeout=15)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@bp.route("/job_stats", methods=["GET"])
+def job_stats():
+    """Job counts by status and queue/run timings."""
+    return jsonify({"status": "success", "jobs": job_queue.stats()})
+
+@bp.route("/ocr_text/<path:filename>", methods=["GET"])
+def ocr_text(filename):
+    """OCR text previously extracted for /uploads/<filename>, without calling the model."""
+    path = os.path.join(UPLOAD_DIR, secure_filename(filename))
+    if not os.path.isfile(path):
+        return jsonify({"status": "error", "message": "File not found"}), 404
+    text = ocr_cache.get_for_file(path, OCR_PROMPT_VERSION)
+    if text is None:
+        return jsonify({"status": "error", "message": "No OCR result for this file"}), 404
+    return jsonify({"status": "success", "text": text, "location": f"/uploads/{secure_filename(filename)}"})
+
+@bp.route("/clear_chat_history", methods=["POST"])
 def clear_chat_history():
     # reuse the same behavior as /clear_chat
     return clear_chat()
 
+# ---------------------------
+# Reminders: medication schedules and appointments
+# ---------------------------
+def reminder_user(user_id):
+    """Reminders follow the storage document: one per session with sqlite, one shared one with json."""
+    return user_id if STORAGE_BACKEND == "sqlite" and user_id else DEFAULT_USER_ID
+
+
+def log_reminder(reminder):
+    metrics.log_json({"ts": datetime.datetime.now().isoformat(timespec="milliseconds"), "event": "reminder", **reminder})
+
+
+def send_reminder_webhook(payload):
+    """Job handler: POST one reminder to REMINDER_WEBHOOK_URL (stand-in for an SMS/push gateway)."""
+    req = urllib.request.Request(REMINDER_WEBHOOK_URL, data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return {"status": response.status}
+    except urllib.error.HTTPError as e:
+        if e.code < 500 and e.code != 429:
+            raise  # the hook rejected it; retrying won't help
+        raise UpstreamUnavailable("reminder_webhook", f"HTTP {e.code}")
+    except (urllib.error.URLError, TimeoutError) as e:
+        raise UpstreamUnavailable("reminder_webhook", str(e))
+
+
+# Where fired reminders go (after this process won the claim); SSE streams read the outbox
+reminder_sinks = [log_reminder]
+if REMINDER_WEBHOOK_URL:
+    reminder_sinks.append(lambda reminder: job_queue.submit("reminder_webhook", reminder))
+reminders_fired = metrics.registry.counter("sehat_reminders_fired_total", "Reminders delivered, by kind.", ["kind"])
+reminder_feed = threading.Condition()  # wakes this process's SSE streams when it fires one
+
+
+def dispatch_reminder(reminder):
+    if not reminder_outbox.claim(reminder):
+        return  # another worker process delivered it
+    reminders_fired.inc(reminder["kind"])
+    for sink in reminder_sinks:
+        try:
+            sink(reminder)
+        except Exception as e:
+            print(f"Reminder sink failed: {e}")
+    with reminder_feed:
+        reminder_feed.notify_all()
+
+
+reminder_sync = {"seq": 0, "pruned": 0.0}
+
+
+def load_reminders():
+    """Startup: schedule every user's medications and appointments (runs in the engine thread)."""
+    reminder_sync["seq"] = reminder_outbox.last_seq("updates")
+    started = time.perf_counter()
+    reminder_engine.load((reminder_user(user_id), kind, item)
+                         for collection, kind in REMINDER_KINDS.items()
+                         for user_id, item in user_store.iter_items(collection))
+    print(f"Reminders: {reminder_engine.stats()['scheduled']} scheduled in {time.perf_counter() - started:.2f}s")
+    refresh_changed_reminders(include_own=True)  # writes that raced the scan
+
+
+def refresh_changed_reminders(include_own=False):
+    """Pick up medication/appointment edits made by other worker processes."""
+    reminder_sync["seq"], users = reminder_outbox.changed_users(reminder_sync["seq"], include_own=include_own)
+    for user_id in users:
+        reminder_engine.set_user(user_id, user_store.get_user_data(user_id))
+    if time.time() - reminder_sync["pruned"] > 3600:
+        reminder_sync["pruned"] = time.time()
+        reminder_outbox.prune(7 * 86400)
+
+
+def refresh_reminders(version):
+    """Re-schedule the current user's reminders after a write: only the records it changed."""
+    if not REMINDERS:
+        return
+    try:
+        with span("reminders.update"):
+            changes = user_store.get_changes(current_user_id(), version - 1)
+            user_id = reminder_user(current_user_id())
+            reminder_engine.apply_changes(user_id, changes)
+            reminder_outbox.mark_changed(user_id)
+    except Exception as e:
+        print(f"Reminder update failed: {e}")
+
+
+reminder_outbox = Lazy(lambda: ReminderOutbox(REMINDER_DB), "reminder_outbox")
+reminder_engine = ReminderEngine(dispatch_reminder, appointment_lead=REMINDER_APPOINTMENT_LEAD, poll=REMINDER_POLL,
+                                 tick=refresh_changed_reminders)
+metrics.registry.gauge("sehat_reminders_scheduled", "Pending reminders in this process's engine.", [],
+                       lambda: {(): reminder_engine.stats()["scheduled"]})
+
+
+@bp.route("/reminders", methods=["GET"])
+def get_reminders():
+    """The session's upcoming reminders (soonest first, ``limit`` default 20) and engine stats."""
+    limit, _ = page_args()
+    upcoming = reminder_engine.upcoming(reminder_user(current_user_id()), limit=limit)
+    return jsonify({"status": "success", "reminders": upcoming, "engine": reminder_engine.stats()})
+
+
+@bp.route("/reminders/fired", methods=["GET"])
+def fired_reminders():
+    """Reminders fired for the session after ``?after=<seq>`` (omit it to get the current seq):
+    {"last": seq, "reminders": [...]}. What the page polls; holds no connection open."""
+    user_id = reminder_user(current_user_id())
+    after = request.args.get("after", type=int)
+    if after is None:
+        return jsonify({"status": "success", "last": reminder_outbox.last_seq(), "reminders": []})
+    fired = reminder_outbox.read(user_id, after)
+    return jsonify({"status": "success", "last": fired[-1][0] if fired else after,
+                    "reminders": [reminder for _, reminder in fired]})
+
+
+@bp.route("/reminders/events", methods=["GET"])
+def reminder_events():
+    """Subscribe to the session's reminders over Server-Sent Events (``event: reminder``, with ids).
+    Resumes after Last-Event-ID (EventSource sends it when reconnecting); otherwise only new ones.
+    Each stream holds a worker thread for up to 5 minutes, so the page polls /reminders/fired
+    instead; this is for clients served by an async worker class."""
+    user_id = reminder_user(current_user_id())
+    after = request.headers.get("Last-Event-ID", type=int)
+    if after is None:
+        after = reminder_outbox.last_seq()
+
+    def generate():
+        last = after
+        deadline = time.monotonic() + 300
+        while time.monotonic() < deadline:
+            fired = reminder_outbox.read(user_id, last)
+            for seq, reminder in fired:
+                last = seq
+                yield f"id: {seq}\n" + sse_event(reminder, event="reminder")
+            if not fired:
+                yield ": keep-alive\n\n"
+                with reminder_feed:
+                    reminder_feed.wait(REMINDER_POLL)  # fired here: woken at once; elsewhere: next poll
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---------------------------
+# Startup: readiness + optional warm-up
+# ---------------------------
+LAZY_BACKENDS = (user_store, genai_client, model, vision_model, translator_client, doctor_directory, scheduler,
+                 chat_store, chat_search, chat_archive, ocr_cache, job_queue, reminder_outbox)
+warmup_state = {"state": "not_started", "errors": {}}
+_warmup_lock = threading.Lock()
+
+
+def warm_up():
+    """Create the lazy backends now (and preload fixed Telugu strings) instead of on first use."""
+    warmup_state["state"] = "running"
+    started = time.perf_counter()
+    for backend in LAZY_BACKENDS:
+        try:
+            backend.instance()
+        except Exception as e:
+            print(f"Warm-up of {backend.name} failed: {e}")
+            warmup_state["errors"][backend.name] = str(e)
+    if TRANSLATION_PRELOAD:
+        translator.preload(FIXED_STRINGS, "te").join()
+    warmup_state["seconds"] = round(time.perf_counter() - started, 3)
+    warmup_state["state"] = "done"
+
+
+def start_warmup():
+    """Run warm_up() once, in a background thread."""
+    with _warmup_lock:
+        if warmup_state["state"] != "not_started":
+            return
+        warmup_state["state"] = "running"
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+@bp.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: 503 while a warm-up is running, 200 otherwise; lists which backends exist yet."""
+    body = {
+        "status": "warming_up" if warmup_state["state"] == "running" else "ready",
+        "warmup": warmup_state,
+        "backends": {backend.name: backend.status() for backend in LAZY_BACKENDS},
+    }
+    return jsonify(body), 503 if warmup_state["state"] == "running" else 200
+
+
+def create_app():
+    """Build the Flask app. Stores, heavy clients and indexes are created lazily (or by the
+    warm-up); nothing runs in the background until start_background()."""
+    flask_app = Flask(__name__)
+    flask_app.secret_key = os.getenv("FLASK_SECRET_KEY", "supersecret")  # Needed for session
+    flask_app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES + 1024 * 1024  # multipart overhead
+    CORS(flask_app)  # Allow all origins
+    flask_app.register_blueprint(bp)
+    return flask_app
+
+
+_background_lock = threading.Lock()
+_background = {"started": False}
+
+
+def start_background(warmup=WARMUP):
+    """Start this process's threads once: chat retention, job workers, reminders and the
+    warm-up (or the Telugu preload). Called by the server (gunicorn.conf.py, ``__main__``),
+    not on import, so tools and benchmarks importing app.py start nothing."""
+    with _background_lock:
+        if _background["started"]:
+            return
+        _background["started"] = True
+    chat_archive.start(chat_store, CHAT_RETENTION_INTERVAL, on_expire=prune_chat_search)
+    job_queue.start()
+    if REMINDERS:
+        reminder_engine.start(load=load_reminders)
+    if warmup:
+        start_warmup()
+    elif TRANSLATION_PRELOAD:
+        translator.preload(FIXED_STRINGS, "te")
+
+
+app = create_app()
+
 # ---------------------------
 # Run
 # ---------------------------
 if __name__ == "__main__":
+    start_background()
     Flask_port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=Flask_port, debug=False)
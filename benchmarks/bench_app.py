@@ -0,0 +1,291 @@
+"""End-to-end benchmark of the Flask routes with fake Gemini/translator backends.
+
+    python benchmarks/bench_app.py --scale 100000 --requests 500 --concurrency 8 --json results.json
+    python benchmarks/bench_app.py --compare old.json new.json
+
+Builds a throwaway data directory (synthetic chat log, user data and doctor
+directory of ``--scale`` entries unless overridden), imports app.py against
+it with benchmarks/fakes.py in place of the network clients, and drives each
+scenario through the Flask test client from ``--concurrency`` threads.
+Reports throughput and p50/p99 latency per scenario; ``--json`` writes the
+results (with the git commit and config) for comparison across commits.
+"""
+import os, sys, io, json, time, random, shutil, argparse, platform, tempfile, threading, subprocess, datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from fakes import FakeGenerativeModel, FakeTranslator
+from load_test import percentile
+from bench_doctor_directory import make_records as make_doctors
+
+SCENARIOS = ("ask", "ask_te", "ask_stream", "chat_history", "crud", "find_doctors", "image_to_text")
+MESSAGES = [
+    "What is paracetamol?",
+    "I have a headache and a fever",
+    "Give me a diet tip for diabetics",
+    "How can I sleep better?",
+    "I feel stressed about work",
+    "What should I do about a mild cough?",
+]
+DOCTOR_QUERIES = ["specialty=cardio", "specialty=neuro&location=hyderabad", "q=kavya%20rao",
+                  "q=neurlogy%20hyderbad", "q=apolo&limit=50"]
+
+
+# ---------------------------
+# Synthetic data
+# ---------------------------
+def write_chat_log(path, n):
+    start = time.time() - n * 60
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            ts = start + i * 60
+            f.write(json.dumps({
+                "id": f"{ts:.6f}",
+                "user": MESSAGES[i % len(MESSAGES)],
+                "bot": "Here is some general health guidance for you. " * 6,
+                "timestamp": datetime.datetime.fromtimestamp(ts).isoformat(),
+            }) + "\n")
+
+
+def make_user_data(n):
+    return {
+        "profile": {"name": "Bench User", "dob": "1983-04-02", "gender": "F", "blood_group": "O+", "location": "Hyderabad",
+                    "conditions": "hypertension"},
+        "medications": [{"name": f"Med {i}", "dosage": "500mg", "schedule": "twice daily"} for i in range(n)],
+        "emergency_contacts": [{"name": f"Contact {i}", "phone": "+91 90000 00000"} for i in range(10)],
+        "appointments": [{"id": f"bench-{i}", "doctor_name": f"Dr. {i}", "note": "follow-up"} for i in range(n)],
+    }
+
+
+def prepare_data_dir(data_dir, args):
+    os.makedirs(os.path.join(data_dir, "uploads"), exist_ok=True)
+    write_chat_log(os.path.join(data_dir, "chat_log.jsonl"), args.chat_entries)
+    user_data = make_user_data(args.user_items)
+    if args.storage == "sqlite":
+        from storage import SqliteUserStore
+        store = SqliteUserStore(os.path.join(data_dir, "sehat.db"))
+        for n in range(args.concurrency):  # one simulated user per client
+            store.replace_user_data(f"bench-{n}", user_data)
+    else:
+        with open(os.path.join(data_dir, "user_data.json"), "w", encoding="utf-8") as f:
+            json.dump(user_data, f)
+    doctors_path = os.path.join(data_dir, "doctors.jsonl")
+    with open(doctors_path, "w", encoding="utf-8") as f:
+        for doc in make_doctors(args.doctors):
+            f.write(json.dumps(doc) + "\n")
+    return doctors_path
+
+
+def load_app(data_dir, doctors_path, args):
+    """Import app.py against ``data_dir`` with the fake backends swapped in."""
+    os.environ.update({
+        "GOOGLE_API_KEY": "bench",
+        "SEHAT_DATA_DIR": data_dir,
+        "SEHAT_STORAGE": args.storage,
+        "DOCTOR_DATA": doctors_path,
+        "TRANSLATION_PRELOAD": "0",
+        "METRICS_JSON_LOG": "0",
+        "OCR_MAX_SIDE": "0",
+    })
+    started = time.perf_counter()
+    import app
+    import_s = time.perf_counter() - started
+    app.chat_sessions.model = FakeGenerativeModel(args.model_latency, args.jitter, args.error_rate)
+    app.vision_model = FakeGenerativeModel(args.model_latency, args.jitter, args.error_rate, seed=2)
+    app.translator.translator = FakeTranslator(args.translate_latency, args.jitter, args.error_rate)
+    return app, import_s
+
+
+# ---------------------------
+# Scenarios: fn(client, i) -> response
+# ---------------------------
+def _message(i):
+    # every other message is unique so the response cache doesn't answer everything
+    base = MESSAGES[i % len(MESSAGES)]
+    return base if i % 2 else f"{base} (case {i})"
+
+
+def ask(client, i):
+    return client.post("/ask", json={"message": _message(i)})
+
+
+def ask_stream(client, i):
+    response = client.post("/ask_stream", json={"message": _message(i)})
+    response.get_data()
+    return response
+
+
+def chat_history(client, i):
+    return client.get(["/get_chat_history?limit=50", "/get_chat_history?days=1&limit=200",
+                       "/get_chat_history?limit=20&before=" + str(time.time() - 3600)][i % 3])
+
+
+def crud(client, i):
+    step = i % 4
+    if step == 0:
+        return client.post("/save_medication", json={"name": f"Bench med {i}", "dosage": "10mg", "schedule": "daily"})
+    if step == 1:
+        return client.put("/update_medication/0", json={"name": f"Updated {i}", "dosage": "20mg", "schedule": "daily"})
+    if step == 2:
+        return client.get("/get_user_data")
+    return client.delete("/delete_medication/1")
+
+
+def find_doctors(client, i):
+    return client.get("/find_doctors?" + DOCTOR_QUERIES[i % len(DOCTOR_QUERIES)])
+
+
+def image_to_text(client, i):
+    payload = b"\x89PNG\r\n\x1a\n" + f"bench image {i % 50}".encode() + os.urandom(16) * (i % 2)
+    return client.post("/image_to_text", data={"image": (io.BytesIO(payload), f"scan{i}.png", "image/png")},
+                       content_type="multipart/form-data")
+
+
+def run_scenario(app, name, requests, concurrency):
+    fn = ask if name == "ask_te" else globals()[name]
+    clients = []
+    for n in range(concurrency):
+        client = app.app.test_client()
+        with client.session_transaction() as sess:
+            sess["uid"] = f"bench-{n}"
+            sess["lang"] = "te" if name == "ask_te" else "en"
+        clients.append(client)
+
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(client):
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = fn(client, i).status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for client in clients:
+            pool.submit(worker, client)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "status": dict(statuses),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+# ---------------------------
+# Reporting
+# ---------------------------
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    print(f"\n{'scenario':<15}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, r in results["scenarios"].items():
+        print(f"{name:<15}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+
+def compare(old_path, new_path):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'scenario':<15}{'rps':>22}{'p50 ms':>22}{'p99 ms':>22}")
+    for name, r in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ("throughput_rps", "p50_ms", "p99_ms"):
+            a, b = before[key], r[key]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            cells.append(f"{a:>8} -> {b:<8}{change:>7}")
+        print(f"{name:<15}" + "".join(f"{c:>22}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000, help="default size for the synthetic data sets")
+    parser.add_argument("--chat-entries", type=int)
+    parser.add_argument("--user-items", type=int)
+    parser.add_argument("--doctors", type=int)
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--model-latency", type=float, default=0.05, help="fake Gemini latency (s)")
+    parser.add_argument("--translate-latency", type=float, default=0.02, help="fake translator latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to each fake call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake calls that fail")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", metavar="PATH", help="write machine-readable results here")
+    parser.add_argument("--keep-data", action="store_true", help="don't delete the data directory")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    for field in ("chat_entries", "user_items", "doctors"):
+        if getattr(args, field) is None:
+            setattr(args, field, args.scale)
+    random.seed(args.seed)
+
+    data_dir = tempfile.mkdtemp(prefix="sehat-bench-")
+    try:
+        started = time.perf_counter()
+        doctors_path = prepare_data_dir(data_dir, args)
+        setup_s = time.perf_counter() - started
+        app, import_s = load_app(data_dir, doctors_path, args)
+        print(f"data generated in {setup_s:.1f}s, app imported in {import_s:.2f}s ({data_dir})")
+
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "keep_data")},
+            "import_s": round(import_s, 3),
+            "scenarios": {},
+        }
+        for name in args.scenarios.split(","):
+            if name not in SCENARIOS:
+                parser.error(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+            results["scenarios"][name] = run_scenario(app, name, args.requests, args.concurrency)
+            print(f"  {name}: done")
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
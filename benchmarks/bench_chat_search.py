@@ -0,0 +1,86 @@
+"""Chat search: index build, per-message update and query latency at scale.
+
+    python benchmarks/bench_chat_search.py --messages 1000000
+
+Indexes ``--messages`` synthetic English/Telugu chat entries into a
+throwaway chat_search.ChatSearchIndex, then times single-entry updates (what
+every chat write pays) and a mix of rare, common, multi-word and
+Telugu queries for both sort orders. The synthetic vocabulary is tiny, so
+"common" words occur in nearly every message: a worst case for ranking.
+"""
+import os, sys, time, random, argparse, tempfile, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chat_search import ChatSearchIndex
+
+EN_WORDS = ("headache fever cough cold sleep stress diet water walk tablet dose doctor pain back knee sugar "
+            "pressure heart breathing rash allergy vitamin protein exercise morning night food rest").split()
+TE_WORDS = ("తలనొప్పి జ్వరం దగ్గు జలుబు నిద్ర ఒత్తిడి ఆహారం నీరు నడక మాత్ర మోతాదు డాక్టర్ నొప్పి వెన్ను "
+            "మోకాలు చక్కెర రక్తపోటు గుండె శ్వాస దద్దుర్లు").split()
+TE_SUFFIXES = ("", "కి", "లో", "ను", "తో")
+QUERIES = [
+    ("rare", "zinc"),
+    ("common", "headache"),
+    ("two words", "knee pain"),
+    ("whole word", "breathing"),
+    ("telugu", "తలనొప్పి"),
+    ("telugu two words", "జ్వరం నిద్ర"),
+    ("no match", "xylophone"),
+]
+
+
+def make_entry(rng, i):
+    if rng.random() < 0.3:
+        user = " ".join(rng.choice(TE_WORDS) + rng.choice(TE_SUFFIXES) for _ in range(rng.randint(3, 8)))
+    else:
+        user = " ".join(rng.choice(EN_WORDS) for _ in range(rng.randint(3, 10)))
+    if rng.random() < 0.001:
+        user += " zinc"
+    bot = " ".join(rng.choice(EN_WORDS) for _ in range(rng.randint(15, 40)))
+    return {"id": f"{i}", "user": user, "bot": bot, "timestamp": "2026-01-01T00:00:00"}
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=50, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ChatSearchIndex(os.path.join(tmp, "chat_search.db"))
+        started = time.perf_counter()
+        batch = 10000
+        for first in range(0, args.messages, batch):
+            index.add_many(make_entry(rng, i) for i in range(first, min(first + batch, args.messages)))
+        build_s = time.perf_counter() - started
+        size_mb = os.path.getsize(os.path.join(tmp, "chat_search.db")) / 1e6
+        print(f"indexed {args.messages} messages in {build_s:.1f}s ({size_mb:.0f} MB)")
+
+        counter = iter(range(args.messages, args.messages + 10 * args.runs))
+        p50, p99 = timed(lambda: index.add(make_entry(rng, next(counter))), args.runs)
+        print(f"{'add one message':<28}{p50:>9.2f} ms p50 {p99:>9.2f} ms p99")
+        p50, p99 = timed(lambda: index.add(make_entry(rng, 5)), args.runs)
+        print(f"{'re-index (edit) a message':<28}{p50:>9.2f} ms p50 {p99:>9.2f} ms p99")
+
+        print(f"\n{'query':<20}{'sort':<11}{'total':>7}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, query in QUERIES:
+            for sort in ("relevance", "recent"):
+                hits, total = index.search(query, limit=20, sort=sort)
+                p50, p99 = timed(lambda: index.search(query, limit=20, sort=sort), args.runs)
+                print(f"{name:<20}{sort:<11}{total:>7}{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
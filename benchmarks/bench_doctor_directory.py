@@ -0,0 +1,115 @@
+"""Doctor directory: index build time and query latency on synthetic data.
+
+    python benchmarks/bench_doctor_directory.py [--sizes 10000,100000,1000000]
+
+For each size it builds a DoctorDirectory and times the unfiltered list
+(precomputed vs serialising per request), specialty/location filters
+(indexes vs the old linear scan from app.find_doctors) and ranked fuzzy
+searches with typos.
+"""
+import os, sys, json, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from doctors import DoctorDirectory
+
+FIRST = ["Asha", "Rohan", "Kavya", "Manoj", "Neha", "Vikram", "Ananya", "Suresh", "Priya", "Arjun", "Lakshmi",
+         "Kiran", "Divya", "Rahul", "Sneha", "Venkat", "Meera", "Sanjay", "Pooja", "Harsha"]
+LAST = ["Varma", "Iyer", "Rao", "Menon", "Shah", "Patel", "Gupta", "Reddy", "Naidu", "Sharma", "Kumar", "Pillai",
+        "Chowdary", "Nair", "Joshi", "Das"]
+SPECIALTIES = ["Cardiology", "Neurology", "Orthopedics", "Dermatology", "Pediatrics", "Gynecology", "Oncology",
+               "Psychiatry", "ENT", "Ophthalmology", "General Medicine", "Endocrinology"]
+LOCATIONS = ["Hyderabad", "Secunderabad", "Bengaluru", "Mumbai", "Delhi", "Chennai", "Vijayawada", "Visakhapatnam",
+             "Warangal", "Guntur", "Pune", "Kolkata"]
+HOSPITALS = ["Sunshine Hospitals", "Yashoda Hospitals", "KIMS", "Apollo Hospitals", "Fortis", "Lilavati", "AIIMS",
+             "Care Hospitals", "Rainbow Clinic", "Medicover"]
+
+QUERIES = [
+    {"specialty": "cardio"},
+    {"specialty": "neuro", "location": "hyderabad"},
+    {"location": "bengaluru", "specialty": "derm"},
+    {"q": "kavya rao"},
+    {"q": "neurlogy hyderbad"},
+    {"q": "apolo pediatrcs"},
+    {"q": "harsha", "specialty": "ortho", "location": "guntur"},
+]
+
+
+def make_records(n, seed=7):
+    rnd = random.Random(seed)
+    return [{
+        "id": i,
+        "name": f"Dr. {rnd.choice(FIRST)} {rnd.choice(LAST)}",
+        "specialty": rnd.choice(SPECIALTIES),
+        "location": rnd.choice(LOCATIONS),
+        "hospital": rnd.choice(HOSPITALS),
+        "phone": f"+91 {rnd.randint(10, 99)} {rnd.randint(1000, 9999)} {rnd.randint(1000, 9999)}",
+        "times": ["09:00 AM", "02:00 PM"],
+    } for i in range(1, n + 1)]
+
+
+# The pre-index filter from app.find_doctors, kept here as the baseline
+def legacy_find(records, specialty, location):
+    matches = []
+    for doc in records:
+        if doc["specialty"].lower().startswith(specialty):
+            if location:
+                if location in doc["location"].lower():
+                    matches.append(doc)
+            else:
+                matches.append(doc)
+    return matches
+
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+
+def run(n, rounds):
+    records = make_records(n)
+    start = time.perf_counter()
+    directory = DoctorDirectory(records)
+    result = {"records": n, "build_ms": round((time.perf_counter() - start) * 1000, 1)}
+    print(f"\n{n} doctors: index built in {result['build_ms']} ms")
+
+    directory.all_json()
+    per_call, _ = timed(directory.all_json, rounds)
+    baseline, _ = timed(lambda: json.dumps([dict(d) for d in records]), max(1, rounds // 5))
+    result["list_precomputed_ms"], result["list_serialize_ms"] = round(per_call, 3), round(baseline, 1)
+    print(f"  {'unfiltered list':<58} {per_call:9.3f} ms   (serialize per call {baseline:.1f} ms)")
+
+    result["queries"] = []
+    for params in QUERIES:
+        per_call, (page, total) = timed(lambda: directory.search(limit=20, **params), rounds)
+        row = {"params": params, "ms": round(per_call, 3), "total": total}
+        line = f"  {json.dumps(params):<58} {per_call:9.3f} ms   total={total}"
+        if "q" not in params:
+            legacy_ms, legacy = timed(lambda: legacy_find(records, params.get("specialty", ""), params.get("location", "")),
+                                      max(1, rounds // 5))
+            assert len(legacy) == total, (params, len(legacy), total)
+            row["legacy_ms"] = round(legacy_ms, 3)
+            line += f"   (linear scan {legacy_ms:.3f} ms)"
+        else:
+            line += f"   top={page[0]['name'] if page else '-'}"
+        result["queries"].append(row)
+        print(line)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--json", metavar="PATH", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = [run(int(n), args.rounds) for n in args.sizes.split(",")]
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
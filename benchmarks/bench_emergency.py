@@ -0,0 +1,95 @@
+"""Emergency fast path: latency budget for /ask and /ask_stream emergency replies.
+
+    python benchmarks/bench_emergency.py --requests 2000 --budget-ms 5
+
+Imports app.py against a throwaway data directory with benchmarks/fakes.py
+in place of Gemini and the translator, both slowed to ``--upstream-latency``
+so any call that sneaks onto the emergency path shows up. English and Telugu
+emergency messages are sent from English and Telugu sessions through the
+Flask test client, with a contact write every ``--write-every`` requests
+(the bundle is re-rendered then). Exits non-zero if the p99 of any scenario
+is over ``--budget-ms`` or a fake upstream was called.
+"""
+import os, sys, time, argparse, tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from fakes import FakeGenerativeModel, FakeTranslator
+from load_test import percentile
+
+MESSAGES = {
+    "en": ["I have chest pain", "my father had an accident", "HEART ATTACK symptoms, help", "shortness of breath since morning"],
+    "te": ["నాకు ఛాతీ నొప్పిగా ఉంది", "నాన్నకు ప్రమాదం జరిగింది", "గుండెపోటుతో బాధపడుతున్నాను", "చాలా రక్తస్రావం అవుతోంది"],
+}
+SCENARIOS = [
+    ("ask en/en", "/ask", "en", "en"),
+    ("ask te/te", "/ask", "te", "te"),
+    ("ask en/te", "/ask", "te", "en"),
+    ("ask_stream te/te", "/ask_stream", "te", "te"),
+]
+
+
+def load_app(data_dir, args):
+    os.environ.update({
+        "GOOGLE_API_KEY": "bench",
+        "SEHAT_DATA_DIR": data_dir,
+        "SEHAT_STORAGE": args.storage,
+        "TRANSLATION_PRELOAD": "0",
+        "METRICS_JSON_LOG": "0",
+        "REMINDERS": "0",
+        "CHAT_RETENTION_INTERVAL": "0",
+    })
+    import app
+    app.chat_sessions.model = FakeGenerativeModel(args.upstream_latency)
+    app.translator.translator = FakeTranslator(args.upstream_latency)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="p99 budget per scenario")
+    parser.add_argument("--write-every", type=int, default=200, help="emergency contact write every N requests (0 = never)")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="fake model/translator latency (s)")
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        app = load_app(data_dir, args)
+        client = app.app.test_client()
+        for i in range(5):
+            client.post("/save_emergency_contact", json={"name": f"Contact {i}", "phone": "+91 90000 00000"})
+        ok = True
+        print(f"{'scenario':<20}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for name, path, session_lang, message_lang in SCENARIOS:
+            with client.session_transaction() as sess:
+                sess["lang"] = session_lang
+            messages = MESSAGES[message_lang]
+            samples = []
+            for i in range(args.requests):
+                if args.write_every and i % args.write_every == args.write_every - 1:
+                    client.put("/update_emergency_contact/0", json={"name": f"Contact {i}", "phone": "+91 90000 00001"})
+                started = time.perf_counter()
+                response = client.post(path, json={"message": messages[i % len(messages)]})
+                body = response.get_data(as_text=True)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200 or "108" not in body or "Contact" not in body:
+                    print(f"{name}: unexpected reply ({response.status_code}): {body[:200]}")
+                    ok = False
+                    break
+            samples.sort()
+            p99 = percentile(samples, 99)
+            print(f"{name:<20}{percentile(samples, 50):>9.3f}{p99:>9.3f}{samples[-1]:>9.3f}")
+            if p99 > args.budget_ms:
+                print(f"{name}: p99 {p99:.3f} ms is over the {args.budget_ms} ms budget")
+                ok = False
+        upstream_calls = app.chat_sessions.model.behaviour.calls + app.translator.translator.behaviour.calls
+        if upstream_calls:
+            print(f"the emergency path called the model/translator {upstream_calls} times")
+            ok = False
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
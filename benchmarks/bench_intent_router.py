@@ -0,0 +1,86 @@
+"""Intent router: golden cases + micro-benchmark against the old keyword cascade.
+
+    python benchmarks/bench_intent_router.py
+
+The golden cases pin the priority order of the /ask intents; the script
+exits non-zero if any of them changes.
+"""
+import os, sys, time, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from intent_router import router
+
+GOLDEN = [
+    ("I have chest pain and feel stressed", "emergency", ["chest pain"]),
+    ("There was an accident, lots of bleeding", "emergency", ["accident", "bleeding"]),
+    ("I feel stressed about my diet", "mental", ["stressed"]),
+    ("Feeling sad and anxious", "mental", ["sad", "anxious"]),
+    ("What diet helps with exercise recovery?", "nutrition", ["diet", "exercise"]),
+    ("Give me a diet tip", "nutrition", ["diet"]),
+    ("Give me a health quiz", "quiz/tip", []),
+    ("Any tips for sleep?", "quiz/tip", []),
+    ("quiz me on paracetamol", "quiz/tip", []),
+    ("What is paracetamol?", "medicine", ["paracetamol"]),
+    ("Is this tablet safe with fever?", "medicine", []),
+    ("I have a fever and a headache", "symptoms", ["fever", "headache"]),
+    ("What are the symptoms of flu?", "symptoms", []),
+    ("I take multiple walks a day", "default", []),
+    ("Hello there", "default", []),
+    ("", "default", []),
+]
+
+# The pre-router cascade from app.ask(), kept here as the baseline
+def legacy_route(text):
+    t = text.lower()
+    if any(w in t for w in ["chest pain", "shortness of breath", "accident", "bleeding", "heart attack"]):
+        return "emergency"
+    if any(w in t for w in ["stress", "anxious", "depressed", "sad", "low mood"]):
+        return "mental"
+    if any(w in t for w in ["diet", "food", "nutrition", "exercise", "diabetic"]):
+        return "nutrition"
+    if "quiz" in t or "tip" in t:
+        return "quiz/tip"
+    if any(w in t for w in ["medicine", "drug", "tablet", "capsule", "paracetamol", "ibuprofen"]):
+        return "medicine"
+    if "symptom" in t or any(w in t for w in ["fever", "headache", "cough", "nausea", "fatigue"]):
+        return "symptoms"
+    return "default"
+
+
+def check_golden():
+    failures = 0
+    for text, intent, entities in GOLDEN:
+        got = router.route(text)
+        if got.intent != intent or got.entities != entities:
+            failures += 1
+            print(f"GOLDEN MISMATCH {text!r}: expected ({intent}, {entities}), got ({got.intent}, {got.entities})")
+    print(f"golden cases: {len(GOLDEN) - failures}/{len(GOLDEN)} ok")
+    return failures == 0
+
+
+def bench(n=50000):
+    random.seed(7)
+    filler = "please can you tell me something useful about staying healthy this week".split()
+    texts = []
+    for i in range(n):
+        words = random.sample(filler, 8)
+        if i % 3 == 0:
+            words.insert(random.randrange(len(words)), random.choice(["fever", "diet", "quiz", "paracetamol", "sad"]))
+        texts.append(" ".join(words))
+
+    start = time.perf_counter()
+    for t in texts:
+        legacy_route(t)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    router.route_many(texts)
+    routed = time.perf_counter() - start
+
+    print(f"{n} messages: legacy cascade {legacy / n * 1e6:.2f} us/msg, router {routed / n * 1e6:.2f} us/msg")
+
+
+if __name__ == "__main__":
+    ok = check_golden()
+    bench()
+    sys.exit(0 if ok else 1)
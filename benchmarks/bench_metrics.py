@@ -0,0 +1,53 @@
+"""Per-span overhead of the metrics layer.
+
+    python benchmarks/bench_metrics.py [n]
+
+Times an empty loop, a bare ``with span(...)`` (histogram only) and a span
+while a request trace is active, and reports the overhead per span.
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from metrics import span
+
+
+def per_iter(fn, n):
+    start = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def empty(n):
+    for _ in range(n):
+        pass
+
+
+def spans(n):
+    for _ in range(n):
+        with span("bench"):
+            pass
+
+
+def traced_spans(n):
+    metrics.start_trace()
+    for _ in range(n):
+        with span("bench"):
+            pass
+    metrics.end_trace()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    spans(10000)  # warm up (creates the histogram series)
+    base = per_iter(empty, n)
+    bare = per_iter(spans, n) - base
+    traced = per_iter(traced_spans, n) - base
+    print(f"{n} spans: {bare:.2f} us/span, {traced:.2f} us/span with an active request trace")
+    render_start = time.perf_counter()
+    metrics.registry.render()
+    print(f"render /metrics: {(time.perf_counter() - render_start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Prompt size per chat turn: per-message system instruction vs the prompt pipeline.
+
+    python benchmarks/bench_prompts.py --turns 30 --meds 200 --contacts 20
+
+Imports app.py with benchmarks/fakes.py in place of Gemini and plays one
+conversation of ``--turns`` general (default-intent) messages for a user with
+``--meds`` medications and ``--contacts`` emergency contacts, twice:
+
+- legacy: the full system instruction appended to every message (and so
+  repeated in the chat history), no token budget;
+- pipeline: the instruction only in the chat preamble, lists capped at
+  INSTRUCTION_LIST_TOKENS, history fitted to ``--budget`` tokens.
+
+Reports estimated prompt tokens per turn and an input-cost estimate of
+upstream time at ``--ms-per-1k`` milliseconds per thousand prompt tokens.
+"""
+import os, sys, argparse, tempfile, statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from fakes import FakeGenerativeModel
+from chat_sessions import ChatSessionManager
+
+MESSAGES = ["How can I sleep better?", "What is a good morning routine?", "Any tips to stay active at work?",
+            "How much water should I drink?", "How do I manage my stress?"]
+
+
+def make_user_data(meds, contacts):
+    return {
+        "profile": {"name": "Bench User", "dob": "1960-04-02", "gender": "F", "blood_group": "O+",
+                    "conditions": "hypertension, type 2 diabetes"},
+        "medications": [{"name": f"Medicine {i}", "dosage": "500mg", "schedule": "twice daily after food"}
+                        for i in range(meds)],
+        "emergency_contacts": [{"name": f"Contact {i}", "phone": "+91 90000 00000", "relation": "family"}
+                               for i in range(contacts)],
+        "appointments": [],
+        "version": 1,
+    }
+
+
+def play(app, args, user_data, legacy):
+    sizes = []
+    manager = ChatSessionManager(FakeGenerativeModel(latency=0), app.create_system_instruction,
+                                 max_turns=args.history_turns, max_prompt_tokens=0 if legacy else args.budget,
+                                 report=sizes.append)
+    list_tokens = app.INSTRUCTION_LIST_TOKENS
+    app.INSTRUCTION_LIST_TOKENS = 0 if legacy else list_tokens
+    try:
+        for turn in range(args.turns):
+            message = MESSAGES[turn % len(MESSAGES)]
+            if legacy:
+                message = f"User: {message}\nHealthBot instructions: {app.create_system_instruction(user_data)}"
+            manager.send_message("bench", user_data, message)
+    finally:
+        app.INSTRUCTION_LIST_TOKENS = list_tokens
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--meds", type=int, default=200, help="medications in the user's data")
+    parser.add_argument("--contacts", type=int, default=20, help="emergency contacts in the user's data")
+    parser.add_argument("--history-turns", type=int, default=10, help="CHAT_HISTORY_TURNS")
+    parser.add_argument("--budget", type=int, default=6000, help="PROMPT_MAX_TOKENS for the pipeline run")
+    parser.add_argument("--ms-per-1k", type=float, default=25.0, help="assumed upstream ms per 1k prompt tokens")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ.update({"GOOGLE_API_KEY": "bench", "SEHAT_DATA_DIR": data_dir, "TRANSLATION_PRELOAD": "0",
+                           "METRICS_JSON_LOG": "0", "REMINDERS": "0", "CHAT_RETENTION_INTERVAL": "0"})
+        import app
+        user_data = make_user_data(args.meds, args.contacts)
+        print(f"{'run':<10}{'first':>8}{'p50':>8}{'max':>8}{'total':>10}{'dropped':>9}{'upstream s':>12}")
+        totals = {}
+        for name, legacy in (("legacy", True), ("pipeline", False)):
+            reports = play(app, args, user_data, legacy)
+            sizes = [size["total_tokens"] for size in reports]
+            dropped = sum(size["dropped_turns"] for size in reports)
+            totals[name] = sum(sizes)
+            print(f"{name:<10}{sizes[0]:>8}{statistics.median(sizes):>8.0f}{max(sizes):>8}{sum(sizes):>10}"
+                  f"{dropped:>9}{sum(sizes) / 1000 * args.ms_per_1k / 1000:>12.2f}")
+        print(f"\nprompt tokens over the conversation: {1 - totals['pipeline'] / totals['legacy']:.0%} fewer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Reminder engine: startup load, per-edit rescheduling and firing throughput at scale.
+
+    python benchmarks/bench_reminders.py --users 100000 --meds 4
+
+Schedules ``--users`` synthetic users with ``--meds`` medications each (a mix
+of schedule phrasings) plus an appointment for every tenth user in a fresh
+reminders.ReminderEngine, then times what a medication write costs (add,
+edit, delete of one entry, and a full per-user re-sync) and fires a whole
+simulated day of reminders through ``pop_due``.
+"""
+import os, sys, time, random, argparse, datetime, resource, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reminders import ReminderEngine, MEDICATION, APPOINTMENT
+
+SCHEDULES = ("twice daily", "once daily", "8 AM", "morning and night", "TID", "every 8 hours", "1-0-1",
+             "after meals", "9 pm", "Mon, Thu 07:30", "as needed", "రాత్రి")
+START = datetime.datetime(2026, 1, 5, 0, 0)
+
+
+def make_items(rng, users, meds):
+    for u in range(users):
+        user_id = f"user-{u}"
+        for m in range(meds):
+            yield user_id, MEDICATION, {"id": f"{u}-{m}", "name": f"med {m}", "dosage": "1 tab",
+                                        "schedule": rng.choice(SCHEDULES)}
+        if u % 10 == 0:
+            day = (START + datetime.timedelta(days=rng.randint(0, 13))).date().isoformat()
+            yield user_id, APPOINTMENT, {"id": f"a{u}", "doctor_name": "Dr. Bench", "date": day,
+                                         "time": rng.choice(("09:00 AM", "11:30 AM", "04:00 PM"))}
+
+
+def timed(fn, runs):
+    samples = []
+    for n in range(runs):
+        start = time.perf_counter()
+        fn(n)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples) * 1e6, samples[int(len(samples) * 0.99) - 1] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--meds", type=int, default=4, help="medications per user")
+    parser.add_argument("--runs", type=int, default=2000, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    fired = []
+    engine = ReminderEngine(fired.append)
+
+    items = list(make_items(rng, args.users, args.meds))
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    engine.load(items, now=START)
+    load_s = time.perf_counter() - started
+    memory_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_kb) / 1024
+    stats = engine.stats()
+    print(f"loaded {len(items)} items for {args.users} users in {load_s:.2f}s: "
+          f"{stats['scheduled']} scheduled, +{memory_mb:.0f} MB peak RSS")
+
+    def user(n):
+        return f"user-{rng.randrange(args.users)}"
+
+    ops = [
+        ("add a medication", lambda n: engine.upsert(user(n), MEDICATION, {"id": f"new-{n}", "schedule": "twice daily"},
+                                                     now=START)),
+        ("edit its schedule", lambda n: engine.upsert(user(n), MEDICATION, {"id": f"new-{n}", "schedule": "9 pm"},
+                                                      now=START)),
+        ("delete a medication", lambda n: engine.cancel(user(n), MEDICATION, f"new-{n}")),
+        ("re-sync one user", lambda n: engine.set_user(
+            user(n), {"medications": [{"id": f"s-{n}-{m}", "schedule": rng.choice(SCHEDULES)} for m in range(args.meds)]},
+            now=START)),
+        ("next due", lambda n: engine.next_due()),
+    ]
+    print(f"\n{'operation':<22}{'p50 us':>10}{'p99 us':>10}")
+    for name, fn in ops:
+        p50, p99 = timed(fn, args.runs)
+        print(f"{name:<22}{p50:>10.1f}{p99:>10.1f}")
+
+    # One simulated day, in one-minute steps
+    started = time.perf_counter()
+    clock = START.timestamp()
+    for _ in range(24 * 60):
+        clock += 60
+        fired.extend(engine.pop_due(clock))
+    day_s = time.perf_counter() - started
+    print(f"\nfired {len(fired)} reminders over one simulated day in {day_s:.2f}s "
+          f"({len(fired) / day_s:,.0f}/s); {engine.stats()['scheduled']} still scheduled")
+
+
+if __name__ == "__main__":
+    main()
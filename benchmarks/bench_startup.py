@@ -0,0 +1,54 @@
+"""Cold start: time to import app.py and to serve the first requests.
+
+    python benchmarks/bench_startup.py [--runs 5] [--json PATH]
+
+Each run is a fresh interpreter against an empty data directory, so module
+caches and lazily created clients start cold. Network calls are never made:
+the first requests are ones that don't need Gemini or the translator.
+"""
+import os, sys, json, argparse, tempfile, subprocess, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTES = ["/get_user_data", "/get_doctors", "/find_doctors?specialty=card", "/get_chat_history?limit=20"]
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app
+timings = {"import_s": time.perf_counter() - start}
+client = app.app.test_client()
+for route in json.loads(sys.argv[1]):
+    t = time.perf_counter()
+    status = client.get(route).status_code
+    timings[route] = time.perf_counter() - t
+    assert status == 200, (route, status)
+timings["first_requests_s"] = time.perf_counter() - start - timings["import_s"]
+print(json.dumps(timings))
+"""
+
+
+def run_once():
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, GOOGLE_API_KEY="bench", SEHAT_DATA_DIR=data_dir, TRANSLATION_PRELOAD="0",
+                   METRICS_JSON_LOG="0", SEHAT_WARMUP="0", PYTHONWARNINGS="ignore")
+        out = subprocess.check_output([sys.executable, "-c", CHILD, json.dumps(ROUTES)], cwd=ROOT, env=env, text=True)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", metavar="PATH", help="also write results to this file")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {key: round(statistics.median(r[key] for r in runs) * 1000, 1) for key in runs[0]}
+    for key, ms in summary.items():
+        print(f"{key:<40} {ms:9.1f} ms (median of {args.runs})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"median_ms": summary, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Cold vs hot reads of user_data.json through storage.UserDataFile.
+
+Run from the repo root:  python benchmarks/bench_user_data.py [n_items]
+"""
+import os, sys, json, time, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import UserDataFile
+
+
+def make_user_data(n):
+    return {
+        "profile": {"name": "Test User", "dob": "1990-01-01", "gender": "F", "blood_group": "O+", "conditions": "none"},
+        "medications": [{"name": f"Med {i}", "dosage": "500mg", "schedule": "twice daily"} for i in range(n)],
+        "emergency_contacts": [{"name": f"Contact {i}", "phone": "+91 90000 0000"} for i in range(10)],
+        "appointments": [{"id": str(i), "doctor": f"Dr. {i}", "date": "2026-01-01", "time": "09:00 AM"} for i in range(n)],
+    }
+
+
+def bench(label, fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    per_call = (time.perf_counter() - start) / rounds
+    print(f"{label:<28} {per_call * 1e6:10.1f} us/read")
+    return per_call
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "user_data.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(make_user_data(n), f, indent=4)
+        print(f"user_data.json with {n} medications + {n} appointments ({os.path.getsize(path)} bytes)")
+
+        def uncached():
+            with open(path, "r", encoding="utf-8") as f:
+                json.load(f)
+
+        store = UserDataFile(path)
+
+        def cold():
+            store.invalidate()
+            store.load()
+
+        store.load()
+        cold_t = bench("cold (open + json.load)", uncached, 200)
+        bench("cold (UserDataFile)", cold, 200)
+        hot_t = bench("hot (UserDataFile)", store.load, 2000)
+        print(f"speedup: {cold_t / hot_t:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
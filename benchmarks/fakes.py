@@ -0,0 +1,99 @@
+"""Local stand-ins for the Gemini and Google Translate clients.
+
+They mimic the small surface app.py uses (``start_chat``/``send_message``,
+``generate_content``, ``translate``) with configurable latency, jitter and
+error rate, so benchmarks run offline and reproducibly.
+"""
+import time, random, threading
+
+
+class FakeUpstreamError(RuntimeError):
+    """Raised at ``error_rate`` to simulate a failed upstream call."""
+
+
+class _Behaviour:
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, share=1.0):
+        """Sleep for (a share of) one call's latency; raise at ``error_rate``."""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay * share)
+        if failed:
+            raise FakeUpstreamError("simulated upstream failure")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        reply = self.model.reply_for(content)
+        if not stream:
+            self.model.behaviour.wait()
+            self.history += [{"role": "user", "parts": [content]}, {"role": "model", "parts": [reply]}]
+            return FakeResponse(reply)
+        return self._stream(content, reply)
+
+    def _stream(self, content, reply):
+        yield from self.model.stream_reply(reply)
+        self.history += [{"role": "user", "parts": [content]}, {"role": "model", "parts": [reply]}]
+
+
+class FakeGenerativeModel:
+    """Drop-in for ``genai.GenerativeModel`` (chat + vision calls)."""
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, reply_words=80, stream_chunks=8, seed=0):
+        self.behaviour = _Behaviour(latency, jitter, error_rate, seed)
+        self.reply_words = reply_words
+        self.stream_chunks = stream_chunks
+
+    def reply_for(self, content):
+        words = ("Here is some general health guidance for you.".split() * (self.reply_words // 8 + 1))[:self.reply_words]
+        return " ".join(words)
+
+    def start_chat(self, history=None):
+        return FakeChat(self, history)
+
+    def generate_content(self, parts, stream=False, **kwargs):
+        if not isinstance(parts, str):  # vision call (image parts)
+            self.behaviour.wait()
+            return FakeResponse("Paracetamol 500mg\nTake 1 tablet twice daily after food\nDr. Asha Varma")
+        if stream:
+            return self.stream_reply(self.reply_for(parts))
+        self.behaviour.wait()
+        return FakeResponse(self.reply_for(parts))
+
+    def stream_reply(self, reply):
+        words = reply.split(" ")
+        chunk_size = max(1, len(words) // self.stream_chunks)
+        chunks = [" ".join(words[i:i + chunk_size]) + " " for i in range(0, len(words), chunk_size)]
+        for chunk in chunks:
+            self.behaviour.wait(share=1.0 / len(chunks))
+            yield FakeResponse(chunk)
+
+
+class FakeTranslator:
+    """Drop-in for ``google_translator`` that tags text instead of translating it."""
+
+    def __init__(self, latency=0.02, jitter=0.0, error_rate=0.0, seed=1):
+        self.behaviour = _Behaviour(latency, jitter, error_rate, seed)
+
+    def translate(self, text, lang_tgt="auto", lang_src="auto"):
+        self.behaviour.wait()
+        return f"[{lang_tgt}] {text}"
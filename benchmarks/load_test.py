@@ -0,0 +1,88 @@
+"""Concurrent chat load test against a running server.
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 32 --duration 20
+
+Each worker keeps its own cookie session and posts /ask messages in a loop.
+Reports throughput, latency percentiles and the status code mix (503/504 mean
+the upstream limiters shed load instead of queueing it).
+"""
+import sys, json, time, argparse, threading, urllib.request, urllib.error, http.cookiejar
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+MESSAGES = [
+    "What is paracetamol?",
+    "I have a headache",
+    "Give me a diet tip for diabetics",
+    "How can I sleep better?",
+    "I feel stressed about work",
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def worker(url, endpoint, stop_at, results, lock, worker_id):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    i = worker_id
+    while time.monotonic() < stop_at:
+        body = json.dumps({"message": MESSAGES[i % len(MESSAGES)]}).encode("utf-8")
+        req = urllib.request.Request(url + endpoint, data=body, headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        try:
+            with opener.open(req, timeout=60) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            status = "error"
+        elapsed = time.perf_counter() - start
+        with lock:
+            results.append((status, elapsed))
+        i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", default="/ask")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results, lock = [], threading.Lock()
+    stop_at = time.monotonic() + args.duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for n in range(args.concurrency):
+            pool.submit(worker, args.url.rstrip("/"), args.endpoint, stop_at, results, lock, n)
+    wall = time.perf_counter() - started
+
+    ok = sorted(t for status, t in results if status == 200)
+    summary = {
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "duration_s": round(wall, 2),
+        "requests": len(results),
+        "throughput_rps": round(len(results) / wall, 2) if wall else 0.0,
+        "ok_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(ok, 50) * 1000, 1),
+        "p99_ms": round(percentile(ok, 99) * 1000, 1),
+        "status": {str(k): v for k, v in Counter(status for status, _ in results).items()},
+    }
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        for key, value in summary.items():
+            print(f"{key:>15}: {value}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
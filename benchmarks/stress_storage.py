@@ -0,0 +1,135 @@
+"""Multi-process stress test: no update to user data or the chat log may be lost.
+
+    python benchmarks/stress_storage.py --processes 8 --ops 50 --storage json
+
+Starts ``--processes`` workers (fresh interpreters, like gunicorn workers)
+that import app.py against one shared data directory and, as the same user,
+each run ``--ops`` rounds of:
+
+- POST /save_medication and /save_appointment (blind appends),
+- POST /ask (appends to the chat log; Gemini is faked),
+- a compare-and-swap increment: GET /get_user_data, then PUT
+  /update_medication/0 with ``count + 1`` and If-Match, retried on 409.
+
+Afterwards every appended record and every increment must be on disk.
+Exits 1 if anything was lost.
+"""
+import os, sys, json, time, shutil, argparse, tempfile, multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+USER_ID = "stress"
+
+
+def worker(worker_id, data_dir, storage, ops, start, results):
+    sys.path[:0] = [ROOT, BENCH_DIR]
+    os.chdir(ROOT)
+    os.environ.update({"GOOGLE_API_KEY": "stress", "SEHAT_DATA_DIR": data_dir, "SEHAT_STORAGE": storage,
+                       "TRANSLATION_PRELOAD": "0", "METRICS_JSON_LOG": "0"})
+    from fakes import FakeGenerativeModel
+    import app
+    app.chat_sessions.model = FakeGenerativeModel(latency=0.0)
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess["uid"] = USER_ID
+        sess["lang"] = "en"
+
+    start.wait()
+    started = time.perf_counter()
+    conflicts = errors = 0
+    for i in range(ops):
+        tag = f"w{worker_id}-{i}"
+        statuses = [
+            client.post("/save_medication", json={"name": tag, "dosage": "1mg", "schedule": "daily"}).status_code,
+            client.post("/save_appointment", json={"doctor_name": "Dr. Stress", "note": tag}).status_code,
+            client.post("/ask", json={"message": f"stress message {tag}"}).status_code,
+        ]
+        errors += sum(status != 200 for status in statuses)
+        while True:
+            response = client.get("/get_user_data")
+            counter = response.get_json()["medications"][0]
+            counter = dict(counter, count=counter["count"] + 1)
+            status = client.put("/update_medication/0", json=counter,
+                                headers={"If-Match": response.headers["ETag"]}).status_code
+            if status != 409:
+                errors += status != 200
+                break
+            conflicts += 1
+    results.put({"worker": worker_id, "seconds": time.perf_counter() - started,
+                 "conflicts": conflicts, "errors": errors})
+
+
+def check(data_dir, storage, processes, ops):
+    sys.path.insert(0, ROOT)
+    from storage import open_user_store
+    from chat_store import ChatLogStore
+    store = open_user_store(storage, os.path.join(data_dir, "user_data.json"), os.path.join(data_dir, "sehat.db"))
+    data = store.get_user_data(USER_ID)
+    expected = {f"w{w}-{i}" for w in range(processes) for i in range(ops)}
+    meds = {m["name"] for m in data["medications"][1:]}
+    appts = {a.get("note") for a in data["appointments"]}
+    chat = {e["user"].removeprefix("stress message ") for e in ChatLogStore(os.path.join(data_dir, "chat_log.jsonl")).entries()
+            if e.get("user", "").startswith("stress message ")}
+    return {
+        "medications_lost": len(expected - meds),
+        "appointments_lost": len(expected - appts),
+        "chat_messages_lost": len(expected - chat),
+        "increments_lost": processes * ops - data["medications"][0]["count"],
+        "final_version": data["version"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=50, help="rounds per process")
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--json", metavar="PATH", help="also write results to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from storage import open_user_store
+    data_dir = tempfile.mkdtemp(prefix="sehat-stress-")
+    try:
+        store = open_user_store(args.storage, os.path.join(data_dir, "user_data.json"), os.path.join(data_dir, "sehat.db"))
+        store.add_item(USER_ID, "medications", {"name": "counter", "dosage": "-", "schedule": "-", "count": 0})
+
+        ctx = multiprocessing.get_context("spawn")
+        start, results = ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(n, data_dir, args.storage, args.ops, start, results))
+                 for n in range(args.processes)]
+        for proc in procs:
+            proc.start()
+        started = time.perf_counter()
+        start.set()
+        runs = [results.get() for _ in procs]
+        wall = time.perf_counter() - started
+        for proc in procs:
+            proc.join()
+
+        summary = check(data_dir, args.storage, args.processes, args.ops)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    requests = args.processes * args.ops * 5 + sum(r["conflicts"] * 2 for r in runs)
+    summary.update({
+        "storage": args.storage,
+        "processes": args.processes,
+        "ops": args.ops,
+        "wall_s": round(wall, 2),
+        "requests_per_s": round(requests / wall, 1),
+        "cas_conflicts_retried": sum(r["conflicts"] for r in runs),
+        "http_errors": sum(r["errors"] for r in runs),
+    })
+    for key, value in summary.items():
+        print(f"{key:<24} {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    lost = sum(summary[key] for key in summary if key.endswith("_lost"))
+    print("OK: nothing lost" if not lost and not summary["http_errors"] else "FAIL: updates were lost")
+    return 1 if lost or summary["http_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import io, os, re, gzip, json, time, datetime, threading
+
+from storage import FileLock
+
+try:  # optional: smaller and faster than gzip when installed
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SEGMENT_SIZES = ("daily", "weekly")
+CODECS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+SEGMENT_NAME = re.compile(r"^chat-(\d{4}-\d{2}-\d{2}|\d{4}-W\d{2})(\.jsonl\.gz|\.jsonl\.zst)$")
+DAY = datetime.timedelta(days=1)
+
+
+def entry_time(entry):
+    """Epoch seconds of an entry's ISO ``timestamp`` (None if missing or malformed)."""
+    try:
+        return datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def day_start(day):
+    return datetime.datetime.combine(day, datetime.time()).timestamp()
+
+
+class ChatArchive:
+    """Cold tier of the chat log: compressed JSONL segments, one per day or ISO week.
+
+    ``roll_over`` moves entries older than ``hot_days`` out of the hot log
+    (chat_store.ChatLogStore) into ``chat-2026-10-16.jsonl.gz`` (daily) or
+    ``chat-2026-W42.jsonl.gz`` (weekly). A segment is rewritten to a temp file
+    and renamed into place, merging what it held by entry id, so a run cut
+    short between writing the archive and trimming the hot log just repeats.
+    ``enforce`` deletes segments past ``retention_days`` and then, oldest
+    first, while the archive is over ``max_bytes`` (0 = no cap).
+
+    Segments are only ever read line by line (``export``). The directory's
+    ``.lock`` (storage.FileLock) serialises worker processes.
+    """
+
+    def __init__(self, directory, hot_days=7, retention_days=365, max_bytes=0, segment="daily", codec="gzip",
+                 level=None):
+        if segment not in SEGMENT_SIZES:
+            raise ValueError(f"segment must be one of {SEGMENT_SIZES}")
+        if codec not in CODECS:
+            raise ValueError(f"codec must be one of {tuple(CODECS)}")
+        if codec == "zstd" and zstandard is None:
+            print("zstandard is not installed; chat archive segments use gzip")
+            codec = "gzip"
+        self.directory = directory
+        self.hot_days = hot_days
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.segment = segment
+        self.codec = codec
+        self.level = level if level is not None else (3 if codec == "zstd" else 6)
+        self.last_run = None
+        os.makedirs(directory, exist_ok=True)
+        self._lock = FileLock(os.path.join(directory, ".lock"))
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------------------------
+    # Segments
+    # ---------------------------
+    def segment_key(self, ts):
+        day = datetime.datetime.fromtimestamp(ts).date()
+        if self.segment == "weekly":
+            year, week, _ = day.isocalendar()
+            return f"{year}-W{week:02d}"
+        return day.isoformat()
+
+    @staticmethod
+    def key_days(key):
+        """``(first_day, last_day)`` covered by a segment key."""
+        if "-W" in key:
+            year, week = key.split("-W")
+            first = datetime.date.fromisocalendar(int(year), int(week), 1)
+            return first, first + 6 * DAY
+        first = datetime.date.fromisoformat(key)
+        return first, first
+
+    def segments(self):
+        """``[(first_day, last_day, path)]``, oldest first."""
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_NAME.match(name)
+            if match:
+                found.append((*self.key_days(match.group(1)), os.path.join(self.directory, name)))
+        # By last day, so a weekly segment sorts after the daily ones it follows (after a config switch)
+        return sorted(found, key=lambda segment: (segment[1], segment[0]))
+
+    @staticmethod
+    def _lines(f, path):
+        """Decompressed lines of an open segment file; closes it when done."""
+        with f:
+            if path.endswith(CODECS["zstd"]):
+                if zstandard is None:
+                    print(f"Skipping {path}: zstandard is not installed")
+                    return
+                stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f))
+            else:
+                stream = gzip.GzipFile(fileobj=f, mode="rb")
+            with stream:
+                yield from stream
+
+    def _compressor(self, raw):
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).stream_writer(raw, closefd=False)
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=self.level, mtime=0)
+
+    def _write_segment(self, key, entries):
+        """Merge ``entries`` into segment ``key`` (they win over older records with the same id)."""
+        new_ids = {str(entry["id"]) for entry in entries}
+        path = os.path.join(self.directory, f"chat-{key}{CODECS[self.codec]}")
+        existing = [p for p in (os.path.join(self.directory, f"chat-{key}{ext}") for ext in CODECS.values())
+                    if os.path.exists(p)]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as raw:
+            with self._compressor(raw) as out:
+                for old_path in existing:
+                    for line in self._lines(open(old_path, "rb"), old_path):
+                        if str(json.loads(line)["id"]) not in new_ids:
+                            out.write(line)
+                for entry in entries:
+                    out.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        for old_path in existing:
+            if old_path != path:
+                os.remove(old_path)  # written with the other codec before a config change
+
+    # ---------------------------
+    # Maintenance
+    # ---------------------------
+    def roll_over(self, chat_store, before=None):
+        """Move hot-log entries first written before ``before`` (epoch seconds; default
+        ``hot_days`` ago) into their segments. Returns how many moved."""
+        if before is None:
+            before = time.time() - self.hot_days * 86400
+        with self._lock:
+            return chat_store.roll_over(before, self._archive)
+
+    def clear(self, chat_store, entries=()):
+        """Delete the whole chat history, hot log and archive segments alike, and replace
+        it with ``entries``, in one step (clear chat). Returns how many hot-log entries went."""
+        with self._lock:
+            deleted = chat_store.clear(None, entries)
+            for _, _, path in self.segments():
+                os.remove(path)
+        return deleted
+
+    def _archive(self, timed_entries):
+        # Entries arrive in time order, so each segment's share is one contiguous run.
+        key, batch = None, []
+        for ts, entry in timed_entries:
+            entry_key = self.segment_key(ts)
+            if entry_key != key and batch:
+                self._write_segment(key, batch)
+                batch = []
+            key = entry_key
+            batch.append(entry)
+        if batch:
+            self._write_segment(key, batch)
+
+    def enforce(self, now=None):
+        """Delete segments past retention, then the oldest while over ``max_bytes``.
+        Returns the removed paths."""
+        today = datetime.date.fromtimestamp(now if now is not None else time.time())
+        removed = []
+        with self._lock:
+            kept = []
+            for first, last, path in self.segments():
+                if self.retention_days and (today - last).days > self.retention_days:
+                    os.remove(path)
+                    removed.append(path)
+                else:
+                    kept.append((path, os.path.getsize(path)))
+            total = sum(size for _, size in kept)
+            while self.max_bytes and kept and total > self.max_bytes:
+                path, size = kept.pop(0)
+                os.remove(path)
+                removed.append(path)
+                total -= size
+        return removed
+
+    def run(self, chat_store, on_expire=None):
+        """One maintenance pass: roll over, then enforce retention and size caps.
+
+        If segments were deleted, ``on_expire(before)`` is told the epoch time
+        before which no chat history remains (e.g. to prune the search index).
+        """
+        started = time.perf_counter()
+        cutoff = time.time() - self.hot_days * 86400
+        moved = self.roll_over(chat_store, cutoff)
+        removed = self.enforce()
+        if removed and on_expire is not None:
+            segments = self.segments()
+            on_expire(day_start(min(first for first, _, _ in segments)) if segments else cutoff)
+        self.last_run = {"at": datetime.datetime.now().isoformat(), "moved": moved, "removed": len(removed),
+                         "seconds": round(time.perf_counter() - started, 3)}
+        return self.last_run
+
+    def start(self, chat_store, interval, on_expire=None):
+        """Call ``run`` every ``interval`` seconds in a daemon thread (first run after one interval)."""
+        if self._thread is not None or interval <= 0:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.run(chat_store, on_expire)
+                except Exception as e:
+                    print(f"Chat archive maintenance failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="chat-archive", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self._stop.clear()
+
+    # ---------------------------
+    # Reading
+    # ---------------------------
+    def export(self, chat_store, since=None, until=None):
+        """Yield archived, then hot entries, oldest first, with ``since <= timestamp < until``
+        (epoch seconds, both optional), holding one line in memory at a time.
+
+        The segment list and the hot log are snapshotted together, under the
+        lock. Only the newest segment can still receive entries that are in
+        the hot snapshot, so it is opened right away; older ones are opened
+        when reached (and skipped if retention deleted them meanwhile).
+        """
+        with self._lock:
+            segments = [(first, last, path) for first, last, path in self.segments()
+                        if (since is None or day_start(last + DAY) > since)
+                        and (until is None or day_start(first) < until)]
+            newest = open(segments[-1][2], "rb") if segments else None
+            hot = chat_store.iter_entries()
+        return self._export(segments, newest, hot, since, until)
+
+    def _export(self, segments, newest, hot, since, until):
+        def wanted(entry):
+            if since is None and until is None:
+                return True
+            ts = entry_time(entry)
+            return ts is not None and (since is None or ts >= since) and (until is None or ts < until)
+
+        try:
+            for n, (_, _, path) in enumerate(segments):
+                if n == len(segments) - 1:
+                    f, newest = newest, None
+                else:
+                    try:
+                        f = open(path, "rb")
+                    except FileNotFoundError:
+                        continue
+                for line in self._lines(f, path):
+                    entry = json.loads(line)
+                    if wanted(entry):
+                        yield entry
+            for entry in hot:
+                if wanted(entry):
+                    yield entry
+        finally:
+            if newest is not None:
+                newest.close()
+            hot.close()
+
+    def stats(self):
+        segments, size = self.segments(), 0
+        for _, _, path in segments:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return {
+            "segments": len(segments),
+            "bytes": size,
+            "oldest_day": segments[0][0].isoformat() if segments else None,
+            "newest_day": segments[-1][1].isoformat() if segments else None,
+            "segment": self.segment,
+            "codec": self.codec,
+            "hot_days": self.hot_days,
+            "retention_days": self.retention_days,
+            "max_bytes": self.max_bytes,
+            "last_run": self.last_run,
+        }
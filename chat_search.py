@@ -0,0 +1,181 @@
+import re, sqlite3, threading, unicodedata
+
+# Indic vowel signs and viramas are "Mn"/"Mc" marks, which FTS5's unicode61
+# tokenizer treats as separators; declaring them token characters keeps
+# Telugu (and other Indic) words whole.
+INDIC_MARKS = "".join(chr(c) for c in range(0x0900, 0x0E00) if unicodedata.category(chr(c)) in ("Mn", "Mc"))
+WORD_CHAR = r"[\w\u0900-\u0DFF]"
+QUERY_TOKEN = re.compile(WORD_CHAR + "+")
+INDIC = re.compile(r"[\u0900-\u0DFF]")
+SORTS = ("relevance", "recent")
+
+
+class ChatSearchIndex:
+    """Full-text index over the chat log's ``user`` and ``bot`` fields (SQLite FTS5).
+
+    ``add`` upserts one entry by its chat-log id, so edits replace the old
+    text; it is called on every save/update, which keeps the index current
+    without rescans. All query words must match; Telugu (Indic) words match
+    as prefixes, so a stem finds its suffixed forms ("తలనొప్పి" finds
+    "తలనొప్పికి"), English words match whole.
+
+    Hits are ranked by BM25 (the user's own words weighted above the bot's)
+    among the newest ``rank_window`` matches, which bounds the ranking and
+    snippet work for words that occur in most messages. The database may be
+    shared by several worker processes.
+    """
+
+    def __init__(self, path, user_weight=2.0, bot_weight=1.0, rank_window=2000):
+        self.path = path
+        self.user_weight = user_weight
+        self.bot_weight = bot_weight
+        self.rank_window = rank_window
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS messages ("
+                         "rowid INTEGER PRIMARY KEY, entry_id TEXT UNIQUE NOT NULL, timestamp TEXT)")
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                         f"user, bot, tokenize=\"unicode61 remove_diacritics 2 tokenchars '{INDIC_MARKS}'\", "
+                         "prefix='2 3')")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+    def add(self, entry):
+        """Index (or re-index) one chat entry."""
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        with self._conn() as conn:
+            for entry in entries:
+                entry_id = str(entry["id"])
+                row = conn.execute("SELECT rowid FROM messages WHERE entry_id = ?", (entry_id,)).fetchone()
+                if row:
+                    rowid = row[0]
+                    conn.execute("DELETE FROM messages_fts WHERE rowid = ?", (rowid,))
+                    conn.execute("UPDATE messages SET timestamp = ? WHERE rowid = ?", (entry.get("timestamp"), rowid))
+                else:
+                    rowid = conn.execute("INSERT INTO messages (entry_id, timestamp) VALUES (?, ?)",
+                                         (entry_id, entry.get("timestamp"))).lastrowid
+                conn.execute("INSERT INTO messages_fts (rowid, user, bot) VALUES (?, ?, ?)",
+                             (rowid, entry.get("user") or "", entry.get("bot") or ""))
+
+    def reset(self, entries=()):
+        """Drop everything and index ``entries`` (clear chat deletes archived chats too)."""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM messages")
+            conn.execute("DELETE FROM messages_fts")
+        self.add_many(entries)
+
+    def sync(self, chat_store, batch=500):
+        """Index the entries of ``chat_store`` the index is missing (first start,
+        or writes it missed). Entries rolled into the chat archive stay indexed
+        until ``prune`` drops them. Returns how many were added."""
+        added, conn, pending = 0, self._conn(), []
+        for entry in chat_store.iter_entries():
+            pending.append(entry)
+            if len(pending) == batch:
+                added += self._add_missing(conn, pending)
+                pending = []
+        return added + self._add_missing(conn, pending)
+
+    def _add_missing(self, conn, entries):
+        if not entries:
+            return 0
+        marks = ",".join("?" * len(entries))
+        known = {row[0] for row in conn.execute(f"SELECT entry_id FROM messages WHERE entry_id IN ({marks})",
+                                                [str(entry["id"]) for entry in entries])}
+        missing = [entry for entry in entries if str(entry["id"]) not in known]
+        self.add_many(missing)
+        return len(missing)
+
+    def prune(self, before):
+        """Drop entries timestamped before ``before`` (a datetime); used when the
+        chat archive deletes expired segments. Returns how many went."""
+        cutoff = before.isoformat()
+        with self._conn() as conn:
+            conn.execute("DELETE FROM messages_fts WHERE rowid IN (SELECT rowid FROM messages WHERE timestamp < ?)",
+                         (cutoff,))
+            return conn.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff,)).rowcount
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    @staticmethod
+    def terms(query):
+        """``[(word, is_prefix)]``: Indic words match as prefixes (case suffixes are
+        written joined to the word); English words match whole, since expanding a
+        prefix costs a merge over every matching term's postings."""
+        return [(token, bool(INDIC.search(token))) for token in QUERY_TOKEN.findall(query.lower())]
+
+    @staticmethod
+    def match_expression(terms):
+        """FTS5 MATCH string: every term quoted (so query text can't inject syntax)."""
+        return " ".join(f'"{token}"*' if prefix else f'"{token}"' for token, prefix in terms)
+
+    @staticmethod
+    def snippet(text, pattern, width=160):
+        """About ``width`` characters of ``text`` around the first match, matches in ``**``."""
+        match = pattern.search(text)
+        start = 0 if match is None or match.start() < width // 3 else text.rfind(" ", 0, match.start() - width // 3) + 1
+        end = text.find(" ", start + width)
+        end = len(text) if end == -1 else end
+        return ("…" if start else "") + pattern.sub(r"**\g<0>**", text[start:end]) + ("…" if end < len(text) else "")
+
+    def search(self, query, limit=20, offset=0, sort="relevance"):
+        """Return ``(hits, total)``; ``total`` counts at most ``rank_window`` matches.
+
+        Hits carry the entry id, timestamp, score (None for ``sort="recent"``,
+        newest first) and ``**``-marked snippets of both fields.
+        """
+        terms = self.terms(query)
+        if not terms:
+            return [], 0
+        expression = self.match_expression(terms)
+        conn = self._conn()
+        # One pass over the newest rank_window matches gives the page and the total.
+        if sort == "recent":
+            rows = conn.execute(
+                "SELECT rowid, NULL, COUNT(*) OVER () FROM (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? "
+                "ORDER BY rowid DESC LIMIT ?) ORDER BY rowid DESC LIMIT ? OFFSET ?",
+                (expression, self.rank_window, limit, offset)).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT rowid, score, COUNT(*) OVER () FROM (SELECT rowid, bm25(messages_fts, ?, ?) AS score "
+                "FROM messages_fts WHERE messages_fts MATCH ? ORDER BY rowid DESC LIMIT ?) "
+                "ORDER BY score, rowid DESC LIMIT ? OFFSET ?",
+                (self.user_weight, self.bot_weight, expression, self.rank_window, limit, offset)).fetchall()
+        if not rows:
+            return [], 0 if offset == 0 else self._count(conn, expression)
+        ranked, total = [row[:2] for row in rows], rows[0][2]
+
+        # Snippets for the returned page only, from a plain rowid read (FTS5's
+        # snippet() would re-run the MATCH for every row).
+        marks = ",".join("?" * len(ranked))
+        rows = {rowid: rest for rowid, *rest in conn.execute(
+            "SELECT f.rowid, m.entry_id, m.timestamp, f.user, f.bot FROM messages_fts f "
+            f"JOIN messages m ON m.rowid = f.rowid WHERE f.rowid IN ({marks})", [rowid for rowid, _ in ranked])}
+        alternatives = "|".join(re.escape(token) + (WORD_CHAR + "*" if prefix else "") for token, prefix in terms)
+        pattern = re.compile(f"(?<!{WORD_CHAR})(?:{alternatives})(?!{WORD_CHAR})", re.IGNORECASE)
+        hits = []
+        for rowid, score in ranked:
+            entry_id, timestamp, user, bot = rows[rowid]
+            hits.append({"id": entry_id, "timestamp": timestamp, "score": None if score is None else round(-score, 3),
+                         "user_snippet": self.snippet(user, pattern), "bot_snippet": self.snippet(bot, pattern)})
+        return hits, total
+
+    def _count(self, conn, expression):
+        return conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM messages_fts WHERE messages_fts MATCH ? LIMIT ?)",
+                            (expression, self.rank_window)).fetchone()[0]
@@ -0,0 +1,204 @@
+import json, time, threading, hashlib
+from collections import OrderedDict
+
+from prompts import estimate_tokens, history_tokens, truncate
+
+PREAMBLE_REPLY = "I understand my purpose. I'm ready to help!"
+
+
+def user_data_fingerprint(user_data):
+    """Identifies a user data document's contents, used to detect profile changes:
+    its storage version when it has one, else a stable hash."""
+    if "version" in user_data:
+        return user_data["version"]
+    payload = json.dumps(user_data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class _Session:
+    __slots__ = ("chat", "fingerprint", "preamble_tokens", "last_used", "lock")
+
+    def __init__(self, chat, fingerprint, preamble_tokens):
+        self.chat = chat
+        self.fingerprint = fingerprint
+        self.preamble_tokens = preamble_tokens
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class ChatSessionManager:
+    """Maps session ids to their own Gemini chat objects.
+
+    - Each chat starts with the personalised system instruction preamble
+      (two history messages), so messages themselves carry no instruction.
+      It is rendered only when a chat starts or that user's data version
+      (fingerprint) changes.
+    - After every turn the history is cut back to the preamble plus the last
+      ``max_turns`` user/model exchanges (sliding window).
+    - With ``max_prompt_tokens``, the oldest exchanges are also dropped
+      before a send until the estimated prompt (preamble, history and the
+      new message) fits; a message too long on its own is truncated.
+      ``report`` (if given) receives each prompt's size breakdown, as does
+      the per-call ``on_prompt``.
+    - At most ``max_sessions`` chats are kept; the least recently used one is
+      evicted first, and chats idle for longer than ``idle_ttl`` seconds are
+      dropped. Together with ``max_turns`` this bounds memory.
+    """
+
+    def __init__(self, model, instruction_fn, max_sessions=500, idle_ttl=1800, max_turns=10, max_prompt_tokens=0,
+                 report=None):
+        self.model = model
+        self.instruction_fn = instruction_fn
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.max_prompt_tokens = max_prompt_tokens
+        self.report = report
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _preamble(self, user_data):
+        return [
+            {"role": "user", "parts": [self.instruction_fn(user_data)]},
+            {"role": "model", "parts": [PREAMBLE_REPLY]},
+        ]
+
+    def _evict(self, now):
+        while self._sessions:
+            session_id, sess = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - sess.last_used > self.idle_ttl:
+                del self._sessions[session_id]
+            else:
+                break
+
+    def _get(self, session_id, user_data):
+        fingerprint = user_data_fingerprint(user_data)
+        now = time.monotonic()
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                preamble = self._preamble(user_data)
+                sess = _Session(self.model.start_chat(history=preamble), fingerprint, history_tokens(preamble))
+                self._sessions[session_id] = sess
+            else:
+                self._sessions.move_to_end(session_id)
+            sess.last_used = now
+            self._evict(now)
+        if sess.fingerprint != fingerprint:
+            preamble = self._preamble(user_data)
+            with sess.lock:
+                sess.chat.history = preamble + list(sess.chat.history[2:])
+                sess.fingerprint = fingerprint
+                sess.preamble_tokens = history_tokens(preamble)
+        return sess
+
+    def _trim(self, chat):
+        keep = 2 * self.max_turns
+        history = chat.history
+        if len(history) > 2 + keep:
+            chat.history = list(history[:2]) + list(history[-keep:] if keep else [])
+
+    def _fit(self, sess, content, on_prompt=None):
+        """Drop the oldest exchanges (then truncate ``content``) until the prompt fits
+        ``max_prompt_tokens``; returns the content to send."""
+        history = sess.chat.history
+        turns_tokens = history_tokens(history[2:])
+        message_tokens = estimate_tokens(content) if isinstance(content, str) else 0
+        dropped, truncated = 0, False
+        budget = self.max_prompt_tokens
+        if budget:
+            start = 2
+            while sess.preamble_tokens + turns_tokens + message_tokens > budget and start < len(history):
+                turns_tokens -= history_tokens(history[start:start + 2])
+                start += 2
+                dropped += 1
+            if dropped:
+                sess.chat.history = list(history[:2]) + list(history[start:])
+            room = max(budget - sess.preamble_tokens - turns_tokens, budget // 4)
+            if message_tokens > room:
+                content = truncate(content, room)
+                message_tokens = estimate_tokens(content)
+                truncated = True
+        sizes = {
+            "instruction_tokens": sess.preamble_tokens,
+            "history_tokens": turns_tokens,
+            "message_tokens": message_tokens,
+            "total_tokens": sess.preamble_tokens + turns_tokens + message_tokens,
+            "dropped_turns": dropped,
+            "truncated": truncated,
+        }
+        self._report(sizes, on_prompt)
+        return content
+
+    def _report(self, sizes, on_prompt):
+        for report in (self.report, on_prompt):
+            if report is not None:
+                report(sizes)
+
+    def send_message(self, session_id, user_data, content, on_prompt=None, **kwargs):
+        """Send ``content`` on the session's chat and return the response."""
+        sess = self._get(session_id, user_data)
+        with sess.lock:
+            content = self._fit(sess, content, on_prompt)
+            response = sess.chat.send_message(content, **kwargs)
+            self._trim(sess.chat)
+            return response
+
+    def stream_message(self, session_id, user_data, content, on_prompt=None, **kwargs):
+        """Yield the reply text chunk by chunk (``stream=True``).
+
+        If the consumer stops early (client disconnect) or the stream fails,
+        the half-finished turn is dropped from the chat history.
+        """
+        sess = self._get(session_id, user_data)
+        with sess.lock:
+            snapshot = list(sess.chat.history)
+            completed = False
+            content = self._fit(sess, content, on_prompt)
+            try:
+                response = sess.chat.send_message(content, stream=True, **kwargs)
+                for chunk in response:
+                    text = chunk.text
+                    if text:
+                        yield text
+                completed = True
+            finally:
+                if completed:
+                    self._trim(sess.chat)
+                else:
+                    sess.chat.history = snapshot
+
+    def generate(self, content, on_prompt=None, **kwargs):
+        """One-off call outside any chat: no personal preamble or history, so the
+        reply can be shared between users (e.g. cached). Returns the response
+        (an iterator of chunks with ``stream=True``)."""
+        if self.max_prompt_tokens and isinstance(content, str):
+            content = truncate(content, self.max_prompt_tokens)
+        message_tokens = estimate_tokens(content) if isinstance(content, str) else 0
+        self._report({"instruction_tokens": 0, "history_tokens": 0, "message_tokens": message_tokens,
+                      "total_tokens": message_tokens, "dropped_turns": 0, "truncated": False}, on_prompt)
+        return self.model.generate_content(content, **kwargs)
+
+    def stream_generate(self, content, on_prompt=None, **kwargs):
+        """``generate`` with ``stream=True``, yielding the reply text chunk by chunk."""
+        for chunk in self.generate(content, on_prompt, stream=True, **kwargs):
+            text = chunk.text
+            if text:
+                yield text
+
+    def add_turn(self, session_id, user_data, content, reply):
+        """Record an exchange answered by ``generate`` in the session's history,
+        so follow-up messages in the chat still see it."""
+        sess = self._get(session_id, user_data)
+        with sess.lock:
+            sess.chat.history = list(sess.chat.history) + [{"role": "user", "parts": [content]},
+                                                           {"role": "model", "parts": [reply]}]
+            self._trim(sess.chat)
+
+    def reset(self, session_id):
+        """Forget a session's chat (e.g. when its chat log is cleared)."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
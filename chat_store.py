@@ -0,0 +1,287 @@
+import os, json, datetime
+from bisect import bisect_left
+
+from storage import FileLock
+
+
+class ChatLogStore:
+    """Append-only chat log kept as a JSONL file with an in-memory id -> offset index.
+
+    Every new message is a single appended line. Editing a message (``edit_id``)
+    appends a superseding record with the same id; the index always points at
+    the newest one. Superseded lines are dropped by ``compact()``, which runs
+    automatically once they outnumber the live records.
+
+    Alongside the offsets the store keeps the chat order (``_ids``) and a
+    parallel, non-decreasing array of first-write times (``_times``), so
+    "last N days / last N messages / page before id" reads are a bisect plus
+    a slice instead of a scan over the whole history.
+
+    Several processes may share the file: every call holds ``<path>.lock``
+    (see storage.FileLock) and first indexes records other processes
+    appended since, or re-reads the file if it was replaced (compaction).
+    """
+
+    def __init__(self, path, legacy_path=None, compact_min_dead=500, compact_ratio=1.0):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_min_dead = compact_min_dead
+        self.compact_ratio = compact_ratio
+        self._lock = FileLock(path + ".lock")
+        self._offsets = {}  # id -> byte offset of the newest record (insertion order = chat order)
+        self._dead = 0      # superseded records still on disk
+        self._size = 0      # end of the last complete record
+        self._inode = None  # file the index was built from
+        self._ids = []      # chat order
+        self._times = []    # epoch seconds, parallel to _ids, never decreasing
+        self._pos = {}      # id -> index into _ids
+        self._system_ids = []  # entries with no user text (greetings)
+        with self._lock:
+            if not os.path.exists(self.path):
+                self._migrate_legacy()
+            self._load_index()
+
+    # ---------------------------
+    # Startup
+    # ---------------------------
+    def _migrate_legacy(self):
+        """One-time import of the old ``chat_log.json`` list into the JSONL file."""
+        history = []
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            try:
+                with open(self.legacy_path, "r", encoding="utf-8") as f:
+                    history = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Chat log migration skipped ({self.legacy_path}): {e}")
+                history = []
+        if not isinstance(history, list):
+            history = []
+        self._write_all(entry for entry in history if isinstance(entry, dict) and entry.get("id"))
+
+    def _load_index(self):
+        self._offsets = {}
+        self._dead = 0
+        self._ids, self._times, self._pos, self._system_ids = [], [], {}, []
+        self._inode = os.stat(self.path).st_ino
+        self._index_from(0)
+
+    def _index_from(self, offset):
+        """Index the records from ``offset`` to the end (truncating a torn last line)."""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash; it gets truncated below
+                try:
+                    entry = json.loads(line)
+                    entry_id = str(entry["id"])
+                except (ValueError, KeyError, TypeError):
+                    offset += len(line)
+                    self._dead += 1
+                    continue
+                self._index_entry(entry_id, entry, offset)
+                offset += len(line)
+        if offset != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+        self._size = offset
+
+    def _sync(self):
+        """Catch up with writes made by other processes (call with the lock held)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._write_all(())
+            st = os.stat(self.path)
+        if st.st_ino != self._inode or st.st_size < self._size:
+            self._load_index()
+        elif st.st_size > self._size:
+            self._index_from(self._size)
+
+    # ---------------------------
+    # Low-level IO
+    # ---------------------------
+    @staticmethod
+    def _encode(entry):
+        return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _append_record(self, entry):
+        data = self._encode(entry)
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self._index_entry(str(entry["id"]), entry, self._size)
+        self._size += len(data)
+
+    def _index_entry(self, entry_id, entry, offset):
+        if entry_id in self._offsets:
+            self._dead += 1  # superseding record keeps its original position
+        else:
+            ts = self._parse_time(entry.get("timestamp"))
+            if self._times and (ts is None or ts < self._times[-1]):
+                ts = self._times[-1]
+            self._pos[entry_id] = len(self._ids)
+            self._ids.append(entry_id)
+            self._times.append(ts if ts is not None else 0.0)
+            if not entry.get("user"):
+                self._system_ids.append(entry_id)
+        self._offsets[entry_id] = offset
+
+    @staticmethod
+    def _parse_time(value):
+        try:
+            return datetime.datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+
+    def _read_at(self, f, offset):
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def _write_all(self, entries):
+        """Atomically replace the log file with ``entries``."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for entry in entries:
+                f.write(self._encode(entry))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def append(self, entry):
+        """Append a new chat entry (must carry an ``id``)."""
+        with self._lock:
+            self._sync()
+            self._append_record(entry)
+            self._maybe_compact()
+        return entry
+
+    def upsert(self, entry):
+        """Write ``entry``, superseding any earlier record with the same id."""
+        return self.append(entry)
+
+    def get(self, entry_id):
+        with self._lock:
+            self._sync()
+            offset = self._offsets.get(str(entry_id))
+            if offset is None:
+                return None
+            with open(self.path, "rb") as f:
+                return self._read_at(f, offset)
+
+    def entries(self):
+        """Return all live entries in chat order."""
+        with self._lock:
+            self._sync()
+            offsets = list(self._offsets.values())
+            with open(self.path, "rb") as f:
+                return [self._read_at(f, offset) for offset in offsets]
+
+    def iter_entries(self):
+        """Iterator over all live entries in chat order, one at a time.
+
+        Offsets and the open file are taken under the lock, at call time;
+        reading happens outside it, so a slow consumer (a streamed export)
+        never blocks writers, and a concurrent compaction can't pull the file
+        away.
+        """
+        with self._lock:
+            self._sync()
+            offsets = list(self._offsets.values())
+            f = open(self.path, "rb")
+        return self._read_offsets(f, offsets)
+
+    def _read_offsets(self, f, offsets):
+        with f:
+            for offset in offsets:
+                yield self._read_at(f, offset)
+
+    def recent(self, since=None, limit=50, before=None):
+        """Return ``(entries, next_before)`` for the newest ``limit`` entries.
+
+        ``since`` is a datetime lower bound, ``before`` an entry id cursor
+        (exclusive). ``next_before`` is the cursor for the following older
+        page, or ``None`` when there is nothing older in the window.
+        """
+        with self._lock:
+            self._sync()
+            end = len(self._ids)
+            if before is not None:
+                end = self._pos.get(str(before), end)
+            start = 0
+            if since is not None:
+                start = bisect_left(self._times, since.timestamp(), 0, end)
+            page_start = max(start, end - limit) if limit else end
+            ids = self._ids[page_start:end]
+            with open(self.path, "rb") as f:
+                entries = [self._read_at(f, self._offsets[entry_id]) for entry_id in ids]
+            next_before = ids[0] if ids and page_start > start else None
+            return entries, next_before
+
+    def system_entries(self):
+        """Entries without user text (greetings), without scanning the log."""
+        with self._lock:
+            self._sync()
+            with open(self.path, "rb") as f:
+                return [self._read_at(f, self._offsets[entry_id]) for entry_id in self._system_ids]
+
+    def reset(self, entries=()):
+        """Replace the whole log (used by clear chat)."""
+        with self._lock:
+            self._write_all(entries)
+            self._load_index()
+
+    def roll_over(self, before, sink):
+        """Move the entries first written before ``before`` (epoch seconds) out of the log.
+
+        ``sink`` gets an iterator of ``(timestamp, entry)`` in chat order and
+        must have persisted them when it returns; only then is the log
+        rewritten without them. Returns how many entries moved.
+        """
+        with self._lock:
+            self._sync()
+            cut = bisect_left(self._times, before)
+            if cut == 0:
+                return 0
+            sink(zip(self._times[:cut], self._iter_ids(self._ids[:cut])))
+            self._write_all(self._iter_ids(self._ids[cut:]))
+            self._load_index()
+            return cut
+
+    def clear(self, sink, entries=()):
+        """Hand every entry to ``sink`` (as ``roll_over`` does; None drops them) and replace
+        the log with ``entries``, under one lock hold so nothing appended in between escapes
+        the clear."""
+        with self._lock:
+            self._sync()
+            moved = len(self._ids)
+            if moved and sink is not None:
+                sink(zip(self._times, self._iter_ids(self._ids)))
+            self._write_all(entries)
+            self._load_index()
+            return moved
+
+    def _iter_ids(self, ids):
+        return self._read_offsets(open(self.path, "rb"), [self._offsets[entry_id] for entry_id in ids])
+
+    def compact(self):
+        """Rewrite the log keeping only the newest record for each id."""
+        with self._lock:
+            self._write_all(self.entries())
+            self._load_index()
+
+    def _maybe_compact(self):
+        if self._dead >= self.compact_min_dead and self._dead >= len(self._offsets) * self.compact_ratio:
+            self.compact()
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._offsets)
+
+    def __contains__(self, entry_id):
+        with self._lock:
+            self._sync()
+            return str(entry_id) in self._offsets
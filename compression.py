@@ -0,0 +1,121 @@
+import gzip, hashlib, threading
+from collections import OrderedDict
+
+try:  # optional: preferred over gzip when installed and the client accepts it
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "image/svg+xml")
+
+
+class ResponseCompressor:
+    """Compress Flask responses (brotli or gzip, per Accept-Encoding).
+
+    Only buffered responses of a textual type and at least ``min_bytes`` are
+    touched: streamed bodies (SSE) and file downloads pass through. Bodies of
+    ``cache_min_bytes`` or more (e.g. the full doctor list, identical for
+    every client) keep their compressed form in a small LRU keyed by content
+    hash, so they are compressed once rather than per request.
+
+    A compressed body is a different representation of the same resource, so
+    a strong ETag set for the identity body is made weak (``W/``): If-None-Match
+    still matches (weak comparison) while byte-range and strong comparisons
+    don't mix encodings.
+    """
+
+    def __init__(self, min_bytes=1024, level=6, cache_min_bytes=64 * 1024, cache_entries=16):
+        self.min_bytes = min_bytes
+        self.level = level
+        self.cache_min_bytes = cache_min_bytes
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @staticmethod
+    def choose(accept_encoding):
+        """Best supported encoding in an Accept-Encoding header ("br", "gzip" or None)."""
+        accepted = set()
+        for part in (accept_encoding or "").split(","):
+            name, _, params = part.strip().partition(";")
+            key, _, value = params.strip().partition("=")
+            try:
+                if key.strip() == "q" and float(value) <= 0:
+                    continue  # explicitly refused
+            except ValueError:
+                pass
+            accepted.add(name.strip().lower())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted or "*" in accepted:
+            return "gzip"
+        return None
+
+    def compress(self, data, encoding):
+        if len(data) < self.cache_min_bytes:
+            return self._compress(data, encoding)
+        key = (encoding, hashlib.sha1(data).digest())
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                return body
+        body = self._compress(data, encoding)
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return body
+
+    def _compress(self, data, encoding):
+        if encoding == "br":
+            return brotli.compress(data, quality=min(self.level, 11))
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def apply(self, response, accept_encoding):
+        """Compress ``response`` in place when worthwhile; returns it."""
+        if (response.direct_passthrough or response.is_streamed or response.status_code == 204
+                or "Content-Encoding" in response.headers):
+            return response
+        mimetype = response.mimetype or ""
+        if not (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES):
+            return response
+        if response.status_code == 304:  # headers as the 200 it revalidates (likely compressed) had
+            response.vary.add("Accept-Encoding")
+            if self.choose(accept_encoding):
+                self._weaken_etag(response)
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.choose(accept_encoding)
+        if encoding is None:
+            return response
+        body = self.compress(data, encoding)
+        if len(body) >= len(data):
+            return response
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        self._weaken_etag(response)
+        with self._lock:
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+        return response
+
+    @staticmethod
+    def _weaken_etag(response):
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+                "cached_bodies": len(self._cache),
+            }
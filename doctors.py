@@ -0,0 +1,199 @@
+import re, json, heapq, sqlite3
+from array import array
+from bisect import bisect_left
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_STOPWORDS = {"dr"}
+
+# Field weights for ranked search: a hit in the name beats one in the hospital
+SEARCH_FIELDS = (("name", 3.0), ("specialty", 2.0), ("location", 1.5), ("hospital", 1.0))
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DoctorDirectory:
+    """Read-only doctor directory with indexes built once at load time.
+
+    - ``specialty`` filters by prefix over the sorted distinct specialties and
+      ``location`` by substring over the distinct locations; both return
+      posting lists of record positions, so filtering never scans records.
+    - ``q`` is a typo-tolerant free-text search: every token of every
+      searchable field goes into a vocabulary with a trigram index, query
+      tokens match vocabulary tokens exactly, by prefix, or by trigram
+      similarity, and results are ranked by field-weighted similarity.
+    - The unfiltered list is serialised once (``all_json``).
+    """
+
+    def __init__(self, records, schedules=None, min_similarity=0.45):
+        schedules = schedules or {}
+        self.min_similarity = min_similarity
+        self.doctors = []
+        for record in records:
+            doc = dict(record)
+            doc.setdefault("times", list(schedules.get(doc.get("id"), schedules.get(str(doc.get("id")), []))))
+            self.doctors.append(doc)
+        self._by_id = {doc.get("id"): pos for pos, doc in enumerate(self.doctors)}
+
+        self._specialties = {}   # lowercased specialty -> positions
+        self._locations = {}     # lowercased location -> positions
+        self._vocab = []         # token id -> token
+        self._token_ids = {}     # token -> token id
+        self._postings = {field: {} for field, _ in SEARCH_FIELDS}  # field -> token id -> positions
+        for pos, doc in enumerate(self.doctors):
+            self._specialties.setdefault((doc.get("specialty") or "").lower(), array("i")).append(pos)
+            self._locations.setdefault((doc.get("location") or "").lower(), array("i")).append(pos)
+            for field, _ in SEARCH_FIELDS:
+                postings = self._postings[field]
+                for token in set(tokenize(doc.get(field))):
+                    token_id = self._token_ids.get(token)
+                    if token_id is None:
+                        token_id = self._token_ids[token] = len(self._vocab)
+                        self._vocab.append(token)
+                    postings.setdefault(token_id, array("i")).append(pos)
+        self._specialty_keys = sorted(self._specialties)
+        self._sorted_vocab = sorted(self._token_ids)
+        self._trigrams = {}      # trigram -> token ids
+        for token_id, token in enumerate(self._vocab):
+            for gram in trigrams(token):
+                self._trigrams.setdefault(gram, array("i")).append(token_id)
+        self._all_json = None
+
+    # ---------------------------
+    # Loading
+    # ---------------------------
+    @classmethod
+    def from_file(cls, path, schedules=None):
+        """Load from a JSON list, JSON Lines file or SQLite ``doctors`` table (.db/.sqlite).
+
+        Records may carry their own ``times``; otherwise ``schedules`` (id -> times) is used.
+        """
+        if path.endswith((".db", ".sqlite", ".sqlite3")):
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            try:
+                records = [dict(row) for row in conn.execute("SELECT * FROM doctors ORDER BY id")]
+            finally:
+                conn.close()
+            for record in records:
+                if isinstance(record.get("times"), str):
+                    record["times"] = json.loads(record["times"])
+                elif "times" in record and record["times"] is None:
+                    del record["times"]
+        elif path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        return cls(records, schedules)
+
+    # ---------------------------
+    # Lookups
+    # ---------------------------
+    def __len__(self):
+        return len(self.doctors)
+
+    def get(self, doctor_id):
+        pos = self._by_id.get(doctor_id)
+        return self.doctors[pos] if pos is not None else None
+
+    def all_json(self):
+        """The whole directory (with times) as a serialised JSON array, built once."""
+        if self._all_json is None:
+            self._all_json = json.dumps(self.doctors, ensure_ascii=False).encode("utf-8")
+        return self._all_json
+
+    def page(self, limit, offset=0):
+        return self.doctors[offset:offset + limit]
+
+    def _filter(self, specialty, location):
+        """Sorted positions matching the filters, or None when there are none."""
+        sets = []
+        if specialty:
+            specialty = specialty.lower()
+            start = bisect_left(self._specialty_keys, specialty)
+            keys = []
+            for key in self._specialty_keys[start:]:
+                if not key.startswith(specialty):
+                    break
+                keys.append(key)
+            sets.append(_union(self._specialties[key] for key in keys))
+        if location:
+            location = location.lower()
+            sets.append(_union(postings for key, postings in self._locations.items() if location in key))
+        if not sets:
+            return None
+        result = sets[0]
+        for other in sets[1:]:
+            other = set(other)
+            result = [pos for pos in result if pos in other]
+        return result
+
+    def _similar_tokens(self, token):
+        """(token id, similarity) for vocabulary tokens matching ``token``."""
+        matches = {}
+        start = bisect_left(self._sorted_vocab, token)
+        for candidate in self._sorted_vocab[start:]:
+            if not candidate.startswith(token):
+                break
+            matches[self._token_ids[candidate]] = 1.0 if candidate == token else 0.9
+        grams = trigrams(token)
+        shared = {}
+        for gram in grams:
+            for token_id in self._trigrams.get(gram, ()):
+                shared[token_id] = shared.get(token_id, 0) + 1
+        for token_id, count in shared.items():
+            if token_id in matches:
+                continue
+            similarity = 2.0 * count / (len(grams) + len(trigrams(self._vocab[token_id])))  # Dice
+            if similarity >= self.min_similarity:
+                matches[token_id] = similarity * 0.8
+        return matches
+
+    def search(self, q=None, specialty=None, location=None, limit=20, offset=0):
+        """Return ``(doctors, total)`` for one page of results.
+
+        Without ``q`` results keep directory order; with ``q`` every query
+        token must match some field and results are ranked by score.
+        """
+        allowed = self._filter(specialty, location)
+        tokens = tokenize(q)
+        if not tokens:
+            positions = range(len(self.doctors)) if allowed is None else allowed
+            return [self.doctors[pos] for pos in positions[offset:offset + limit]], len(positions)
+
+        allowed_set = set(allowed) if allowed is not None else None
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for token_id, similarity in self._similar_tokens(token).items():
+                for field, weight in SEARCH_FIELDS:
+                    score = similarity * weight
+                    for pos in self._postings[field].get(token_id, ()):
+                        if score > token_scores.get(pos, 0.0):
+                            token_scores[pos] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {pos: total + token_scores[pos] for pos, total in scores.items() if pos in token_scores}
+            if not scores:
+                return [], 0
+        if allowed_set is not None:
+            scores = {pos: score for pos, score in scores.items() if pos in allowed_set}
+        best = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.doctors[pos] for pos, _ in best[offset:]], len(scores)
+
+
+def _union(postings_lists):
+    merged = []
+    for postings in postings_lists:
+        merged.extend(postings)
+    merged.sort()
+    return merged
@@ -0,0 +1,109 @@
+import re, threading
+from collections import OrderedDict
+
+from intent_router import KEYWORD_TABLE
+
+# Matched on the raw message, before any translation. English is the router's emergency
+# keyword set (whole words, optional plural); Telugu is the same phrases, matched as
+# prefixes since case endings are written joined to the word ("గుండెపోటుతో" = "with a heart attack").
+EMERGENCY_KEYWORDS = {
+    "en": dict(KEYWORD_TABLE)["emergency"]["keywords"],
+    "te": ["ఛాతీ నొప్పి", "ఛాతి నొప్పి",          # chest pain
+           "ఊపిరి ఆడటం లేదు", "శ్వాస ఆడటం లేదు",  # shortness of breath
+           "ప్రమాదం",                            # accident
+           "రక్తస్రావం",                          # bleeding
+           "గుండెపోటు"],                         # heart attack
+}
+
+# Written out per language (no translator call on the emergency path)
+EMERGENCY_MESSAGES = {
+    "en": {
+        "message": (
+            "⚠️ Emergency detected!\n"
+            "Please call 108 immediately for an ambulance (112 for police/fire).\n"
+            "• Stay where you are safe, keep your phone with you and unlock the door if you can.\n"
+            "• Don't eat, drink or drive yourself to the hospital.\n"
+            "• If someone is nearby, ask them to stay with you.\n"
+            "This is general advice, not a substitute for professional help."
+        ),
+        "contacts": "Your emergency contacts:",
+    },
+    "te": {
+        "message": (
+            "⚠️ అత్యవసర పరిస్థితి!\n"
+            "అంబులెన్స్ కోసం వెంటనే 108 కు కాల్ చేయండి (పోలీస్/అగ్నిమాపక సేవలకు 112).\n"
+            "• సురక్షితమైన చోట ఉండండి, ఫోన్ మీ దగ్గరే ఉంచుకోండి, వీలైతే తలుపు తెరిచి ఉంచండి.\n"
+            "• ఏమీ తినకండి, తాగకండి, మీరే వాహనం నడుపుకుంటూ ఆసుపత్రికి వెళ్లకండి.\n"
+            "• దగ్గరలో ఎవరైనా ఉంటే, మీతోనే ఉండమని అడగండి.\n"
+            "ఇది సాధారణ సలహా మాత్రమే, వైద్య సహాయానికి ప్రత్యామ్నాయం కాదు."
+        ),
+        "contacts": "మీ అత్యవసర పరిచయాలు:",
+    },
+}
+
+
+class EmergencyResponder:
+    """Emergency detection and replies without the model, translator or a full data load.
+
+    ``detect`` is one regex pass over the raw message covering every
+    language's keywords. ``reply`` returns the precomputed bundle for the
+    language with the user's emergency contacts rendered in; bundles are
+    cached per user and rebuilt only when ``version`` (the user data
+    version) moves, so the hot path is a version check and a dict lookup.
+    """
+
+    def __init__(self, keywords=EMERGENCY_KEYWORDS, messages=EMERGENCY_MESSAGES, max_users=10000,
+                 default_lang="en"):
+        self.messages = messages
+        self.max_users = max_users
+        self.default_lang = default_lang
+        whole = sorted((w.lower() for lang, words in keywords.items() for w in words if w.isascii()), key=len, reverse=True)
+        prefix = sorted((w for lang, words in keywords.items() for w in words if not w.isascii()), key=len, reverse=True)
+        alternatives = []
+        if whole:
+            alternatives.append(r"\b(?:" + "|".join(re.escape(w) for w in whole) + r")(?:e?s)?\b")
+        if prefix:
+            alternatives.append(r"(?<!\w)(?:" + "|".join(re.escape(w) for w in prefix) + ")")
+        self._pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+        self._bundles = OrderedDict()  # user id -> (version, {lang: text})
+        self._lock = threading.Lock()
+
+    def detect(self, text):
+        """The first emergency keyword in ``text`` (any language), or None."""
+        match = self._pattern.search(text or "")
+        return match.group(0) if match else None
+
+    @staticmethod
+    def render_contacts(contacts):
+        lines = []
+        for contact in contacts or []:
+            name = contact.get("name") or ""
+            phone = contact.get("phone") or ""
+            if name or phone:
+                lines.append(f"• {name}: {phone}" if name and phone else f"• {name or phone}")
+        return lines
+
+    def build(self, contacts):
+        """``{lang: reply text}`` for a user with ``contacts``."""
+        lines = self.render_contacts(contacts)
+        return {lang: text["message"] + ("\n\n" + "\n".join([text["contacts"], *lines]) if lines else "")
+                for lang, text in self.messages.items()}
+
+    def reply(self, user_id, lang, version, load_contacts):
+        """The reply for ``user_id`` in ``lang``; ``load_contacts()`` runs only when the
+        user's bundle is missing or older than ``version``."""
+        with self._lock:
+            cached = self._bundles.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._bundles.move_to_end(user_id)
+                bundle = cached[1]
+            else:
+                bundle = None
+        if bundle is None:
+            bundle = self.build(load_contacts())
+            with self._lock:
+                self._bundles[user_id] = (version, bundle)
+                self._bundles.move_to_end(user_id)
+                while len(self._bundles) > self.max_users:
+                    self._bundles.popitem(last=False)
+        return bundle.get(lang) or bundle[self.default_lang]
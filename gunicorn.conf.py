@@ -0,0 +1,21 @@
+# Production server settings (gunicorn >= 20.1): gunicorn -c gunicorn.conf.py app:app
+# Threaded workers let slow Gemini/translator calls wait without blocking the
+# whole process; the UpstreamLimiter caps in app.py keep those waits bounded.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("WEB_THREADS", 32))
+timeout = int(os.environ.get("WEB_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    # Start the job workers, reminders and chat retention in each worker (threads
+    # don't survive the fork), and build the Gemini/translator clients and indexes
+    # before the first request instead of during it; /ready answers 503 until then.
+    import app
+    app.start_background(warmup=True)
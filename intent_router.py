@@ -0,0 +1,88 @@
+import re, json
+from collections import namedtuple
+
+IntentMatch = namedtuple("IntentMatch", ["intent", "entities"])
+
+DEFAULT_INTENT = "default"
+
+# Priority order matters: the first intent with a hit wins (emergency first).
+# "keywords" are reported back as entities (used for response caching);
+# "triggers" only select the intent ("what is this tablet?" names no medicine).
+KEYWORD_TABLE = [
+    ("emergency", {"keywords": ["chest pain", "shortness of breath", "accident", "bleeding", "heart attack"]}),
+    ("mental", {"keywords": ["stress", "stressed", "stressful", "anxious", "anxiety", "depressed", "sad", "low mood"]}),
+    ("nutrition", {"keywords": ["diet", "food", "nutrition", "exercise", "diabetic"]}),
+    ("quiz/tip", {"triggers": ["quiz", "tip"]}),
+    ("medicine", {"keywords": ["paracetamol", "ibuprofen"], "triggers": ["medicine", "drug", "tablet", "capsule"]}),
+    ("symptoms", {"keywords": ["fever", "headache", "cough", "nausea", "fatigue"], "triggers": ["symptom"]}),
+]
+
+
+def _trie_pattern(words):
+    """Regex alternation for ``words`` with shared prefixes factored out.
+
+    ``chest pain|cough|...`` as a flat alternation makes the regex engine try
+    every keyword at every position; a prefix trie lets it bail out after
+    the first character in almost all positions.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class IntentRouter:
+    """Classifies a message into one intent in a single regex pass.
+
+    The keyword table is compiled once into one word-boundary regex (a prefix
+    trie, with an optional plural "s"/"es"), so "tip" matches "tips" but not
+    "multiple". The highest-priority intent with a hit wins and its matched
+    keywords are returned as entities.
+    """
+
+    def __init__(self, table=KEYWORD_TABLE):
+        self.intents = [intent for intent, _ in table]
+        self._lookup = {}  # keyword -> (priority, intent, is_entity)
+        for rank, (intent, spec) in enumerate(table):
+            for word in spec.get("keywords", []):
+                self._lookup.setdefault(word.lower(), (rank, intent, True))
+            for word in spec.get("triggers", []):
+                self._lookup.setdefault(word.lower(), (rank, intent, False))
+        self._pattern = re.compile(r"\b(" + _trie_pattern(self._lookup) + r")(?:e?s)?\b")
+
+    @classmethod
+    def from_file(cls, path):
+        """Build a router from a JSON list of [intent, {"keywords": [...], "triggers": [...]}]."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls([(intent, spec) for intent, spec in json.load(f)])
+
+    def route(self, text):
+        """Return the IntentMatch for ``text`` (``default`` with no entities if nothing hits)."""
+        best_rank, best_intent, entities = None, DEFAULT_INTENT, []
+        lookup = self._lookup
+        for word in self._pattern.findall(text.lower()):
+            rank, intent, is_entity = lookup[word]
+            if best_rank is None or rank < best_rank:
+                best_rank, best_intent, entities = rank, intent, []
+            if rank == best_rank and is_entity and word not in entities:
+                entities.append(word)
+        return IntentMatch(best_intent, entities)
+
+    def route_many(self, texts):
+        """Classify a batch of messages."""
+        route = self.route
+        return [route(text) for text in texts]
+
+
+router = IntentRouter()
@@ -0,0 +1,222 @@
+import json, time, uuid, heapq, random, sqlite3, threading
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINAL_STATES = (DONE, FAILED)
+
+
+class JobQueue:
+    """In-process worker pool backed by a persistent SQLite job table.
+
+    - ``submit`` / ``submit_many`` record jobs and return their ids at once;
+      ``workers`` threads run them through the handler registered for their
+      ``kind``, so at most ``workers`` jobs run in parallel.
+    - Jobs are claimed with a conditional UPDATE, so several processes can
+      share one table without running a job twice. Jobs left queued, or
+      running for longer than ``stale_after`` seconds (a crashed process),
+      are picked up again on ``start``.
+    - Exceptions matching ``retry_on`` (exception types, or a predicate
+      ``fn(exc) -> bool``) are retried up to ``max_attempts`` times with
+      exponential backoff (plus jitter); anything else fails the job.
+    - Each job records its queue wait, run time and attempt count.
+    """
+
+    def __init__(self, db_path, workers=2, max_attempts=3, backoff=2.0, retry_on=(), stale_after=600):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retry_on = retry_on if callable(retry_on) else tuple(retry_on)
+        self.stale_after = stale_after
+        self._handlers = {}
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._heap = []       # (run_at, job_id) scheduled in this process
+        self._threads = []
+        self._stopping = False
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, batch_id TEXT, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, run_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+                "queue_ms REAL, run_ms REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def register(self, kind, handler):
+        """Run jobs of ``kind`` with ``handler(payload) -> result`` (JSON-serialisable)."""
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Start the worker threads and re-schedule unfinished jobs from the table."""
+        if self._threads:
+            return
+        with self._conn() as conn:
+            conn.execute("UPDATE jobs SET status = ? WHERE status = ? AND started_at < ?",
+                         (QUEUED, RUNNING, time.time() - self.stale_after))
+            pending = conn.execute("SELECT id, run_at FROM jobs WHERE status = ?", (QUEUED,)).fetchall()
+        with self._cond:
+            for row in pending:
+                heapq.heappush(self._heap, (row["run_at"], row["id"]))
+            self._cond.notify_all()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping = False
+
+    # ---------------------------
+    # Submitting / reading jobs
+    # ---------------------------
+    def submit(self, kind, payload, batch_id=None):
+        """Queue one job; returns its id."""
+        return self.submit_many(kind, [payload], batch_id=batch_id)[0]
+
+    def submit_many(self, kind, payloads, batch_id=None):
+        """Queue several jobs in one transaction; returns their ids in order."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        now = time.time()
+        ids = [uuid.uuid4().hex for _ in payloads]
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO jobs (id, batch_id, kind, payload, status, created_at, run_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(job_id, batch_id, kind, json.dumps(payload), QUEUED, now, now) for job_id, payload in zip(ids, payloads)])
+        self._schedule(ids, now)
+        return ids
+
+    def get(self, job_id):
+        """Public view of a job (or None)."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_batch(self, batch_id):
+        rows = self._conn().execute("SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at, rowid",
+                                    (batch_id,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def wait(self, job_id, timeout=30.0, poll=0.25):
+        """Block until the job is done/failed or ``timeout`` passes; returns its latest view."""
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job and job["status"] not in FINAL_STATES and time.monotonic() < deadline:
+            with self._cond:
+                self._cond.wait(min(poll, max(0.0, deadline - time.monotonic())))
+            job = self.get(job_id)
+        return job
+
+    def stats(self):
+        conn = self._conn()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        timing = conn.execute(
+            "SELECT COUNT(*), AVG(queue_ms), AVG(run_ms), MAX(run_ms), AVG(attempts) FROM jobs WHERE status = ?",
+            (DONE,)).fetchone()
+        return {
+            "workers": self.workers,
+            "scheduled": len(self._heap),
+            "counts": {state: counts.get(state, 0) for state in (QUEUED, RUNNING, DONE, FAILED)},
+            "done_avg_queue_ms": round(timing[1] or 0.0, 1),
+            "done_avg_run_ms": round(timing[2] or 0.0, 1),
+            "done_max_run_ms": round(timing[3] or 0.0, 1),
+            "done_avg_attempts": round(timing[4] or 0.0, 2),
+        }
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    # ---------------------------
+    # Workers
+    # ---------------------------
+    def _schedule(self, ids, run_at):
+        with self._cond:
+            for job_id in ids:
+                heapq.heappush(self._heap, (run_at, job_id))
+            self._cond.notify_all()
+
+    def _next_job(self):
+        with self._cond:
+            while not self._stopping:
+                if self._heap:
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        return heapq.heappop(self._heap)[1]
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+        return None
+
+    def _work(self):
+        while True:
+            job_id = self._next_job()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"Job {job_id} crashed: {e}")
+
+    def _is_transient(self, exc):
+        if isinstance(self.retry_on, tuple):
+            return isinstance(exc, self.retry_on)
+        return bool(self.retry_on(exc))
+
+    def _run(self, job_id):
+        started = time.time()
+        with self._conn() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, "
+                "queue_ms = COALESCE(queue_ms, (? - created_at) * 1000) WHERE id = ? AND status = ?",
+                (RUNNING, started, started, job_id, QUEUED)).rowcount
+            if not claimed:
+                return  # already taken by another worker/process
+            row = conn.execute("SELECT kind, payload, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        handler = self._handlers.get(row["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{row['kind']}'")
+            result = handler(json.loads(row["payload"]))
+        except Exception as e:
+            finished = time.time()
+            if self._is_transient(e) and row["attempts"] < self.max_attempts:
+                delay = self.backoff * (2 ** (row["attempts"] - 1)) * random.uniform(0.8, 1.2)
+                with self._conn() as conn:
+                    conn.execute("UPDATE jobs SET status = ?, error = ?, run_at = ?, run_ms = ? WHERE id = ?",
+                                 (QUEUED, str(e), finished + delay, (finished - started) * 1000, job_id))
+                self._schedule([job_id], finished + delay)
+                return
+            print(f"Job {job_id} failed: {e}")
+            with self._conn() as conn:
+                conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, run_ms = ? WHERE id = ?",
+                             (FAILED, str(e), finished, (finished - started) * 1000, job_id))
+        else:
+            finished = time.time()
+            with self._conn() as conn:
+                conn.execute("UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, run_ms = ? WHERE id = ?",
+                             (DONE, json.dumps(result), finished, (finished - started) * 1000, job_id))
+        with self._cond:
+            self._cond.notify_all()
@@ -0,0 +1,50 @@
+import time, threading
+
+
+class Lazy:
+    """Thread-safe, create-on-first-use singleton.
+
+    ``factory()`` runs once, on the first ``instance()`` (or attribute access:
+    ``lazy.method()`` forwards to the created object, ``get`` included), under a
+    lock so concurrent first requests don't build it twice. If the factory raises,
+    nothing is cached and the next call tries again.
+    """
+
+    def __init__(self, factory, name):
+        self._factory = factory
+        self.name = name
+        self._value = None
+        self._created = False
+        self._lock = threading.Lock()
+        self.init_seconds = None
+
+    def instance(self):
+        if self._created:
+            return self._value
+        with self._lock:
+            if not self._created:
+                start = time.perf_counter()
+                self._value = self._factory()
+                self.init_seconds = time.perf_counter() - start
+                self._created = True
+        return self._value
+
+    def set_instance(self, value):
+        """Replace the instance (e.g. with a fake in benchmarks)."""
+        with self._lock:
+            self._value = value
+            self._created = True
+
+    @property
+    def ready(self):
+        return self._created
+
+    def __getattr__(self, name):
+        # only called for attributes Lazy itself doesn't have
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.instance(), name)
+
+    def status(self):
+        return {"ready": self._created,
+                "init_ms": round(self.init_seconds * 1000, 1) if self.init_seconds is not None else None}
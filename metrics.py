@@ -0,0 +1,191 @@
+import sys, json, time, threading
+from bisect import bisect_left
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _Local(threading.local):
+    trace = None  # {stage: seconds} while a request is being traced on this thread
+
+
+_local = _Local()
+_log_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in items)
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with optional labels."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                running += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', bound)])} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {running}")
+        return lines
+
+
+class Gauge:
+    """Values read at scrape time from ``fn() -> {labels tuple: value}``.
+
+    ``kind="counter"`` exposes totals kept elsewhere (e.g. cache hit counts).
+    """
+
+    def __init__(self, name, help, labelnames, fn, kind="gauge"):
+        self.name, self.help, self.labelnames, self.fn, self.kind = name, help, tuple(labelnames), fn, kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Metrics gauge {self.name} error: {e}")
+            return lines
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in sorted(values.items()))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, labelnames, fn, kind="gauge"):
+        return self.add(Gauge(name, help, labelnames, fn, kind))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+STAGE_SECONDS = registry.histogram("sehat_stage_duration_seconds", "Time spent in one stage of request handling.",
+                                   ["stage"])
+
+
+# ---------------------------
+# Spans
+# ---------------------------
+class span:
+    """Time a block as one stage: ``with span("model_call"): ...``.
+
+    Observed into ``sehat_stage_duration_seconds{stage=...}`` and, while a
+    request trace is active on this thread, added to that request's stage
+    totals (for the JSON log line).
+    """
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        trace = _local.trace
+        if trace is not None:
+            trace[self.stage] = trace.get(self.stage, 0.0) + elapsed
+        return False
+
+
+class Instrumented:
+    """Proxy that times every method call on ``target`` as stage ``<prefix>.<method>``."""
+
+    def __init__(self, target, prefix):
+        self._target = target
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        stage = f"{self._prefix}.{name}"
+
+        def call(*args, **kwargs):
+            with span(stage):
+                return attr(*args, **kwargs)
+        return call
+
+
+def start_trace():
+    _local.trace = {}
+
+
+def end_trace():
+    """Stop collecting for this thread; returns ``{stage: seconds}``."""
+    trace = _local.trace
+    _local.trace = None
+    return trace or {}
+
+
+def log_json(record):
+    """Write one structured log line to stdout."""
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _log_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,84 @@
+import os, time, sqlite3, hashlib, threading
+
+
+def prompt_version(*parts):
+    """Short, stable id for an OCR prompt (+ model name); changes invalidate old results."""
+    return hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def file_sha256(path, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """Persistent OCR results keyed by (image SHA-256, prompt version).
+
+    Stored in SQLite so they survive restarts. The table is kept under
+    ``max_entries`` rows by evicting the least recently used results.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_results ("
+                "sha256 TEXT NOT NULL, prompt_version TEXT NOT NULL, text TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (sha256, prompt_version))")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_last_used ON ocr_results (last_used)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sha256, version):
+        """Cached text for an image, or None."""
+        with self._conn() as conn:
+            row = conn.execute("SELECT text FROM ocr_results WHERE sha256 = ? AND prompt_version = ?",
+                               (sha256, version)).fetchone()
+            if row:
+                conn.execute("UPDATE ocr_results SET last_used = ? WHERE sha256 = ? AND prompt_version = ?",
+                             (time.time(), sha256, version))
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def put(self, sha256, version, text):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO ocr_results (sha256, prompt_version, text, created_at, last_used) "
+                         "VALUES (?, ?, ?, ?, ?)", (sha256, version, text, now, now))
+            conn.execute("DELETE FROM ocr_results WHERE rowid IN ("
+                         "SELECT rowid FROM ocr_results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                         (self.max_entries,))
+
+    def get_for_file(self, path, version):
+        """Cached text for a stored upload (hashing it if its name isn't the hash)."""
+        stem = os.path.basename(path).split(".", 1)[0]
+        sha256 = stem if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem) else file_sha256(path)
+        return self.get(sha256, version)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,46 @@
+# Token estimates and budget helpers for prompts sent to Gemini
+
+
+def estimate_tokens(text):
+    """Estimated tokens in ``text`` without an upstream call: about four characters per
+    token for ASCII, one per character otherwise (Telugu tokenises far less densely)."""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def entry_text(entry):
+    """Text of one chat history entry (a ``{"role", "parts"}`` dict or a Gemini Content)."""
+    parts = entry["parts"] if isinstance(entry, dict) else entry.parts
+    return "".join(part if isinstance(part, str) else getattr(part, "text", "") for part in parts)
+
+
+def history_tokens(history):
+    return sum(estimate_tokens(entry_text(entry)) for entry in history)
+
+
+def truncate(text, max_tokens, marker=" …"):
+    """``text`` cut to about ``max_tokens`` (with ``marker``), or unchanged if it fits."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:  # longest prefix that fits
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) + estimate_tokens(marker) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + marker
+
+
+def join_within(items, max_tokens, sep=", "):
+    """Join ``items`` (strings) while they fit in ``max_tokens``; the rest become "and N more"."""
+    kept, used = [], 0
+    for n, item in enumerate(items):
+        cost = estimate_tokens(item) + 1
+        if max_tokens and used + cost > max_tokens and kept:
+            return sep.join(kept) + f"{sep}and {len(items) - n} more"
+        kept.append(item)
+        used += cost
+    return sep.join(kept)
@@ -0,0 +1,434 @@
+import gc, re, json, time, uuid, heapq, sqlite3, datetime, threading
+from functools import lru_cache
+from collections import namedtuple
+
+from scheduler import parse_time, SlotError
+
+MEDICATION, APPOINTMENT = "medication", "appointment"
+KINDS = {"medications": MEDICATION, "appointments": APPOINTMENT}
+
+Schedule = namedtuple("Schedule", "times weekdays")  # minutes after midnight; weekdays (0 = Monday) or None = daily
+
+# Default clock times for schedules given in words
+PARTS_OF_DAY = {
+    "morning": 8 * 60, "breakfast": 8 * 60, "ఉదయం": 8 * 60,
+    "noon": 13 * 60, "afternoon": 13 * 60, "lunch": 13 * 60, "మధ్యాహ్నం": 13 * 60,
+    "evening": 18 * 60, "సాయంత్రం": 18 * 60,
+    "dinner": 20 * 60, "night": 21 * 60, "bedtime": 21 * 60, "రాత్రి": 21 * 60,
+}
+TIMES_PER_DAY = {1: (8 * 60,), 2: (8 * 60, 20 * 60), 3: (8 * 60, 14 * 60, 20 * 60),
+                 4: (8 * 60, 12 * 60, 16 * 60, 20 * 60)}
+FREQUENCIES = (  # (pattern, times a day), checked in order
+    (re.compile(r"\b(?:four times|4 times|qid|qds)\b"), 4),
+    (re.compile(r"\b(?:thrice|three times|3 times|tid|tds)\b"), 3),
+    (re.compile(r"\b(?:twice|two times|2 times|bid|bd)\b"), 2),
+    (re.compile(r"\b(?:once|daily|every day|everyday|od|qd)\b"), 1),
+)
+DOSE_PATTERN = re.compile(r"\b([0-2])-([0-2])-([0-2])\b")  # "1-0-1": morning-afternoon-night
+DOSE_PATTERN_TIMES = (8 * 60, 14 * 60, 21 * 60)
+MEALS = re.compile(r"\b(?:with|after|before) (?:meals|food)\b")
+EVERY_HOURS = re.compile(r"\b(?:every|q)\s*(\d{1,2})\s*(?:h|hr|hrs|hours?)\b")
+CLOCK_TIME = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b")
+WEEKDAYS = {name: n for n, names in enumerate((("monday", "mon"), ("tuesday", "tue", "tues"), ("wednesday", "wed"),
+                                               ("thursday", "thu", "thur", "thurs"), ("friday", "fri"),
+                                               ("saturday", "sat"), ("sunday", "sun"))) for name in names}
+WEEKDAY = re.compile(r"\b(" + "|".join(sorted(WEEKDAYS, key=len, reverse=True)) + r")\b")
+AS_NEEDED = re.compile(r"\b(?:as needed|when needed|if needed|prn|sos)\b")
+
+
+@lru_cache(maxsize=4096)
+def parse_schedule(text):
+    """Schedule for a medication's free-text ``schedule``, or None if it has no fixed times.
+
+    Understands clock times ("8 AM", "08:00 and 20:30"), parts of the day
+    ("morning and night", Telugu too), frequencies ("twice daily", "TID",
+    "every 8 hours", "1-0-1", "after meals") and weekdays ("Mon, Thu"); "as needed"
+    has no reminders. Explicit times win over the defaults for words.
+    """
+    text = (text or "").lower()
+    if not text.strip() or AS_NEEDED.search(text):
+        return None
+    times = set()
+    for m in CLOCK_TIME.finditer(text):
+        hour, minute, meridiem = (m.group(1), m.group(2), m.group(3)) if m.group(1) else (m.group(4), m.group(5), "")
+        try:
+            times.add(parse_time(f"{hour}:{minute or '00'} {meridiem}".strip()))
+        except SlotError:
+            pass
+    if not times:
+        times.update(minutes for word, minutes in PARTS_OF_DAY.items() if re.search(rf"(?<!\w){word}(?!\w)", text))
+    if not times:
+        m, doses = EVERY_HOURS.search(text), DOSE_PATTERN.search(text)
+        count = next((n for pattern, n in FREQUENCIES if pattern.search(text)), None)
+        if m and 1 <= int(m.group(1)) <= 24:
+            times.update(minutes % (24 * 60) for minutes in range(8 * 60, 32 * 60, int(m.group(1)) * 60))
+        elif doses:
+            times.update(minutes for minutes, n in zip(DOSE_PATTERN_TIMES, doses.groups()) if n != "0")
+        elif count:
+            times.update(TIMES_PER_DAY[count])
+        elif MEALS.search(text):
+            times.update((8 * 60, 13 * 60, 20 * 60))
+    weekdays = frozenset(WEEKDAYS[name] for name in WEEKDAY.findall(text)) or None
+    if not times and weekdays:
+        times.add(8 * 60)
+    return Schedule(tuple(sorted(times)), weekdays) if times else None
+
+
+def next_occurrence(schedule, after):
+    """First datetime strictly after ``after`` on ``schedule``."""
+    day, minute = after.date(), after.hour * 60 + after.minute
+    for offset in range(8):
+        candidate = day + datetime.timedelta(days=offset)
+        if schedule.weekdays is not None and candidate.weekday() not in schedule.weekdays:
+            continue
+        for minutes in schedule.times:
+            if offset == 0 and minutes <= minute:
+                continue
+            return datetime.datetime.combine(candidate, datetime.time(minutes // 60, minutes % 60))
+    return None
+
+
+def appointment_start(appointment):
+    """The appointment's date + time as a datetime (None without a usable date and time)."""
+    try:
+        day = datetime.date.fromisoformat(appointment.get("date") or "")
+        minutes = parse_time(appointment.get("time"))
+    except (TypeError, ValueError):
+        return None
+    return datetime.datetime.combine(day, datetime.time(minutes // 60, minutes % 60))
+
+
+class ReminderEngine:
+    """Next-fire instants for every user's medications and appointments, in one heap.
+
+    Each (user, kind, item id) has at most one live entry: its next reminder.
+    Scheduling, rescheduling and cancelling are O(log n) (a replaced entry
+    stays in the heap and is skipped when it surfaces; the heap is rebuilt
+    once stale entries outnumber live ones). A medication is re-armed for its
+    next time as it fires; an appointment fires once, ``appointment_lead``
+    minutes before it starts.
+
+    ``start`` runs a thread that sleeps until the earliest entry is due and
+    hands due reminders to ``dispatch(reminder)``; ``tick()`` (if given) is
+    called at least every ``poll`` seconds from the same thread.
+    """
+
+    def __init__(self, dispatch, appointment_lead=60, poll=5.0, tick=None):
+        self.dispatch = dispatch
+        self.appointment_lead = datetime.timedelta(minutes=appointment_lead)
+        self.poll = poll
+        self.tick = tick
+        self._heap = []       # (fire_at epoch, seq, key)
+        self._live = {}       # key -> (fire_at, seq, signature, item)
+        self._by_user = {}    # user id -> set of keys
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.fired = 0
+
+    # ---------------------------
+    # Scheduling
+    # ---------------------------
+    def next_fire(self, kind, item, after):
+        """Datetime of the item's next reminder after ``after`` (None if it has none)."""
+        if kind == MEDICATION:
+            text = item.get("schedule")
+            schedule = parse_schedule(text) if isinstance(text, str) else None
+            return next_occurrence(schedule, after) if schedule else None
+        start = appointment_start(item)
+        if start is None:
+            return None
+        fire_at = start - self.appointment_lead
+        return fire_at if fire_at > after else None
+
+    @staticmethod
+    def _signature(kind, item):
+        """The fields that decide when an item fires (renaming a medicine keeps its entry)."""
+        if kind == MEDICATION:
+            return item.get("schedule")
+        return item.get("date"), item.get("time")
+
+    def _set(self, key, kind, item, now):
+        """Schedule one item (lock held); an unchanged item keeps its pending entry.
+        Returns True if it got a new entry (which may now be the earliest)."""
+        signature = self._signature(kind, item)
+        current = self._live.get(key)
+        if current is not None and current[2] == signature:
+            self._live[key] = current[:3] + (item,)
+            return False
+        fire_at = self.next_fire(kind, item, now)
+        if fire_at is None:
+            self._drop(key)
+            return False
+        self._seq += 1
+        entry = (fire_at.timestamp(), self._seq, key)
+        self._live[key] = (entry[0], self._seq, signature, item)
+        self._by_user.setdefault(key[0], set()).add(key)
+        heapq.heappush(self._heap, entry)
+        return True
+
+    def _drop(self, key):
+        if self._live.pop(key, None) is not None:
+            keys = self._by_user.get(key[0])
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def upsert(self, user_id, kind, item, now=None):
+        """(Re)schedule one medication/appointment after it was added or edited."""
+        with self._cond:
+            if self._set((user_id, kind, str(item.get("id"))), kind, item, now or datetime.datetime.now()):
+                self._cond.notify_all()
+
+    def cancel(self, user_id, kind, item_id):
+        with self._cond:
+            self._drop((user_id, kind, str(item_id)))
+            self._maybe_rebuild()
+
+    def set_user(self, user_id, data, now=None):
+        """Bring one user in line with their data: only added, edited or removed items change."""
+        now = now or datetime.datetime.now()
+        with self._cond:
+            wanted = set()
+            earlier = False
+            for collection, kind in KINDS.items():
+                for item in data.get(collection) or []:
+                    key = (user_id, kind, str(item.get("id")))
+                    wanted.add(key)
+                    earlier |= self._set(key, kind, item, now)
+            for key in self._by_user.get(user_id, set()) - wanted:
+                self._drop(key)
+            self._maybe_rebuild()
+            if earlier:
+                self._cond.notify_all()
+
+    def apply_changes(self, user_id, changes, now=None):
+        """Apply a storage delta (UserStore.get_changes) for ``user_id``."""
+        if changes.get("full"):
+            return self.set_user(user_id, changes["data"], now)
+        for collection, kind in KINDS.items():
+            for item in changes.get("upserts", {}).get(collection, []):
+                self.upsert(user_id, kind, item, now)
+            for item_id in changes.get("deletes", {}).get(collection, []):
+                self.cancel(user_id, kind, item_id)
+
+    def load(self, items, now=None):
+        """Bulk-schedule ``(user_id, kind, item)`` triples at startup.
+
+        Fire times are computed outside the lock (requests keep scheduling
+        meanwhile; those entries are newer and kept), then added with one
+        heapify instead of n pushes. The cyclic GC is paused meanwhile: the
+        hundreds of thousands of new tuples would otherwise trigger repeated
+        full collections (2/3 of the time at 100k users).
+        """
+        now = now or datetime.datetime.now()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._load(items, now)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _load(self, items, now):
+        computed, by_schedule = [], {}  # most users share a handful of schedule phrasings
+        for user_id, kind, item in items:
+            schedule = item.get("schedule") if kind == MEDICATION else None
+            if isinstance(schedule, str):
+                if schedule not in by_schedule:
+                    by_schedule[schedule] = self.next_fire(kind, item, now)
+                fire_at = by_schedule[schedule]
+            else:
+                fire_at = self.next_fire(kind, item, now)
+            if fire_at is not None:
+                computed.append(((user_id, kind, str(item.get("id"))), fire_at.timestamp(), item))
+        with self._cond:
+            for key, fire_at, item in computed:
+                if key in self._live:
+                    continue
+                self._seq += 1
+                self._live[key] = (fire_at, self._seq, self._signature(key[1], item), item)
+                self._by_user.setdefault(key[0], set()).add(key)
+                self._heap.append((fire_at, self._seq, key))
+            heapq.heapify(self._heap)
+            self._maybe_rebuild()
+            self._cond.notify_all()
+
+    def _maybe_rebuild(self):
+        if len(self._heap) > 1024 and len(self._heap) > 2 * len(self._live):
+            self._heap = [(fire_at, seq, key) for key, (fire_at, seq, _, _) in self._live.items()]
+            heapq.heapify(self._heap)
+
+    # ---------------------------
+    # Firing
+    # ---------------------------
+    def pop_due(self, now=None):
+        """Remove and return the reminders due at ``now`` (epoch seconds), re-arming medications."""
+        now = now if now is not None else time.time()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, seq, key = heapq.heappop(self._heap)
+                live = self._live.get(key)
+                if live is None or live[1] != seq:
+                    continue  # replaced or cancelled
+                item = live[3]
+                due.append(self._reminder(key, item, fire_at))
+                self._drop(key)
+                if key[1] == MEDICATION:  # re-arm after now: a stalled thread fires a missed dose once
+                    self._set(key, MEDICATION, item, datetime.datetime.fromtimestamp(max(fire_at, now)))
+        return due
+
+    def _reminder(self, key, item, fire_at):
+        user_id, kind, item_id = key
+        due = datetime.datetime.fromtimestamp(fire_at)
+        if kind == MEDICATION:
+            title = f"Time to take {item.get('name', 'your medicine')}"
+            detail = f"{item.get('dosage', '')} ({item.get('schedule', '')})".strip()
+        else:
+            title = f"Appointment with {item.get('doctor_name') or 'your doctor'} at {item.get('time')}"
+            detail = f"{item.get('date')}" + (f", {item['hospital']}" if item.get("hospital") else "")
+        return {"id": f"{kind}:{item_id}:{due.isoformat(timespec='minutes')}", "user_id": user_id, "kind": kind,
+                "item_id": item_id, "due": due.isoformat(timespec="minutes"), "title": title, "detail": detail}
+
+    def next_due(self):
+        with self._cond:
+            while self._heap:
+                fire_at, seq, key = self._heap[0]
+                live = self._live.get(key)
+                if live is not None and live[1] == seq:
+                    return fire_at
+                heapq.heappop(self._heap)
+            return None
+
+    def upcoming(self, user_id, limit=20):
+        """The user's pending reminders, soonest first."""
+        with self._cond:
+            pending = sorted((self._live[key][0], key, self._live[key][3]) for key in self._by_user.get(user_id, ()))
+        return [self._reminder(key, item, fire_at) for fire_at, key, item in pending[:limit]]
+
+    def start(self, load=None):
+        """Start the firing thread; ``load()`` (e.g. the startup scan) runs in it first."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(load,), name="reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self._stopping = False
+
+    def _run(self, load):
+        if load is not None:
+            try:
+                load()
+            except Exception as e:
+                print(f"Reminder load failed: {e}")
+        next_tick = 0.0
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                upcoming = self.next_due()
+                wait = self.poll if upcoming is None else min(self.poll, upcoming - time.time())
+                if wait > 0:
+                    self._cond.wait(wait)
+                if self._stopping:
+                    return
+            if self.tick is not None and time.monotonic() >= next_tick:
+                next_tick = time.monotonic() + self.poll
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Reminder refresh failed: {e}")
+            for reminder in self.pop_due():
+                self.fired += 1
+                try:
+                    self.dispatch(reminder)
+                except Exception as e:
+                    print(f"Reminder dispatch failed: {e}")
+
+    def stats(self):
+        with self._cond:
+            upcoming = self.next_due()
+            return {
+                "scheduled": len(self._live),
+                "users": len(self._by_user),
+                "heap_entries": len(self._heap),
+                "next_due": datetime.datetime.fromtimestamp(upcoming).isoformat(timespec="seconds") if upcoming else None,
+                "fired": self.fired,
+                "running": self._thread is not None,
+            }
+
+
+class ReminderOutbox:
+    """SQLite tables that let several worker processes share one reminder stream.
+
+    - ``outbox``: every fired reminder, once. Each process runs its own
+      engine, so ``claim`` (INSERT OR IGNORE on the reminder id) decides which
+      one delivers it; SSE streams in any process read the user's rows.
+    - ``updates``: "user X's reminders changed" notes written next to each
+      medication/appointment write, so the other processes' engines catch up
+      (``changed_users``) without rescanning everyone.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.origin = uuid.uuid4().hex  # this process
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "reminder_id TEXT UNIQUE NOT NULL, user_id TEXT NOT NULL, payload TEXT NOT NULL, "
+                         "created_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_user ON outbox (user_id, seq)")
+            conn.execute("CREATE TABLE IF NOT EXISTS updates (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "user_id TEXT NOT NULL, origin TEXT NOT NULL, created_at REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, reminder):
+        """Record a fired reminder; False if another process already did."""
+        with self._conn() as conn:
+            return conn.execute("INSERT OR IGNORE INTO outbox (reminder_id, user_id, payload, created_at) "
+                                "VALUES (?, ?, ?, ?)", (reminder["id"], reminder["user_id"],
+                                                        json.dumps(reminder, ensure_ascii=False), time.time())).rowcount == 1
+
+    def read(self, user_id, after, limit=50):
+        """``[(seq, reminder)]`` fired for ``user_id`` after ``after``."""
+        rows = self._conn().execute("SELECT seq, payload FROM outbox WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                                    (user_id, after, limit)).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def last_seq(self, table="outbox"):
+        return self._conn().execute(f"SELECT COALESCE(MAX(seq), 0) FROM {table}").fetchone()[0]
+
+    def mark_changed(self, user_id):
+        with self._conn() as conn:
+            conn.execute("INSERT INTO updates (user_id, origin, created_at) VALUES (?, ?, ?)",
+                         (user_id, self.origin, time.time()))
+
+    def changed_users(self, after, include_own=False):
+        """``(last_seq, users)`` changed after ``after`` (by other processes unless ``include_own``)."""
+        rows = self._conn().execute("SELECT seq, user_id, origin FROM updates WHERE seq > ? ORDER BY seq",
+                                    (after,)).fetchall()
+        users = {user_id for _, user_id, origin in rows if include_own or origin != self.origin}
+        return (rows[-1][0] if rows else after), users
+
+    def prune(self, older_than):
+        """Forget fired reminders and change notes older than ``older_than`` seconds."""
+        cutoff = time.time() - older_than
+        with self._conn() as conn:
+            conn.execute("DELETE FROM outbox WHERE created_at < ?", (cutoff,))
+            conn.execute("DELETE FROM updates WHERE created_at < ?", (cutoff,))
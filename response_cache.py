@@ -0,0 +1,117 @@
+import re, time, sqlite3, threading
+from collections import OrderedDict
+
+# Filler that doesn't change what is being asked ("what is paracetamol?" == "paracetamol").
+# Relational words (with, or, for, to, without, not, ...) stay: "paracetamol with alcohol"
+# and "paracetamol or alcohol" are different questions.
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "what", "whats", "about", "tell", "me", "i", "please", "can",
+    "could", "you", "give", "some", "info", "information", "know", "want",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Part of every key; bump when normalize_question changes so old disk-tier entries stop matching
+KEY_VERSION = "2"
+
+
+def normalize_question(text):
+    """Lowercase, drop punctuation and filler words; word order is kept."""
+    return " ".join(t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS)
+
+
+def make_key(intent, entities, lang, text):
+    """Semantic cache key: intent + matched entities + language + normalized question."""
+    return "|".join([KEY_VERSION, intent, ",".join(sorted(set(entities))), lang, normalize_question(text)])
+
+
+class ResponseCache:
+    """TTL + size-bounded LRU cache for model replies, with an optional SQLite tier.
+
+    The memory tier holds at most ``max_entries`` replies. When ``db_path`` is
+    set, replies are also written to disk so they survive restarts; a memory
+    miss falls through to the disk tier before counting as a miss.
+    """
+
+    def __init__(self, max_entries=1000, ttl=24 * 3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._items = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        self._local = threading.local()
+        if db_path:
+            with self._conn() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, expires_at, value):
+        self._items[key] = (expires_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                del self._items[key]
+        if self._db_path:
+            try:
+                row = self._conn().execute(
+                    "SELECT expires_at, value FROM responses WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            except sqlite3.Error as e:
+                print(f"Response cache read error: {e}")
+                row = None
+            if row:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                return row[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self._db_path:
+            try:
+                with self._conn() as conn:
+                    conn.execute("INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                                 (key, expires_at, value))
+                    conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            except sqlite3.Error as e:
+                print(f"Response cache write error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        if self._db_path:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
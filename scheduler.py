@@ -0,0 +1,244 @@
+import re, heapq, sqlite3, datetime, threading
+from bisect import bisect_left, bisect_right
+
+_TIME_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])?\s*$")
+
+
+class SlotError(ValueError):
+    """Invalid booking request; ``status`` is the HTTP code to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class SlotConflict(SlotError):
+    """The slot is already taken."""
+
+    def __init__(self, message="Slot already booked"):
+        super().__init__(message, status=409)
+
+
+def parse_time(text):
+    """Minutes since midnight for "09:00 AM", "9:00 pm" or "14:30"."""
+    m = _TIME_RE.match(text or "")
+    if not m:
+        raise SlotError(f"Invalid time: {text!r}")
+    hour, minute, meridiem = int(m.group(1)), int(m.group(2)), (m.group(3) or "").upper()
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise SlotError(f"Invalid time: {text!r}")
+        hour = hour % 12 + (12 if meridiem == "PM" else 0)
+    if hour > 23 or minute > 59:
+        raise SlotError(f"Invalid time: {text!r}")
+    return hour * 60 + minute
+
+
+def format_time(minutes):
+    """The display format used by DOCTOR_SCHEDULES ("09:00 AM")."""
+    hour, minute = divmod(minutes, 60)
+    return f"{(hour % 12) or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def parse_date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except (TypeError, ValueError):
+        raise SlotError(f"Invalid date: {text!r} (expected YYYY-MM-DD)")
+
+
+class SlotScheduler:
+    """Slot-level booking ledger for doctors' daily schedules.
+
+    Each doctor offers the same slot start times every day (their ``times``),
+    each lasting ``slot_minutes``. Bookings live in a SQLite table shared by
+    every worker process, one row per appointment with UNIQUE (doctor, date,
+    start). ``book`` checks for an overlapping booking and inserts its row in
+    one write transaction, and runs ``commit`` (persisting the appointment)
+    before that transaction commits, so two processes can't both take a slot
+    and a failed save leaves nothing booked.
+    """
+
+    def __init__(self, directory, db_path, slot_minutes=30, horizon_days=14):
+        self.directory = directory
+        self.db_path = db_path
+        self.slot_minutes = slot_minutes
+        self.horizon_days = horizon_days
+        self._slots = {}      # doctor id -> sorted slot start minutes
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS bookings (appointment_id TEXT PRIMARY KEY, doctor_id TEXT NOT NULL, "
+                         "date TEXT NOT NULL, start INTEGER NOT NULL, UNIQUE (doctor_id, date, start))")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(doctor_id):
+        return str(doctor_id)
+
+    def doctor(self, doctor_id):
+        doc = self.directory.get(doctor_id)
+        if doc is None and str(doctor_id).isdigit():
+            doc = self.directory.get(int(doctor_id))
+        return doc
+
+    def slots_for(self, doctor_id):
+        """Parsed daily slot starts for a doctor (parsed once, then cached)."""
+        key = self._key(doctor_id)
+        slots = self._slots.get(key)
+        if slots is None:
+            doc = self.doctor(doctor_id)
+            slots = sorted({parse_time(t) for t in (doc or {}).get("times", [])})
+            self._slots[key] = slots
+        return slots
+
+    # ---------------------------
+    # Bookings
+    # ---------------------------
+    def resolve(self, appointment, now=None):
+        """(doctor id, date, start minutes) for an appointment request.
+
+        Without a ``date`` the next occurrence of the slot is used. Raises
+        SlotError for unknown doctors, times outside the schedule or past slots;
+        a past slot the appointment already holds is fine (editing its notes).
+        """
+        doctor_id = appointment.get("doctor_id")
+        if self.doctor(doctor_id) is None:
+            raise SlotError("Unknown doctor", status=404)
+        start = parse_time(appointment.get("time"))
+        if start not in self.slots_for(doctor_id):
+            raise SlotError("Doctor is not available at that time")
+        now = now or datetime.datetime.now()
+        if appointment.get("date"):
+            day = parse_date(appointment["date"])
+        else:
+            day = now.date() if start > now.hour * 60 + now.minute else now.date() + datetime.timedelta(days=1)
+        key = self._key(doctor_id)
+        if datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(minutes=start) < now:
+            held = appointment.get("id") and self.booking(appointment["id"])
+            if not held or tuple(held) != (key, day.isoformat(), start):
+                raise SlotError("That slot is in the past")
+        return key, day.isoformat(), start
+
+    def book(self, appointment_id, doctor_id, day, start, commit=None):
+        """Reserve a slot for ``appointment_id``; raises SlotConflict if it is taken.
+
+        ``commit`` (e.g. persisting the appointment) runs inside the booking
+        transaction; if it raises, the reservation is rolled back. Re-booking
+        an existing appointment moves it.
+        """
+        key = self._key(doctor_id)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # the write lock: other processes' bookings wait here
+        try:
+            clash = conn.execute(
+                "SELECT 1 FROM bookings WHERE doctor_id = ? AND date = ? AND start > ? AND start < ? "
+                "AND appointment_id != ? LIMIT 1",
+                (key, day, start - self.slot_minutes, start + self.slot_minutes, appointment_id)).fetchone()
+            if clash:
+                raise SlotConflict()
+            conn.execute("DELETE FROM bookings WHERE appointment_id = ?", (appointment_id,))
+            try:
+                conn.execute("INSERT INTO bookings (appointment_id, doctor_id, date, start) VALUES (?, ?, ?, ?)",
+                             (appointment_id, key, day, start))
+            except sqlite3.IntegrityError:
+                raise SlotConflict()
+            if commit is not None:
+                commit()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, appointment_id):
+        """Free the slot held by an appointment (no-op if it holds none)."""
+        self._conn().execute("DELETE FROM bookings WHERE appointment_id = ?", (appointment_id,))
+
+    def load(self, appointments):
+        """Add existing appointments (those naming a doctor, date and time) missing from the
+        ledger, e.g. saved before it existed; returns how many were added."""
+        rows = []
+        for appt in appointments:
+            if not appt.get("id") or not appt.get("doctor_id") or not appt.get("time") or not appt.get("date"):
+                continue
+            try:
+                rows.append((appt["id"], self._key(appt["doctor_id"]), parse_date(appt["date"]).isoformat(),
+                             parse_time(appt["time"])))
+            except SlotError:
+                continue
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO bookings (appointment_id, doctor_id, date, start) "
+                             "VALUES (?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def booking(self, appointment_id):
+        """(doctor id, date, start) held by an appointment, or None."""
+        return self._conn().execute("SELECT doctor_id, date, start FROM bookings WHERE appointment_id = ?",
+                                    (appointment_id,)).fetchone()
+
+    def _booked(self, key, first_day, last_day):
+        """``{date: sorted [(start, end)]}`` for one doctor between two ISO dates."""
+        booked = {}
+        for day, start in self._conn().execute(
+                "SELECT date, start FROM bookings WHERE doctor_id = ? AND date BETWEEN ? AND ? ORDER BY date, start",
+                (key, first_day, last_day)):
+            booked.setdefault(day, []).append((start, start + self.slot_minutes))
+        return booked
+
+    # ---------------------------
+    # Availability
+    # ---------------------------
+    def free_slots(self, doctor_id, day, after=0, intervals=None):
+        """Free slot starts for one doctor on one date (ISO string), at or after ``after`` minutes.
+        ``intervals`` are that day's bookings, if already read."""
+        slots = self.slots_for(doctor_id)
+        if intervals is None:
+            intervals = self._booked(self._key(doctor_id), day, day).get(day, [])
+        free = []
+        for start in slots[bisect_left(slots, after):]:
+            i = bisect_right(intervals, (start, float("inf")))
+            if i > 0 and intervals[i - 1][1] > start:
+                continue
+            if i < len(intervals) and intervals[i][0] < start + self.slot_minutes:
+                continue
+            free.append(start)
+        return free
+
+    def _doctor_slots(self, doctor_id, now):
+        """(date, start, doctor key) for a doctor's free slots, in time order (lazily, day by day)."""
+        key = self._key(doctor_id)
+        last_day = now.date() + datetime.timedelta(days=self.horizon_days - 1)
+        booked = self._booked(key, now.date().isoformat(), last_day.isoformat())
+        for offset in range(self.horizon_days):
+            day = now.date() + datetime.timedelta(days=offset)
+            after = now.hour * 60 + now.minute + 1 if offset == 0 else 0
+            for start in self.free_slots(doctor_id, day.isoformat(), after, booked.get(day.isoformat(), [])):
+                yield (day.isoformat(), start, key)
+
+    def next_free_slots(self, doctors, n=10, now=None):
+        """The ``n`` earliest free slots across ``doctors`` within the horizon."""
+        now = now or datetime.datetime.now()
+        by_id = {self._key(doc["id"]): doc for doc in doctors}
+        result = []
+        for day, start, key in heapq.merge(*(self._doctor_slots(doc["id"], now) for doc in doctors)):
+            doc = by_id[key]
+            result.append({
+                "doctor_id": doc["id"],
+                "doctor_name": doc.get("name"),
+                "specialty": doc.get("specialty"),
+                "location": doc.get("location"),
+                "date": day,
+                "time": format_time(start),
+            })
+            if len(result) >= n:
+                break
+        return result
@@ -0,0 +1,700 @@
+import os, json, threading, tempfile, sqlite3, uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover threads of this process
+    fcntl = None
+
+
+def default_user_data():
+    # standardized keys used across the app
+    return {"profile": {}, "appointments": [], "emergency_contacts": [], "medications": []}
+
+
+def _copy_doc(data):
+    """Copy a user data document two levels deep (collections of flat dicts).
+
+    Routes mutate what load() returns before saving it, so the cached
+    document must never be handed out directly. This is much cheaper than
+    copy.deepcopy for the shape the app stores.
+    """
+    out = {}
+    for key, value in data.items():
+        if isinstance(value, list):
+            out[key] = [dict(item) if isinstance(item, dict) else item for item in value]
+        elif isinstance(value, dict):
+            out[key] = dict(value)
+        else:
+            out[key] = value
+    return out
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Write JSON to a temp file in the same directory, then os.replace it in."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class FileLock:
+    """Re-entrant lock shared by threads *and* processes (``fcntl.flock`` on ``path``).
+
+    A thread lock is taken first, since flock doesn't exclude threads that
+    share the same file descriptor; the flock is held while the outermost
+    ``with`` block runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+class VersionConflict(Exception):
+    """A compare-and-swap write named a version the document no longer has."""
+
+    status = 409
+
+    def __init__(self, current):
+        super().__init__(f"Data was changed by another request (now at version {current}).")
+        self.current = current
+
+
+class UserDataFile:
+    """Process-level cache in front of ``user_data.json``.
+
+    A cached document is reused while the file's (inode, mtime_ns, size) signature
+    is unchanged and nobody bumped ``generation`` via ``invalidate()``, so a
+    hot read is one ``os.stat`` plus a cheap copy. ``save()`` writes
+    atomically and refreshes the cache with what it wrote.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._cached = None
+        self._signature = None
+        self._cached_generation = -1
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        """Return a private copy of the user data (defaults if missing/corrupt)."""
+        signature = self._stat()
+        with self._lock:
+            if (self._cached is not None and signature == self._signature
+                    and self._cached_generation == self.generation):
+                return _copy_doc(self._cached)
+            generation = self.generation
+
+        data = default_user_data()
+        if signature is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                pass
+
+        with self._lock:
+            self._cached, self._signature, self._cached_generation = data, signature, generation
+            return _copy_doc(data)
+
+    def version(self):
+        """The document's ``version`` without copying it (hot path: one ``os.stat``)."""
+        signature = self._stat()
+        with self._lock:
+            if (self._cached is not None and signature == self._signature
+                    and self._cached_generation == self.generation):
+                return self._cached.get("version", 0)
+        return self.load().get("version", 0)
+
+    def save(self, data):
+        """Atomically persist ``data`` and make it the cached document."""
+        with self._lock:
+            atomic_write_json(self.path, data, ensure_ascii=False, indent=4)
+            self.generation += 1
+            self._cached = _copy_doc(data)
+            self._signature = self._stat()
+            self._cached_generation = self.generation
+
+    def invalidate(self):
+        """Force the next load() to re-read the file."""
+        with self._lock:
+            self.generation += 1
+
+
+# ---------------------------
+# Pluggable per-user stores
+# ---------------------------
+# Collections the routes also address by list position (<int:index>)
+INDEXED_COLLECTIONS = ("medications", "emergency_contacts")
+# Collections only addressed by id
+KEYED_COLLECTIONS = ("appointments",)
+COLLECTIONS = INDEXED_COLLECTIONS + KEYED_COLLECTIONS
+OPS = ("add", "update", "delete", "set_profile")
+
+
+def new_record_id():
+    return uuid.uuid4().hex
+
+
+class OperationError(ValueError):
+    """A write operation that can't be applied (bad op, unknown record, duplicate id)."""
+
+    def __init__(self, message, status=400, index=None):
+        super().__init__(message)
+        self.status = status
+        self.index = index  # position in the batch, if any
+
+
+def check_op(op, index=None):
+    """Validate one write operation (see UserStore.apply); raises OperationError."""
+    if not isinstance(op, dict) or op.get("op") not in OPS:
+        raise OperationError(f"'op' must be one of {', '.join(OPS)}", index=index)
+    if op["op"] == "set_profile":
+        if not isinstance(op.get("profile"), dict):
+            raise OperationError("set_profile needs a 'profile' object", index=index)
+        return op
+    if op.get("collection") not in COLLECTIONS:
+        raise OperationError(f"'collection' must be one of {', '.join(COLLECTIONS)}", index=index)
+    if op["op"] in ("add", "update") and not isinstance(op.get("item"), dict):
+        raise OperationError(f"{op['op']} needs an 'item' object", index=index)
+    if op["op"] != "add":
+        if "index" in op:
+            if op["collection"] not in INDEXED_COLLECTIONS or not isinstance(op["index"], int):
+                raise OperationError(f"{op['collection']} records can't be addressed by index", index=index)
+        elif not isinstance(op.get("id"), str) or not op["id"]:
+            raise OperationError(f"{op['op']} needs the record 'id'", index=index)
+    return op
+
+
+def build_delta(data, changed, version):
+    """Delta response body: ``changed`` maps (collection, id) -> deleted for records written since."""
+    delta = {"version": version, "full": False, "upserts": {}, "deletes": {}}
+    for (collection, item_id), deleted in changed.items():
+        if collection == "profile":
+            delta["profile"] = data.get("profile") or {}
+        elif deleted:
+            delta["deletes"].setdefault(collection, []).append(item_id)
+    for collection in COLLECTIONS:
+        for item in data.get(collection) or []:
+            if changed.get((collection, str(item.get("id")))) is False:
+                delta["upserts"].setdefault(collection, []).append(item)
+    return delta
+
+
+class UserStore:
+    """Interface shared by the storage backends, keyed by user/session id.
+
+    Every record has a stable string ``id`` (assigned on add if missing).
+    Every document carries a ``version`` that each write bumps (it is part of
+    what ``get_user_data`` returns), and the store remembers at which version
+    each record was last written or deleted, for ``get_changes``.
+
+    Writes take an optional ``expected_version``: if the document has moved
+    on, nothing is written and VersionConflict is raised. Writes return the
+    new version; the single-record update/delete helpers return False when
+    the record wasn't found.
+    """
+
+    def get_user_data(self, user_id):
+        raise NotImplementedError
+
+    def replace_user_data(self, user_id, data, expected_version=None):
+        raise NotImplementedError
+
+    def apply(self, user_id, ops, expected_version=None):
+        """Apply a list of operations atomically: all of them or (on OperationError) none.
+
+        Each op is ``{"op": "add", "collection": c, "item": {...}}``,
+        ``{"op": "update"|"delete", "collection": c, "id": id[, "item": {...}]}``
+        (``"index": n`` instead of ``id`` for INDEXED_COLLECTIONS) or
+        ``{"op": "set_profile", "profile": {...}}``.
+        """
+        raise NotImplementedError
+
+    def get_changes(self, user_id, since=None):
+        """Records written/deleted after version ``since`` (see build_delta).
+
+        Without ``since``, or if it is newer than the document, returns
+        ``{"version", "full": True, "data": <whole document>}``.
+        """
+        raise NotImplementedError
+
+    def iter_items(self, collection):
+        """Yield ``(user_id, item)`` for every user's records (used to build indexes)."""
+        raise NotImplementedError
+
+    def get_version(self, user_id):
+        """Current version of the user's document (cheap; for validating caches)."""
+        return self.get_user_data(user_id)["version"]
+
+    def claim(self, user_id):
+        """True exactly once, for the first caller, if ``user_id`` has data: lets one new
+        session take over a document imported for it. Stores shared by every session
+        (JSON) have nothing to hand over."""
+        return False
+
+    def save_profile(self, user_id, profile, expected_version=None):
+        return self.apply(user_id, [{"op": "set_profile", "profile": profile}], expected_version)
+
+    def add_item(self, user_id, collection, item, expected_version=None):
+        return self.apply(user_id, [{"op": "add", "collection": collection, "item": item}], expected_version)
+
+    def _apply_one(self, user_id, op, expected_version):
+        try:
+            return self.apply(user_id, [op], expected_version)
+        except OperationError as e:
+            if e.status == 404:
+                return False
+            raise
+
+    def update_item_at(self, user_id, collection, index, item, expected_version=None):
+        if collection not in INDEXED_COLLECTIONS:
+            raise ValueError(f"Unknown collection: {collection}")
+        if index < 0:
+            return False
+        op = {"op": "update", "collection": collection, "index": index, "item": item}
+        return self._apply_one(user_id, op, expected_version)
+
+    def delete_item_at(self, user_id, collection, index, expected_version=None):
+        if collection not in INDEXED_COLLECTIONS:
+            raise ValueError(f"Unknown collection: {collection}")
+        if index < 0:
+            return False
+        return self._apply_one(user_id, {"op": "delete", "collection": collection, "index": index}, expected_version)
+
+    def update_item_by_id(self, user_id, collection, item_id, item, expected_version=None):
+        op = {"op": "update", "collection": collection, "id": item_id, "item": item}
+        return self._apply_one(user_id, op, expected_version)
+
+    def delete_item_by_id(self, user_id, collection, item_id, expected_version=None):
+        return self._apply_one(user_id, {"op": "delete", "collection": collection, "id": item_id}, expected_version)
+
+
+class JsonUserStore(UserStore):
+    """The original single-document ``user_data.json`` backend.
+
+    There is only one document, so ``user_id`` is ignored. Every write is a
+    read-modify-write under ``user_data.json.lock``, so concurrent requests
+    in any number of worker processes never drop each other's updates.
+    Per-record write versions live in the document under ``_changes``
+    (``"collection/id": [version, deleted]``); records written before ids
+    existed get one on startup.
+    """
+
+    def __init__(self, path):
+        self.file = UserDataFile(path)
+        self._lock = FileLock(path + ".lock")
+        self._mutate(self._assign_missing_ids)
+
+    @staticmethod
+    def _assign_missing_ids(data, changes):
+        for collection in COLLECTIONS:
+            for item in data.get(collection) or []:
+                if isinstance(item, dict) and not item.get("id"):
+                    item["id"] = new_record_id()
+                    changes.append((collection, item["id"], False))
+        return bool(changes)
+
+    def get_user_data(self, user_id):
+        data = self.file.load()
+        data.pop("_changes", None)
+        data.setdefault("version", 0)
+        return data
+
+    def get_version(self, user_id):
+        return self.file.version()
+
+    def _mutate(self, fn, expected_version=None):
+        """Run ``fn(data, changes)`` under the lock and save; ``fn`` appends
+        (collection, id, deleted) to ``changes`` or returns False to write nothing."""
+        with self._lock:
+            data = self.file.load()
+            version = data.get("version", 0)
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(version)
+            changes = []
+            if fn(data, changes) is False:
+                return False
+            version += 1
+            log = data.setdefault("_changes", {})
+            for collection, item_id, deleted in changes:
+                log[f"{collection}/{item_id}"] = [version, int(deleted)]
+            data["version"] = version
+            self.file.save(data)
+            return version
+
+    def replace_user_data(self, user_id, data, expected_version=None):
+        def fn(current, changes):
+            old = {(collection, str(item.get("id"))) for collection in COLLECTIONS for item in current.get(collection) or []}
+            new = {key: value for key, value in data.items() if key not in ("version", "_changes")}
+            for collection in COLLECTIONS:
+                for item in new.get(collection) or []:
+                    item_id = str(item.setdefault("id", new_record_id()))
+                    changes.append((collection, item_id, False))
+                    old.discard((collection, item_id))
+            changes.extend((collection, item_id, True) for collection, item_id in old)
+            changes.append(("profile", "profile", False))
+            log = current.get("_changes", {})
+            current.clear()
+            current.update(default_user_data(), **new)
+            current["_changes"] = log
+        return self._mutate(fn, expected_version)
+
+    def apply(self, user_id, ops, expected_version=None):
+        ops = [check_op(op, n) for n, op in enumerate(ops)]
+
+        def fn(data, changes):
+            for n, op in enumerate(ops):
+                self._apply_op(data, op, changes, n)
+        return self._mutate(fn, expected_version)
+
+    @staticmethod
+    def _apply_op(data, op, changes, n):
+        if op["op"] == "set_profile":
+            data["profile"] = op["profile"]
+            changes.append(("profile", "profile", False))
+            return
+        collection = op["collection"]
+        items = data.setdefault(collection, [])
+        if op["op"] == "add":
+            item = op["item"]
+            item_id = str(item.setdefault("id", new_record_id()))
+            if any(str(existing.get("id")) == item_id for existing in items):
+                raise OperationError(f"{collection} record {item_id} already exists", status=409, index=n)
+            items.append(item)
+            changes.append((collection, item_id, False))
+            return
+        if "index" in op:
+            pos = op["index"] if 0 <= op["index"] < len(items) else None
+        else:
+            pos = next((i for i, existing in enumerate(items) if str(existing.get("id")) == op["id"]), None)
+        if pos is None:
+            raise OperationError(f"{collection} record not found", status=404, index=n)
+        item_id = str(items[pos].get("id"))
+        if op["op"] == "update":
+            op["item"]["id"] = item_id
+            items[pos] = op["item"]
+        else:
+            items.pop(pos)
+        changes.append((collection, item_id, op["op"] == "delete"))
+
+    def get_changes(self, user_id, since=None):
+        data = self.file.load()
+        log = data.pop("_changes", None) or {}
+        version = data.setdefault("version", 0)
+        if since is None or since > version:
+            return {"version": version, "full": True, "data": data}
+        changed = {}
+        for key, (written, deleted) in log.items():
+            if written > since:
+                collection, item_id = key.split("/", 1)
+                changed[(collection, item_id)] = bool(deleted)
+        return build_delta(data, changed, version)
+
+    def iter_items(self, collection):
+        for item in self.file.load().get(collection) or []:
+            yield None, item
+
+
+class SqliteUserStore(UserStore):
+    """Multi-user SQLite backend (WAL mode).
+
+    One table per collection; rows keep the record as JSON (contacts carry
+    arbitrary custom fields) and are ordered by their autoincrement ``seq``,
+    which is what list indexes refer to. Every write is one ``BEGIN
+    IMMEDIATE`` transaction that checks and bumps the user's row in
+    ``versions`` and records what it touched in ``changes``, so SQLite's own
+    locking serialises writers across processes.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS profiles (
+        user_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS medications (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_medications_user ON medications (user_id, seq);
+    CREATE TABLE IF NOT EXISTS emergency_contacts (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_emergency_contacts_user ON emergency_contacts (user_id, seq);
+    CREATE TABLE IF NOT EXISTS appointments (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        id TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_appointments_user ON appointments (user_id, seq);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_user_id ON appointments (user_id, id);
+    CREATE TABLE IF NOT EXISTS versions (
+        user_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS changes (
+        user_id TEXT NOT NULL,
+        collection TEXT NOT NULL,
+        id TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        deleted INTEGER NOT NULL,
+        PRIMARY KEY (user_id, collection, id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_changes_user_version ON changes (user_id, version);
+    CREATE TABLE IF NOT EXISTS claims (
+        user_id TEXT PRIMARY KEY
+    );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                for collection in INDEXED_COLLECTIONS:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{collection}_user_rid "
+                                 f"ON {collection} (user_id, json_extract(data, '$.id'))")
+                    # records written before ids existed
+                    conn.execute(f"UPDATE {collection} SET data = json_set(data, '$.id', lower(hex(randomblob(16)))) "
+                                 f"WHERE json_extract(data, '$.id') IS NULL")
+                conn.execute("PRAGMA user_version = 1")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, user_id, expected_version, fn):
+        """Run ``fn(conn, changes)`` in a write transaction guarded by the user's version."""
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            version = self._version(conn, user_id)
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(version)
+            changes = []
+            if fn(conn, changes) is False:
+                return False
+            version += 1
+            conn.execute("INSERT OR REPLACE INTO versions (user_id, version) VALUES (?, ?)", (user_id, version))
+            conn.executemany("INSERT OR REPLACE INTO changes (user_id, collection, id, version, deleted) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             [(user_id, collection, item_id, version, int(deleted))
+                              for collection, item_id, deleted in changes])
+            return version
+
+    @staticmethod
+    def _version(conn, user_id):
+        row = conn.execute("SELECT version FROM versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _load(conn, user_id, collections=COLLECTIONS, profile=True):
+        data = default_user_data()
+        if profile:
+            row = conn.execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+            if row:
+                data["profile"] = json.loads(row[0])
+        for collection in collections:
+            rows = conn.execute(f"SELECT data FROM {collection} WHERE user_id = ? ORDER BY seq", (user_id,))
+            data[collection] = [json.loads(r[0]) for r in rows]
+        return data
+
+    def get_user_data(self, user_id):
+        with self._conn() as conn:
+            conn.execute("BEGIN")  # one snapshot for the version and the rows
+            data = self._load(conn, user_id)
+            data["version"] = self._version(conn, user_id)
+        return data
+
+    def get_version(self, user_id):
+        return self._version(self._conn(), user_id)
+
+    def claim(self, user_id):
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM claims WHERE user_id = ?", (user_id,)).fetchone():
+            return False
+        if not self._version(conn, user_id):
+            return False
+        with conn:
+            return conn.execute("INSERT OR IGNORE INTO claims (user_id) VALUES (?)", (user_id,)).rowcount == 1
+
+    def get_changes(self, user_id, since=None):
+        with self._conn() as conn:
+            conn.execute("BEGIN")
+            version = self._version(conn, user_id)
+            if since is None or since > version:
+                data = self._load(conn, user_id)
+                data["version"] = version
+                return {"version": version, "full": True, "data": data}
+            changed = {(collection, item_id): bool(deleted) for collection, item_id, deleted in conn.execute(
+                "SELECT collection, id, deleted FROM changes WHERE user_id = ? AND version > ?", (user_id, since))}
+            touched = {collection for collection, _ in changed}
+            data = self._load(conn, user_id, [c for c in COLLECTIONS if c in touched], profile="profile" in touched)
+        return build_delta(data, changed, version)
+
+    def replace_user_data(self, user_id, data, expected_version=None):
+        def fn(conn, changes):
+            old = {(collection, item_id) for collection in COLLECTIONS for item_id in self._ids(conn, user_id, collection)}
+            conn.execute("DELETE FROM profiles WHERE user_id = ?", (user_id,))
+            for collection in COLLECTIONS:
+                conn.execute(f"DELETE FROM {collection} WHERE user_id = ?", (user_id,))
+            self._apply_op(conn, user_id, {"op": "set_profile", "profile": data.get("profile") or {}}, changes)
+            for collection in COLLECTIONS:
+                for item in data.get(collection) or []:
+                    self._apply_op(conn, user_id, {"op": "add", "collection": collection, "item": item}, changes)
+                    old.discard((collection, str(item["id"])))
+            changes.extend((collection, item_id, True) for collection, item_id in old)
+        return self._write(user_id, expected_version, fn)
+
+    def apply(self, user_id, ops, expected_version=None):
+        ops = [check_op(op, n) for n, op in enumerate(ops)]
+
+        def fn(conn, changes):
+            for n, op in enumerate(ops):
+                self._apply_op(conn, user_id, op, changes, n)
+        return self._write(user_id, expected_version, fn)
+
+    @staticmethod
+    def _ids(conn, user_id, collection):
+        if collection in KEYED_COLLECTIONS:
+            return [r[0] for r in conn.execute(f"SELECT id FROM {collection} WHERE user_id = ?", (user_id,))]
+        return [r[0] for r in conn.execute(f"SELECT json_extract(data, '$.id') FROM {collection} WHERE user_id = ?",
+                                           (user_id,))]
+
+    @staticmethod
+    def _find(conn, user_id, collection, op):
+        """``(seq, id)`` of the record an update/delete op names, or None."""
+        if "index" in op:
+            if op["index"] < 0:
+                return None
+            row = conn.execute(f"SELECT seq, json_extract(data, '$.id') FROM {collection} WHERE user_id = ? "
+                               f"ORDER BY seq LIMIT 1 OFFSET ?", (user_id, op["index"])).fetchone()
+        elif collection in KEYED_COLLECTIONS:
+            row = conn.execute(f"SELECT seq, id FROM {collection} WHERE user_id = ? AND id = ?",
+                               (user_id, op["id"])).fetchone()
+        else:
+            row = conn.execute(f"SELECT seq, json_extract(data, '$.id') FROM {collection} "
+                               f"WHERE user_id = ? AND json_extract(data, '$.id') = ?", (user_id, op["id"])).fetchone()
+        return (row[0], str(row[1])) if row else None
+
+    def _apply_op(self, conn, user_id, op, changes, n=None):
+        if op["op"] == "set_profile":
+            conn.execute("INSERT OR REPLACE INTO profiles (user_id, data) VALUES (?, ?)",
+                         (user_id, json.dumps(op["profile"], ensure_ascii=False)))
+            changes.append(("profile", "profile", False))
+            return
+        collection = op["collection"]
+        if op["op"] == "add":
+            item = op["item"]
+            item_id = str(item.setdefault("id", new_record_id()))
+            if self._find(conn, user_id, collection, {"id": item_id}):
+                raise OperationError(f"{collection} record {item_id} already exists", status=409, index=n)
+            payload = json.dumps(item, ensure_ascii=False)
+            if collection in KEYED_COLLECTIONS:
+                conn.execute(f"INSERT INTO {collection} (user_id, id, data) VALUES (?, ?, ?)", (user_id, item_id, payload))
+            else:
+                conn.execute(f"INSERT INTO {collection} (user_id, data) VALUES (?, ?)", (user_id, payload))
+            changes.append((collection, item_id, False))
+            return
+        found = self._find(conn, user_id, collection, op)
+        if found is None:
+            raise OperationError(f"{collection} record not found", status=404, index=n)
+        seq, item_id = found
+        if op["op"] == "update":
+            op["item"]["id"] = item_id
+            conn.execute(f"UPDATE {collection} SET data = ? WHERE seq = ?",
+                         (json.dumps(op["item"], ensure_ascii=False), seq))
+        else:
+            conn.execute(f"DELETE FROM {collection} WHERE seq = ?", (seq,))
+        changes.append((collection, item_id, op["op"] == "delete"))
+
+    def iter_items(self, collection):
+        if collection not in COLLECTIONS:
+            raise ValueError(f"Unknown collection: {collection}")
+        for user_id, payload in self._conn().execute(f"SELECT user_id, data FROM {collection} ORDER BY seq"):
+            yield user_id, json.loads(payload)
+
+
+def open_user_store(backend, json_path, sqlite_path):
+    """Build the store selected by ``backend`` ("json" or "sqlite")."""
+    if backend == "sqlite":
+        return SqliteUserStore(sqlite_path)
+    if backend == "json":
+        return JsonUserStore(json_path)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def import_json_into_sqlite(json_path, sqlite_path, user_id):
+    """Copy an existing user_data.json document into the SQLite store for ``user_id``."""
+    data = UserDataFile(json_path).load()
+    for appt in data.get("appointments") or []:
+        appt.setdefault("id", str(uuid.uuid4()))
+    store = SqliteUserStore(sqlite_path)
+    store.replace_user_data(user_id, data)
+    with store._conn() as conn:
+        conn.execute("DELETE FROM claims WHERE user_id = ?", (user_id,))  # claimable again (re-import)
+    return {collection: len(data.get(collection) or []) for collection in COLLECTIONS}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Import user_data.json into the SQLite user store.",
+        epilog="Under the default user id, the first browser session that opens the app afterwards "
+               "takes the imported data over (every other session starts empty). To give it to a "
+               "known session instead, pass that session's uid as --user-id.")
+    parser.add_argument("json_path", help="existing user_data.json")
+    parser.add_argument("sqlite_path", help="SQLite database to create/update")
+    parser.add_argument("--user-id", default="default", help="user id to store the document under")
+    args = parser.parse_args()
+    counts = import_json_into_sqlite(args.json_path, args.sqlite_path, args.user_id)
+    print(f"Imported {args.json_path} for user {args.user_id!r}: {counts}")
+    if args.user_id == "default":
+        print("The first browser session to open the app will take this data over.")
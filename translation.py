@@ -0,0 +1,135 @@
+import re, sqlite3, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+_PARAGRAPH_SPLIT_RE = re.compile(r"(\n\s*\n)")
+
+
+class TranslationService:
+    """Caching wrapper around ``google_translator``.
+
+    - Results are cached per (text, src, tgt) in an LRU and, when ``db_path``
+      is given, in SQLite so they survive restarts.
+    - ``translate`` splits long texts into paragraphs and translates the
+      uncached ones concurrently, then stitches them back together.
+    - ``preload`` warms the cache for fixed strings (greeting, fallback replies, tips).
+    """
+
+    def __init__(self, translator, max_entries=5000, db_path=None, max_workers=4, chunk_min_chars=600, limiter=None):
+        self.translator = translator
+        self.limiter = limiter  # optional upstream.UpstreamLimiter for the network calls
+        self.max_entries = max_entries
+        self.chunk_min_chars = chunk_min_chars
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translate")
+        if db_path:
+            with self._conn() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS translations ("
+                    "src TEXT, tgt TEXT, text TEXT, result TEXT, PRIMARY KEY (src, tgt, text))")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    # ---------------------------
+    # Cache tiers
+    # ---------------------------
+    def _cached(self, key):
+        with self._lock:
+            result = self._items.get(key)
+            if result is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return result
+        if self._db_path:
+            try:
+                row = self._conn().execute(
+                    "SELECT result FROM translations WHERE src = ? AND tgt = ? AND text = ?",
+                    (key[1], key[2], key[0])).fetchone()
+            except sqlite3.Error as e:
+                print(f"Translation cache read error: {e}")
+                row = None
+            if row:
+                self._store(key, row[0], persist=False)
+                with self._lock:
+                    self.hits += 1
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key, result, persist=True):
+        with self._lock:
+            self._items[key] = result
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        if persist and self._db_path:
+            try:
+                with self._conn() as conn:
+                    conn.execute("INSERT OR REPLACE INTO translations (src, tgt, text, result) VALUES (?, ?, ?, ?)",
+                                 (key[1], key[2], key[0], result))
+            except sqlite3.Error as e:
+                print(f"Translation cache write error: {e}")
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def translate_one(self, text, tgt, src="auto"):
+        """Translate a single chunk through the cache."""
+        if not text.strip():
+            return text
+        key = (text, src, tgt)
+        result = self._cached(key)
+        if result is None:
+            if self.limiter is not None:
+                result = self.limiter.call(self.translator.translate, text, lang_tgt=tgt, lang_src=src)
+            else:
+                result = self.translator.translate(text, lang_tgt=tgt, lang_src=src)
+            self._store(key, result)
+        return result
+
+    def translate(self, text, tgt, src="auto"):
+        """Translate ``text``; long texts are translated paragraph by paragraph in parallel."""
+        if len(text) < self.chunk_min_chars:
+            return self.translate_one(text, tgt, src)
+        pieces = _PARAGRAPH_SPLIT_RE.split(text)  # odd indexes are the separators
+        if len(pieces) == 1:
+            return self.translate_one(text, tgt, src)
+        futures = {i: self._pool.submit(self.translate_one, piece, tgt, src)
+                   for i, piece in enumerate(pieces) if i % 2 == 0 and piece.strip()}
+        for i, future in futures.items():
+            pieces[i] = future.result()
+        return "".join(pieces)
+
+    def preload(self, texts, tgt, src="auto"):
+        """Translate fixed strings ahead of time (runs in the background)."""
+        def run():
+            for text in texts:
+                try:
+                    self.translate(text, tgt, src)
+                except Exception as e:
+                    print(f"Translation preload error: {e}")
+                    return
+        thread = threading.Thread(target=run, name="translation-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
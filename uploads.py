@@ -0,0 +1,97 @@
+import os, re, io, hashlib, tempfile
+
+try:  # optional: only used to shrink images before sending them to the model
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+CONTENT_ADDRESSED_RE = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
+
+
+class UploadError(Exception):
+    """Rejected upload; ``status`` is the HTTP code to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def format_size(n):
+    """"10 MB", "1.5 MB" or "512 KB" (for error messages)."""
+    if n >= 1024 * 1024:
+        return f"{round(n / (1024 * 1024), 1):g} MB"
+    return f"{round(n / 1024, 1):g} KB"
+
+
+def save_upload(stream, upload_dir, ext, max_bytes):
+    """Stream an upload to disk in chunks and store it under its SHA-256.
+
+    Returns ``(filename, sha256_hex, size)``. Re-uploading identical bytes
+    reuses the existing file. Raises UploadError for empty or oversized
+    uploads; nothing is left behind in that case.
+    """
+    ext = (ext or ".bin").lower()
+    digest = hashlib.sha256()
+    size = 0
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", dir=upload_dir)
+    try:
+        with os.fdopen(fd, "wb") as out_f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f"File too large (max {format_size(max_bytes)})", status=413)
+                digest.update(chunk)
+                out_f.write(chunk)
+        if size == 0:
+            raise UploadError("Empty file")
+
+        sha = digest.hexdigest()
+        filename = f"{sha}{ext}"
+        final_path = os.path.join(upload_dir, filename)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)  # same content already stored
+        else:
+            os.replace(tmp_path, final_path)
+        return filename, sha, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def prepare_for_model(path, mime_type, max_side=1600, quality=85):
+    """Bytes + mime type to send to the vision model.
+
+    With Pillow installed, images larger than ``max_side`` are downscaled and
+    re-encoded as JPEG when that makes the payload smaller; otherwise the
+    stored file is sent as is.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if Image is None or not (mime_type or "").startswith("image/"):
+        return raw, mime_type
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            if max(img.size) > max_side:
+                img.thumbnail((max_side, max_side))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=quality, optimize=True)
+    except Exception as e:
+        print(f"Image recompress skipped: {e}")
+        return raw, mime_type
+    data = out.getvalue()
+    if len(data) < len(raw):
+        return data, "image/jpeg"
+    return raw, mime_type
+
+
+def is_content_addressed(filename):
+    """True for files stored by save_upload (safe to cache forever)."""
+    return bool(CONTENT_ADDRESSED_RE.match(filename))
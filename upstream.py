@@ -0,0 +1,139 @@
+import time, threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class UpstreamUnavailable(Exception):
+    """An outbound call was refused or abandoned; ``status`` is the HTTP code to return."""
+    status = 503
+
+    def __init__(self, upstream, message):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+
+
+class UpstreamBusy(UpstreamUnavailable):
+    """Too many calls already running/queued for this upstream."""
+    status = 503
+
+
+class UpstreamTimeout(UpstreamUnavailable):
+    """The call did not finish before its deadline."""
+    status = 504
+
+
+class UpstreamLimiter:
+    """Bounded concurrency, queue-depth backpressure and deadlines for one upstream.
+
+    At most ``max_concurrency`` calls run at once (and, if a ``global_slots``
+    semaphore is shared between limiters, never more than it allows in total).
+    Up to ``max_queue`` further callers may wait; anyone beyond that is
+    rejected immediately with ``UpstreamBusy`` so workers don't pile up behind
+    a slow upstream. ``call()`` also gives up waiting after ``timeout``
+    seconds (``UpstreamTimeout``); the abandoned call still holds its slot
+    until it really finishes, so the upstream never sees more than the limit.
+    """
+
+    def __init__(self, name, max_concurrency=8, max_queue=16, timeout=30.0, global_slots=None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.global_slots = global_slots
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.errors = 0  # calls that reached the upstream and raised
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"upstream-{name}")
+
+    def _acquire(self, deadline):
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise UpstreamBusy(self.name, "too many pending requests")
+            self._waiting += 1
+        try:
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                self.timed_out += 1
+                raise UpstreamTimeout(self.name, "timed out waiting for a free slot")
+            if self.global_slots is not None and not self.global_slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                self._slots.release()
+                self.timed_out += 1
+                raise UpstreamTimeout(self.name, "timed out waiting for a global slot")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        with self._lock:
+            self._active += 1
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+        if self.global_slots is not None:
+            self.global_slots.release()
+        self._slots.release()
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold a slot for the duration of the block (e.g. a streamed response)."""
+        self._acquire(time.monotonic() + (self.timeout if timeout is None else timeout))
+        try:
+            yield
+        except Exception:
+            self.count_error()
+            raise
+        finally:
+            self._release()
+
+    def hold(self, timeout=None):
+        """Take a slot now and return a function that gives it back (calling it again is a
+        no-op): for a slot that must be held by a streamed response after the handler returns."""
+        self._acquire(time.monotonic() + (self.timeout if timeout is None else timeout))
+        released = []
+        release_lock = threading.Lock()
+
+        def release():
+            with release_lock:
+                if released:
+                    return
+                released.append(True)
+            self._release()
+        return release
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` within a slot, waiting at most ``timeout`` seconds overall."""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        self._acquire(deadline)
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            self.timed_out += 1
+            raise UpstreamTimeout(self.name, f"no response within {self.timeout if timeout is None else timeout}s")
+        except Exception:
+            self.count_error()
+            raise
+
+    def count_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "errors": self.errors,
+            }